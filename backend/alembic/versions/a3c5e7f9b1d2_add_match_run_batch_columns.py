@@ -0,0 +1,48 @@
+"""add match run source and timing columns
+
+Revision ID: a3c5e7f9b1d2
+Revises: d4e5f6a7b8c9, e61c2a8d44be
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c5e7f9b1d2"
+down_revision: Union[str, Sequence[str], None] = ("d4e5f6a7b8c9", "e61c2a8d44be")
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        ALTER TABLE match_runs
+        ADD COLUMN IF NOT EXISTS source VARCHAR(16) NOT NULL DEFAULT 'interactive',
+        ADD COLUMN IF NOT EXISTS duration_ms DOUBLE PRECISION,
+        ADD COLUMN IF NOT EXISTS stage_timings_json JSONB;
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_match_runs_student_source_created
+        ON match_runs(student_id, source, created_at DESC);
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_match_runs_student_source_created;")
+    op.execute(
+        """
+        ALTER TABLE match_runs
+        DROP COLUMN IF EXISTS stage_timings_json,
+        DROP COLUMN IF EXISTS duration_ms,
+        DROP COLUMN IF EXISTS source;
+        """
+    )
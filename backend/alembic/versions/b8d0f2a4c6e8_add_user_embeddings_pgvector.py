@@ -0,0 +1,89 @@
+"""add pgvector column and hnsw indexes to user_embeddings
+
+Revision ID: b8d0f2a4c6e8
+Revises: a3c5e7f9b1d2
+Create Date: 2026-10-17 09:00:00.000000
+
+Optional: does nothing when the pgvector extension is not installable on the
+server, and the app keeps scoring tutors in Python. When it is, every
+128-dim `embedding` array is mirrored into an L2-normalized `embedding_vec`
+vector(128) by a trigger, so the app's write paths stay unchanged.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b8d0f2a4c6e8"
+down_revision: Union[str, Sequence[str], None] = "a3c5e7f9b1d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FIELDS = ("bio", "help", "locations")
+
+
+def _pgvector_available() -> bool:
+    return bool(
+        op.get_bind()
+        .execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'vector'"))
+        .scalar()
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _pgvector_available():
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+    op.execute("ALTER TABLE user_embeddings ADD COLUMN IF NOT EXISTS embedding_vec vector(128);")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION user_embeddings_sync_vec() RETURNS trigger AS $$
+        BEGIN
+          IF array_length(NEW.embedding, 1) = 128 THEN
+            NEW.embedding_vec := l2_normalize(NEW.embedding::vector(128));
+          ELSE
+            NEW.embedding_vec := NULL;
+          END IF;
+          RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute("DROP TRIGGER IF EXISTS trg_user_embeddings_sync_vec ON user_embeddings;")
+    op.execute(
+        """
+        CREATE TRIGGER trg_user_embeddings_sync_vec
+        BEFORE INSERT OR UPDATE OF embedding ON user_embeddings
+        FOR EACH ROW EXECUTE FUNCTION user_embeddings_sync_vec();
+        """
+    )
+    op.execute(
+        """
+        UPDATE user_embeddings
+        SET embedding_vec = l2_normalize(embedding::vector(128))
+        WHERE array_length(embedding, 1) = 128;
+        """
+    )
+    # One partial HNSW index per tutor field: retrieval asks each for its nearest
+    # tutors and rescores the union on all three fields.
+    for field_name in FIELDS:
+        op.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS ix_user_embeddings_tutor_{field_name}_hnsw
+            ON user_embeddings USING hnsw (embedding_vec vector_ip_ops)
+            WHERE entity_type = 'tutor' AND field_name = '{field_name}';
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for field_name in FIELDS:
+        op.execute(f"DROP INDEX IF EXISTS ix_user_embeddings_tutor_{field_name}_hnsw;")
+    op.execute("DROP TRIGGER IF EXISTS trg_user_embeddings_sync_vec ON user_embeddings;")
+    op.execute("DROP FUNCTION IF EXISTS user_embeddings_sync_vec();")
+    op.execute("ALTER TABLE user_embeddings DROP COLUMN IF EXISTS embedding_vec;")
@@ -0,0 +1,62 @@
+"""add binary encoding columns to user_embeddings
+
+Revision ID: c9e1a3b5d7f0
+Revises: b8d0f2a4c6e8
+Create Date: 2026-10-17 11:00:00.000000
+
+Schema only: existing float8[] rows keep working. Convert them with
+dev/encode_embeddings.py once EMBEDDING_ENCODING is switched.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c9e1a3b5d7f0"
+down_revision: Union[str, Sequence[str], None] = "b8d0f2a4c6e8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        ALTER TABLE user_embeddings
+        ADD COLUMN IF NOT EXISTS embedding_bin BYTEA,
+        ADD COLUMN IF NOT EXISTS embedding_dtype VARCHAR(8),
+        ALTER COLUMN embedding DROP NOT NULL;
+        """
+    )
+    op.execute("ALTER TABLE user_embeddings DROP CONSTRAINT IF EXISTS ck_embedding_present;")
+    op.execute(
+        """
+        ALTER TABLE user_embeddings
+        ADD CONSTRAINT ck_embedding_present
+        CHECK (embedding IS NOT NULL OR embedding_bin IS NOT NULL);
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        """
+        DO $$
+        BEGIN
+          IF EXISTS (SELECT 1 FROM user_embeddings WHERE embedding IS NULL) THEN
+            RAISE EXCEPTION 'user_embeddings has binary-only rows; run dev/encode_embeddings.py --encoding array first';
+          END IF;
+        END $$;
+        """
+    )
+    op.execute("ALTER TABLE user_embeddings DROP CONSTRAINT IF EXISTS ck_embedding_present;")
+    op.execute(
+        """
+        ALTER TABLE user_embeddings
+        DROP COLUMN IF EXISTS embedding_dtype,
+        DROP COLUMN IF EXISTS embedding_bin,
+        ALTER COLUMN embedding SET NOT NULL;
+        """
+    )
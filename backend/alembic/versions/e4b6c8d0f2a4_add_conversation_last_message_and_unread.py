@@ -0,0 +1,80 @@
+"""add denormalized last message and unread columns to conversations
+
+Revision ID: e4b6c8d0f2a4
+Revises: c9e1a3b5d7f0
+Create Date: 2026-10-17 15:00:00.000000
+
+Backfills the last message of every conversation and bumps updated_at to it.
+There is no read history to backfill, so existing messages count as read.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4b6c8d0f2a4"
+down_revision: Union[str, Sequence[str], None] = "c9e1a3b5d7f0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        ALTER TABLE conversations
+        ADD COLUMN IF NOT EXISTS last_message_id INTEGER,
+        ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP WITH TIME ZONE,
+        ADD COLUMN IF NOT EXISTS last_message_preview VARCHAR(200),
+        ADD COLUMN IF NOT EXISTS user1_last_read_message_id INTEGER,
+        ADD COLUMN IF NOT EXISTS user2_last_read_message_id INTEGER,
+        ADD COLUMN IF NOT EXISTS user1_unread_count INTEGER NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS user2_unread_count INTEGER NOT NULL DEFAULT 0;
+        """
+    )
+    op.execute(
+        """
+        UPDATE conversations AS c
+        SET last_message_id = m.id,
+            last_message_at = m.created_at,
+            last_message_preview = CASE
+              WHEN m.content <> '' THEN left(m.content, 200)
+              ELSE coalesce(left(a.file_name, 200), '')
+            END,
+            user1_last_read_message_id = m.id,
+            user2_last_read_message_id = m.id,
+            updated_at = greatest(c.updated_at, m.created_at)
+        FROM (
+          SELECT DISTINCT ON (conversation_id) id, conversation_id, content, created_at
+          FROM messages
+          ORDER BY conversation_id, created_at DESC, id DESC
+        ) AS m
+        LEFT JOIN message_attachments AS a ON a.message_id = m.id
+        WHERE m.conversation_id = c.id;
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_conversations_user1_recent ON conversations (user1_id, updated_at, id);"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_conversations_user2_recent ON conversations (user2_id, updated_at, id);"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_conversations_user2_recent;")
+    op.execute("DROP INDEX IF EXISTS ix_conversations_user1_recent;")
+    op.execute(
+        """
+        ALTER TABLE conversations
+        DROP COLUMN IF EXISTS user2_unread_count,
+        DROP COLUMN IF EXISTS user1_unread_count,
+        DROP COLUMN IF EXISTS user2_last_read_message_id,
+        DROP COLUMN IF EXISTS user1_last_read_message_id,
+        DROP COLUMN IF EXISTS last_message_preview,
+        DROP COLUMN IF EXISTS last_message_at,
+        DROP COLUMN IF EXISTS last_message_id;
+        """
+    )
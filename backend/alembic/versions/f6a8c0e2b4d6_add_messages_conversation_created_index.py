@@ -0,0 +1,30 @@
+"""add (conversation_id, created_at, id) index on messages
+
+Revision ID: f6a8c0e2b4d6
+Revises: e4b6c8d0f2a4
+Create Date: 2026-10-17 16:00:00.000000
+
+Serves keyset pages of message history in either direction.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f6a8c0e2b4d6"
+down_revision: Union[str, Sequence[str], None] = "e4b6c8d0f2a4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_messages_conversation_created_id ON messages (conversation_id, created_at, id);"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_messages_conversation_created_id;")
@@ -4,14 +4,16 @@ from typing import Annotated, Optional
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 
 from app.config import settings
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app.models import User
+from app.services.password_hashing import HasherBusy, get_password_hasher, pwd_context
+from app.services.principal_cache import Principal, get_cached_principal, store_principal
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 bearer_scheme = HTTPBearer(auto_error=False)
 
 
@@ -23,6 +25,30 @@ def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in requests, please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password in the hashing pool; 503 when the pool is saturated."""
+    try:
+        return await get_password_hasher().verify(plain_password, hashed_password)
+    except HasherBusy:
+        raise _hasher_busy()
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password in the hashing pool; 503 when the pool is saturated."""
+    try:
+        return await get_password_hasher().hash(password)
+    except HasherBusy:
+        raise _hasher_busy()
+
+
 def create_access_token(sub: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
     to_encode = {"sub": sub, "exp": expire}
@@ -33,7 +59,8 @@ def create_access_token(sub: str) -> str:
     )
 
 
-def get_user_from_token(token: str, db: Session) -> User:
+def _decode_token(token: str) -> tuple[int, float]:
+    """(user id, `exp` as a Unix time) of a valid token; 401 otherwise."""
     try:
         payload = jwt.decode(
             token,
@@ -46,15 +73,62 @@ def get_user_from_token(token: str, db: Session) -> User:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     try:
-        user_id = int(sub)
+        return int(sub), float(payload.get("exp", 0))
     except ValueError:
         raise HTTPException(status_code=401, detail="Invalid token")
+
+
+def _resolve_token(token: str) -> tuple[int, float | None]:
+    """User id for `token`, skipping jwt.decode when it is cached (expiry is then None)."""
+    principal = get_cached_principal(token)
+    if principal is not None:
+        return principal.id, None
+    return _decode_token(token)
+
+
+def _remember(token: str, user: User, expires_at: float | None) -> None:
+    if expires_at is not None:
+        store_principal(token, Principal.from_user(user), expires_at=expires_at)
+
+
+def get_user_from_token(token: str, db: Session) -> User:
+    user_id, expires_at = _resolve_token(token)
     user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    _remember(token, user, expires_at)
     return user
 
 
+async def get_user_from_token_async(token: str, db: AsyncSession) -> User:
+    user_id, expires_at = _resolve_token(token)
+    # AsyncSession cannot lazy-load, so fetch the profile the handlers check
+    user = await db.get(User, user_id, options=[joinedload(User.student)])
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    _remember(token, user, expires_at)
+    return user
+
+
+async def get_principal_from_token_async(token: str, db: AsyncSession) -> Principal:
+    """Like get_user_from_token_async, but served from the principal cache when possible."""
+    principal = get_cached_principal(token)
+    if principal is not None:
+        return principal
+    user_id, expires_at = _decode_token(token)
+    row = (
+        await db.execute(
+            select(User.id, User.status, User.is_tutor, User.is_student, User.first_name)
+            .where(User.id == user_id)
+        )
+    ).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    principal = Principal(**row._mapping)
+    store_principal(token, principal, expires_at=expires_at)
+    return principal
+
+
 def get_current_user(
     credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(bearer_scheme)],
     db: Annotated[Session, Depends(get_db)],
@@ -66,3 +140,33 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     return get_user_from_token(credentials.credentials, db)
+
+
+async def get_current_user_async(
+    credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(bearer_scheme)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+) -> User:
+    if not credentials:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_user_from_token_async(credentials.credentials, db)
+
+
+async def get_current_principal(
+    credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(bearer_scheme)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+) -> Principal:
+    """
+    The authenticated user's Principal, usually without touching the database.
+    Use get_current_user when the handler needs the ORM User.
+    """
+    if not credentials:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_principal_from_token_async(credentials.credentials, db)
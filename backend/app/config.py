@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
@@ -24,5 +26,88 @@ class Settings(BaseSettings):
     mfa_code_expire_minutes: int = 10
     mfa_max_attempts: int = 3
 
+    # Embedding model written by profile edits and read by matching. To roll out
+    # a new model, backfill it with dev/reembed_users.py before switching this.
+    embed_model_name: str = "local-hash-v1"
+    # How new embedding rows are stored: "array" (float8[]) or raw "float32" /
+    # "float16" bytes. Existing rows are converted by dev/encode_embeddings.py.
+    # The pgvector backend needs "array".
+    embedding_encoding: Literal["array", "float32", "float16"] = "array"
+
+    # First-stage tutor retrieval: "exact" scans every tutor, "ivf" probes an
+    # IVF-flat index once the pool reaches tutor_ann_min_tutors, "pgvector"
+    # searches the HNSW indexes in Postgres (falls back to "exact" when the
+    # pgvector migration could not add the embedding_vec column).
+    tutor_ann_backend: Literal["exact", "ivf", "pgvector"] = "exact"
+    tutor_ann_min_tutors: int = 10000
+    tutor_ann_nlist: int = 0  # 0 = sqrt(number of tutors)
+    tutor_ann_nprobe: int = 8
+    # The in-process tutor index catches up on other workers' writes by
+    # re-reading embedding rows updated since its last sync, minus this overlap
+    # for transactions that commit after a newer one. A write that commits later
+    # still, or that leaves the signature unchanged, is picked up by a full
+    # reload once the index is older than tutor_index_reconcile_seconds.
+    tutor_index_sync_overlap_seconds: int = 60
+    tutor_index_reconcile_seconds: int = 600
+    # Tutors sharing the most strongly matched classes with the student are added
+    # to the KNN candidates before reranking; 0 turns this off.
+    match_class_candidates: int = 50
+
+    # /matches/me/recommended serves batch runs from dev/materialize_matches.py
+    # while they are younger than this, and computes matches live otherwise.
+    match_batch_max_age_minutes: int = 360
+
+    # Connection pools; the sync and async engines each get one of this size.
+    # Checkouts wait up to db_pool_timeout seconds before "QueuePool limit"
+    # errors, and connections older than db_pool_recycle seconds are replaced
+    # (-1 keeps them). Liveness: "pre_ping" pings on every checkout, "idle" only
+    # pings connections idle longer than db_pool_liveness_idle_seconds, "off"
+    # never pings. Counters are served at GET /metrics/db-pool (see metrics_enabled).
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_liveness: Literal["pre_ping", "idle", "off"] = "idle"
+    db_pool_liveness_idle_seconds: float = 30.0
+
+    # The /metrics routes (pool, hashing and write-behind counters) show how
+    # close the service is to saturation, so they are only mounted when this is
+    # on, and then still require a signed-in user.
+    metrics_enabled: bool = False
+
+    # bcrypt runs in a process pool of this many workers (0 = the default
+    # threadpool). Beyond password_hash_max_pending queued or running calls,
+    # login and registration answer 503 instead of queueing.
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 64
+    password_hash_timeout_seconds: float = 10.0
+
+    # Fan-out for chat and notification WebSockets: "memory" reaches sockets in
+    # this process only; "redis" publishes through redis_url so every worker
+    # and node delivers to its own sockets.
+    realtime_broker: Literal["memory", "redis"] = "memory"
+    redis_url: str = "redis://localhost:6379/0"
+    # Each WebSocket gets a send queue of this many messages; a client that lets
+    # it fill up, or takes longer than ws_send_timeout_seconds to accept a
+    # message, is disconnected (1013) instead of delaying everyone else.
+    ws_send_queue_size: int = 100
+    ws_send_timeout_seconds: float = 5.0
+
+    # Write-behind for chat sent over WebSockets: messages take ids from
+    # sequence blocks of chat_id_block_size, are broadcast at once, and are
+    # inserted in batches of up to chat_write_behind_batch_size at most
+    # chat_write_behind_max_delay_ms after arrival. Senders get their ack
+    # only once the batch commits. At chat_write_behind_max_pending unsaved
+    # messages, senders wait. A message not committed within
+    # chat_write_behind_max_lag_ms fails (the sender gets an error), which
+    # bounds how long reconnect catch-up waits for other workers' writes.
+    # Off = each message commits before broadcast.
+    chat_write_behind: bool = False
+    chat_write_behind_batch_size: int = 200
+    chat_write_behind_max_delay_ms: int = 20
+    chat_write_behind_max_pending: int = 5000
+    chat_write_behind_max_lag_ms: int = 2000
+    chat_id_block_size: int = 100
+
 
 settings = Settings()  # type: ignore[call-arg]
\ No newline at end of file
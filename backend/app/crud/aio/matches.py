@@ -0,0 +1,122 @@
+"""Async CRUD for match runs, mirroring app.crud.matches for AsyncSession."""
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models import Match, MatchRun
+
+
+async def create_match_run(
+    db: AsyncSession,
+    *,
+    student_id: int,
+    model_name: str,
+    top_k: int,
+    weights_json: dict | None = None,
+) -> MatchRun:
+    run = MatchRun(
+        student_id=student_id,
+        model_name=model_name,
+        top_k=top_k,
+        weights_json=weights_json,
+    )
+    db.add(run)
+    await db.flush()
+    return run
+
+
+async def get_latest_match_run_for_student(
+    db: AsyncSession,
+    *,
+    student_id: int,
+    source: str = "interactive",
+    with_matches: bool = False,
+) -> MatchRun | None:
+    stmt = (
+        select(MatchRun)
+        .where(MatchRun.student_id == student_id, MatchRun.source == source)
+        .order_by(desc(MatchRun.created_at), desc(MatchRun.id))
+        .limit(1)
+    )
+    if with_matches:
+        stmt = stmt.options(selectinload(MatchRun.matches))
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+
+async def get_latest_matches_for_student(
+    db: AsyncSession,
+    *,
+    student_id: int,
+    source: str = "interactive",
+) -> list[Match]:
+    latest_run = await get_latest_match_run_for_student(db, student_id=student_id, source=source)
+    if not latest_run:
+        return []
+
+    stmt = select(Match).where(Match.run_id == latest_run.id).order_by(Match.rank.asc())
+    return list((await db.execute(stmt)).scalars().all())
+
+
+async def add_match_to_latest_run(
+    db: AsyncSession,
+    *,
+    student_id: int,
+    ranked_row: dict,
+    model_name: str = "local-hash-v1",
+    weights_json: dict | None = None,
+) -> Match:
+    run = await get_latest_match_run_for_student(db, student_id=student_id)
+    if run is None:
+        run = await create_match_run(
+            db,
+            student_id=student_id,
+            model_name=model_name,
+            top_k=0,
+            weights_json=weights_json,
+        )
+
+    existing = (
+        await db.execute(
+            select(Match).where(Match.run_id == run.id, Match.tutor_id == ranked_row["tutor_id"]).limit(1)
+        )
+    ).scalar_one_or_none()
+    if existing is not None:
+        return existing
+
+    max_rank = (
+        await db.execute(
+            select(Match.rank).where(Match.run_id == run.id).order_by(Match.rank.desc()).limit(1)
+        )
+    ).scalar()
+    next_rank = (max_rank or 0) + 1
+
+    row = Match(
+        run_id=run.id,
+        student_id=student_id,
+        tutor_id=ranked_row["tutor_id"],
+        rank=next_rank,
+        similarity_score=ranked_row["final_score"],
+        embedding_similarity=ranked_row.get("embedding_similarity"),
+        class_strength=ranked_row.get("class_strength"),
+        availability_overlap=ranked_row.get("availability_overlap"),
+        location_match=ranked_row.get("location_match"),
+    )
+    db.add(row)
+    run.top_k = next_rank
+    await db.commit()
+    await db.refresh(row)
+    return row
+
+
+async def has_student_matched_tutor(db: AsyncSession, *, student_id: int, tutor_id: int) -> bool:
+    stmt = (
+        select(Match.id)
+        .join(MatchRun, MatchRun.id == Match.run_id)
+        .where(
+            Match.student_id == student_id,
+            Match.tutor_id == tutor_id,
+            MatchRun.source == "interactive",
+        )
+        .limit(1)
+    )
+    return (await db.execute(stmt)).first() is not None
@@ -0,0 +1,202 @@
+"""Async CRUD for messaging, mirroring app.crud.messages for AsyncSession.
+
+Messages are returned with `attachment` loaded, since MessagePublic reads it
+and an AsyncSession cannot lazy-load. The message cursor helpers are
+re-exported so callers only need this module.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.crud.messages import (
+    MessageCursor,
+    _canonical_pair,
+    attachment_preview_stmt,
+    conversation_row,
+    conversations_query,
+    decode_message_cursor,  # noqa: F401
+    encode_message_cursor,  # noqa: F401
+    mark_read_stmt,
+    messages_after_id_query,
+    messages_query,
+    record_message_stmt,
+    unread_summary_query,
+)
+from app.models import Conversation, Message, MessageAttachment
+
+
+async def _get_message(db: AsyncSession, message_id: int) -> Message:
+    stmt = (
+        select(Message)
+        .where(Message.id == message_id)
+        .options(selectinload(Message.attachment))
+        .execution_options(populate_existing=True)
+    )
+    return (await db.execute(stmt)).scalar_one()
+
+
+async def get_or_create_conversation(db: AsyncSession, user1_id: int, user2_id: int) -> Conversation:
+    """Get existing conversation between two users or create one. user1_id/user2_id order is normalized."""
+    u1, u2 = _canonical_pair(user1_id, user2_id)
+    stmt = select(Conversation).where(
+        Conversation.user1_id == u1,
+        Conversation.user2_id == u2,
+    )
+    conv = (await db.execute(stmt)).scalar_one_or_none()
+    if conv is not None:
+        return conv
+    conv = Conversation(user1_id=u1, user2_id=u2)
+    db.add(conv)
+    await db.commit()
+    await db.refresh(conv)
+    return conv
+
+
+async def get_conversation_by_id(db: AsyncSession, conversation_id: int, user_id: int) -> Optional[Conversation]:
+    """Return conversation if it exists and user_id is user1 or user2."""
+    conv = await db.get(Conversation, conversation_id)
+    if conv is None:
+        return None
+    if user_id not in (conv.user1_id, conv.user2_id):
+        return None
+    return conv
+
+
+async def list_conversations_for_user(
+    db: AsyncSession,
+    user_id: int,
+    *,
+    limit: Optional[int] = None,
+    before: Optional[tuple[datetime, Optional[int]]] = None,
+) -> list[dict]:
+    """List conversations for user. Returns list of dicts with conversation, other_user_id, last_message."""
+    rows = (await db.execute(conversations_query(user_id, limit=limit, before=before))).all()
+    return [conversation_row(row, user_id) for row in rows]
+
+
+async def get_messages(
+    db: AsyncSession,
+    conversation_id: int,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 50,
+    *,
+    before: Optional[MessageCursor] = None,
+    after: Optional[MessageCursor] = None,
+    newest_first: bool = False,
+) -> list[Message]:
+    """Return messages in conversation (oldest first unless `newest_first`). Only if user is a participant."""
+    conv = await get_conversation_by_id(db, conversation_id, user_id)
+    if conv is None:
+        return []
+    stmt = messages_query(
+        conversation_id, skip=skip, limit=limit, before=before, after=after, newest_first=newest_first
+    ).options(selectinload(Message.attachment))
+    return list((await db.execute(stmt)).scalars().all())
+
+
+async def get_messages_after_id(
+    db: AsyncSession,
+    conversation_id: int,
+    user_id: int,
+    after_id: int,
+    limit: int = 100,
+) -> list[Message]:
+    """Messages newer than message `after_id` (by id). Only if user is a participant."""
+    if await get_conversation_by_id(db, conversation_id, user_id) is None:
+        return []
+    stmt = messages_after_id_query(conversation_id, after_id, limit).options(selectinload(Message.attachment))
+    return list((await db.execute(stmt)).scalars().all())
+
+
+async def get_message_position(
+    db: AsyncSession, conversation_id: int, message_id: int
+) -> Optional[MessageCursor]:
+    """(created_at, id) of a stored message of the conversation, or None."""
+    row = (
+        await db.execute(
+            select(Message.created_at, Message.id).where(
+                Message.id == message_id, Message.conversation_id == conversation_id
+            )
+        )
+    ).one_or_none()
+    return tuple(row) if row is not None else None
+
+
+async def create_message(
+    db: AsyncSession,
+    conversation_id: int,
+    sender_id: int,
+    content: str,
+) -> Optional[Message]:
+    """Add a message. Returns None if conversation doesn't exist or sender is not a participant."""
+    conv = await get_conversation_by_id(db, conversation_id, sender_id)
+    if conv is None:
+        return None
+    msg = Message(conversation_id=conversation_id, sender_id=sender_id, content=content)
+    db.add(msg)
+    await db.flush()
+    await db.execute(record_message_stmt(conv, msg))
+    await db.commit()
+    return await _get_message(db, msg.id)
+
+
+async def create_message_attachment(
+    db: AsyncSession,
+    *,
+    message_id: int,
+    file_name: str,
+    mime_type: str,
+    size_bytes: int,
+    storage_path: str,
+) -> Message:
+    """Attach a file to a message. Returns the message reloaded with its attachment."""
+    row = MessageAttachment(
+        message_id=message_id,
+        file_name=file_name,
+        mime_type=mime_type,
+        size_bytes=size_bytes,
+        storage_path=storage_path,
+    )
+    db.add(row)
+    await db.execute(attachment_preview_stmt(message_id, file_name))
+    await db.commit()
+    return await _get_message(db, message_id)
+
+
+async def mark_conversation_read(db: AsyncSession, conversation_id: int, user_id: int) -> bool:
+    """Mark everything in the conversation read for `user_id`. False if they are not a participant."""
+    conv = await get_conversation_by_id(db, conversation_id, user_id)
+    if conv is None:
+        return False
+    await db.execute(mark_read_stmt(conv, user_id))
+    await db.commit()
+    return True
+
+
+async def get_unread_summary(db: AsyncSession, user_id: int) -> tuple[int, int]:
+    """(conversations with unread messages, total unread messages) for `user_id`."""
+    conversations, messages = (await db.execute(unread_summary_query(user_id))).one()
+    return conversations, messages
+
+
+async def get_attachment_for_user(
+    db: AsyncSession,
+    *,
+    attachment_id: int,
+    user_id: int,
+) -> MessageAttachment | None:
+    stmt = (
+        select(MessageAttachment)
+        .join(Message, Message.id == MessageAttachment.message_id)
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .where(
+            MessageAttachment.id == attachment_id,
+            (Conversation.user1_id == user_id) | (Conversation.user2_id == user_id),
+        )
+        .limit(1)
+    )
+    return (await db.execute(stmt)).scalar_one_or_none()
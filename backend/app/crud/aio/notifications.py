@@ -0,0 +1,110 @@
+"""Async CRUD for notifications, mirroring app.crud.notifications for AsyncSession."""
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Notification, UserDeviceToken, UserNotificationSetting
+
+
+async def create_notification(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    event_type: str,
+    title: str,
+    body: str,
+    payload_json: dict | None = None,
+) -> Notification:
+    row = Notification(
+        user_id=user_id,
+        event_type=event_type,
+        title=title,
+        body=body,
+        payload_json=payload_json,
+    )
+    db.add(row)
+    await db.flush()
+    return row
+
+
+async def list_notifications_for_user(db: AsyncSession, *, user_id: int, limit: int = 50) -> list[Notification]:
+    stmt = (
+        select(Notification)
+        .where(Notification.user_id == user_id)
+        .order_by(desc(Notification.created_at), desc(Notification.id))
+        .limit(limit)
+    )
+    return list((await db.execute(stmt)).scalars().all())
+
+
+async def mark_notification_read(db: AsyncSession, *, notification_id: int, user_id: int) -> Notification | None:
+    stmt = select(Notification).where(Notification.id == notification_id, Notification.user_id == user_id)
+    row = (await db.execute(stmt)).scalar_one_or_none()
+    if row is None:
+        return None
+    row.is_read = True
+    await db.commit()
+    await db.refresh(row)
+    return row
+
+
+async def upsert_device_token(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    token: str,
+    platform: str | None = None,
+) -> UserDeviceToken:
+    stmt = select(UserDeviceToken).where(UserDeviceToken.token == token)
+    row = (await db.execute(stmt)).scalar_one_or_none()
+    if row is None:
+        row = UserDeviceToken(user_id=user_id, token=token, platform=platform)
+        db.add(row)
+    else:
+        row.user_id = user_id
+        row.platform = platform
+    await db.commit()
+    await db.refresh(row)
+    return row
+
+
+async def _get_notification_settings(db: AsyncSession, user_id: int) -> UserNotificationSetting | None:
+    stmt = select(UserNotificationSetting).where(UserNotificationSetting.user_id == user_id)
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+
+async def get_or_create_notification_settings(db: AsyncSession, *, user_id: int) -> UserNotificationSetting:
+    row = await _get_notification_settings(db, user_id)
+    if row is not None:
+        return row
+    row = UserNotificationSetting(
+        user_id=user_id,
+        email_digest_enabled=False,
+        email_digest_frequency="daily",
+    )
+    db.add(row)
+    await db.commit()
+    await db.refresh(row)
+    return row
+
+
+async def update_notification_settings(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    email_digest_enabled: bool,
+    email_digest_frequency: str,
+) -> UserNotificationSetting:
+    row = await _get_notification_settings(db, user_id)
+    if row is None:
+        row = UserNotificationSetting(
+            user_id=user_id,
+            email_digest_enabled=email_digest_enabled,
+            email_digest_frequency=email_digest_frequency,
+        )
+        db.add(row)
+    else:
+        row.email_digest_enabled = email_digest_enabled
+        row.email_digest_frequency = email_digest_frequency
+    await db.commit()
+    await db.refresh(row)
+    return row
@@ -0,0 +1,12 @@
+"""Async user lookups, mirroring app.crud.users for AsyncSession."""
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import User
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    stmt = select(User).where(User.email == email.strip().lower()).limit(1)
+    return (await db.execute(stmt)).scalar_one_or_none()
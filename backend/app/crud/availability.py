@@ -4,6 +4,8 @@ from sqlalchemy.orm import Session  # type: ignore[import]
 
 from app.models import UserAvailability
 from app.schemas import AvailabilityCreate
+from app.services.availability import invalidate_availability
+from app.services.match_cache import bump_generation
 
 
 def get_availability_by_user_id(db: Session, user_id: int) -> list[UserAvailability]:
@@ -26,6 +28,8 @@ def create_availability(
     )
     db.add(slot)
     db.commit()
+    invalidate_availability(user_id)
+    bump_generation("availability")
     db.refresh(slot)
     return slot
 
@@ -40,4 +44,6 @@ def delete_availability(db: Session, slot_id: int, user_id: int) -> bool:
         return False
     db.delete(slot)
     db.commit()
+    invalidate_availability(user_id)
+    bump_generation("availability")
     return True
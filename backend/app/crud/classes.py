@@ -19,6 +19,8 @@ from sqlalchemy import select
 
 from app.models import Class, StudentClass, TutorClass, StudentProfile, TutorProfile
 from app.schemas import ClassCreate, StudentClassCreate, TutorClassCreate
+from app.services.embeddings import index_tutor_class, unindex_tutor_class
+from app.services.match_cache import bump_generation, invalidate_student
 
 
 # ==========================
@@ -125,6 +127,7 @@ def add_student_class(db: Session, student_id: int, data: StudentClassCreate) ->
     db.add(student_class)
     db.commit()
     db.refresh(student_class)
+    invalidate_student(student_class.student.user_id)
     return student_class
 
 
@@ -136,8 +139,10 @@ def get_student_classes_by_student_id(db: Session, student_id: int) -> List[Stud
 
 def delete_student_class(db: Session, student_class: StudentClass) -> None:
     """Remove a student's class enrollment."""
+    student_user_id = student_class.student.user_id
     db.delete(student_class)
     db.commit()
+    invalidate_student(student_user_id)
 
 
 def get_student_class_by_id(db: Session, student_class_id: int) -> Optional[StudentClass]:
@@ -176,7 +181,9 @@ def add_tutor_class(db: Session, tutor_id: int, data: TutorClassCreate) -> Tutor
     )
     db.add(tutor_class)
     db.commit()
+    bump_generation("classes")
     db.refresh(tutor_class)
+    index_tutor_class(tutor_class.tutor.user_id, tutor_class)
     return tutor_class
 
 
@@ -188,8 +195,11 @@ def get_tutor_classes_by_tutor_id(db: Session, tutor_id: int) -> List[TutorClass
 
 def delete_tutor_class(db: Session, tutor_class: TutorClass) -> None:
     """Remove a tutor's class entry."""
+    tutor_class_id = tutor_class.id
     db.delete(tutor_class)
     db.commit()
+    bump_generation("classes")
+    unindex_tutor_class(tutor_class_id)
 
 
 def get_tutor_class_by_id(db: Session, tutor_class_id: int) -> Optional[TutorClass]:
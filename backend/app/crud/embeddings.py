@@ -1,12 +1,26 @@
 from datetime import datetime, timezone
-from typing import Sequence
+from typing import Sequence, TypedDict
 
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.models import StudentProfile, TutorProfile, UserEmbedding
-from app.services.embeddings import embed_text, join_list
+from app.services.embedding_codec import encode_embedding
+from app.services.embedding_index import queue_index_upsert
+from app.services.embeddings import get_embedder, join_list
 
-EMBED_MODEL_NAME = "local-hash-v1"
+EMBED_MODEL_NAME = settings.embed_model_name
+# Rows per INSERT in bulk_upsert_user_embeddings: ~8 bind parameters each, so a
+# statement stays far below the driver's 32767/65535 parameter limits.
+BULK_UPSERT_CHUNK_ROWS = 1000
+
+
+class EmbeddingRow(TypedDict):
+    user_id: int
+    entity_type: str
+    field_name: str
+    embedding: list[float]
 
 
 def upsert_user_embedding(
@@ -30,6 +44,7 @@ def upsert_user_embedding(
     )
     now = datetime.now(timezone.utc)
     values = list(embedding)
+    encoded = encode_embedding(values, settings.embedding_encoding)
 
     if row is None:
         row = UserEmbedding(
@@ -37,61 +52,107 @@ def upsert_user_embedding(
             entity_type=entity_type,
             field_name=field_name,
             model_name=model_name,
-            embedding=values,
             updated_at=now,
+            **encoded,
         )
         db.add(row)
     else:
-        row.embedding = values
+        row.embedding = encoded["embedding"]
+        row.embedding_bin = encoded["embedding_bin"]
+        row.embedding_dtype = encoded["embedding_dtype"]
         row.updated_at = now
 
     db.flush()
+    if entity_type == "tutor":
+        queue_index_upsert(
+            db,
+            user_id=user_id,
+            field_name=field_name,
+            model_name=model_name,
+            embedding=values,
+        )
     return row
 
 
+def bulk_upsert_user_embeddings(
+    db: Session,
+    rows: Sequence[EmbeddingRow],
+    *,
+    model_name: str = EMBED_MODEL_NAME,
+) -> int:
+    """
+    Write many embedding slots with multi-row INSERT ... ON CONFLICT
+    (uq_user_embedding_slot) DO UPDATE statements of at most
+    BULK_UPSERT_CHUNK_ROWS rows each. Does not commit.
+    """
+    if not rows:
+        return 0
+    now = datetime.now(timezone.utc)
+    for start in range(0, len(rows), BULK_UPSERT_CHUNK_ROWS):
+        stmt = insert(UserEmbedding).values(
+            [
+                {
+                    "user_id": row["user_id"],
+                    "entity_type": row["entity_type"],
+                    "field_name": row["field_name"],
+                    "model_name": model_name,
+                    "updated_at": now,
+                    **encode_embedding(row["embedding"], settings.embedding_encoding),
+                }
+                for row in rows[start : start + BULK_UPSERT_CHUNK_ROWS]
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_user_embedding_slot",
+            set_={
+                "embedding": stmt.excluded.embedding,
+                "embedding_bin": stmt.excluded.embedding_bin,
+                "embedding_dtype": stmt.excluded.embedding_dtype,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        db.execute(stmt)
+    for row in rows:
+        if row["entity_type"] == "tutor":
+            queue_index_upsert(
+                db,
+                user_id=row["user_id"],
+                field_name=row["field_name"],
+                model_name=model_name,
+                embedding=row["embedding"],
+            )
+    return len(rows)
+
+
 def refresh_tutor_embeddings(db: Session, tutor: TutorProfile) -> None:
-    upsert_user_embedding(
-        db,
-        user_id=tutor.user_id,
-        entity_type="tutor",
-        field_name="bio",
-        embedding=embed_text(tutor.bio or ""),
-    )
-    upsert_user_embedding(
-        db,
-        user_id=tutor.user_id,
-        entity_type="tutor",
-        field_name="help",
-        embedding=embed_text(join_list(tutor.help_provided)),
-    )
-    upsert_user_embedding(
-        db,
-        user_id=tutor.user_id,
-        entity_type="tutor",
-        field_name="locations",
-        embedding=embed_text(join_list(tutor.preferred_locations)),
-    )
+    texts = {
+        "bio": tutor.bio or "",
+        "help": join_list(tutor.help_provided),
+        "locations": join_list(tutor.preferred_locations),
+    }
+    embed = get_embedder(EMBED_MODEL_NAME)
+    for field_name, embedding in zip(texts, embed(list(texts.values())), strict=True):
+        upsert_user_embedding(
+            db,
+            user_id=tutor.user_id,
+            entity_type="tutor",
+            field_name=field_name,
+            embedding=embedding,
+        )
 
 
 def refresh_student_embeddings(db: Session, student: StudentProfile) -> None:
-    upsert_user_embedding(
-        db,
-        user_id=student.user_id,
-        entity_type="student",
-        field_name="bio",
-        embedding=embed_text(student.bio or ""),
-    )
-    upsert_user_embedding(
-        db,
-        user_id=student.user_id,
-        entity_type="student",
-        field_name="help",
-        embedding=embed_text(join_list(student.help_needed)),
-    )
-    upsert_user_embedding(
-        db,
-        user_id=student.user_id,
-        entity_type="student",
-        field_name="locations",
-        embedding=embed_text(join_list(student.preferred_locations)),
-    )
+    texts = {
+        "bio": student.bio or "",
+        "help": join_list(student.help_needed),
+        "locations": join_list(student.preferred_locations),
+    }
+    embed = get_embedder(EMBED_MODEL_NAME)
+    for field_name, embedding in zip(texts, embed(list(texts.values())), strict=True):
+        upsert_user_embedding(
+            db,
+            user_id=student.user_id,
+            entity_type="student",
+            field_name=field_name,
+            embedding=embedding,
+        )
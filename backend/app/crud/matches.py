@@ -1,9 +1,35 @@
+from typing import Sequence, TypedDict
+
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import delete, desc, insert
 
 from app.models import MatchRun, Match
 
 
+class BatchMatchRun(TypedDict):
+    student_id: int
+    ranked_rows: list[dict]  # from rerank_candidates
+    duration_ms: float
+    stage_timings_json: dict
+
+
+def _match_values(run_id: int, student_id: int, ranked_rows: list[dict]) -> list[dict]:
+    return [
+        {
+            "run_id": run_id,
+            "student_id": student_id,
+            "tutor_id": row["tutor_id"],
+            "rank": idx,
+            "similarity_score": row["final_score"],
+            "embedding_similarity": row.get("embedding_similarity"),
+            "class_strength": row.get("class_strength"),
+            "availability_overlap": row.get("availability_overlap"),
+            "location_match": row.get("location_match"),
+        }
+        for idx, row in enumerate(ranked_rows, start=1)
+    ]
+
+
 def create_match_run(
     db: Session,
     *,
@@ -30,23 +56,14 @@ def insert_matches_for_run(
     student_id: int,
     ranked_rows: list[dict],  # from rerank_candidates
 ) -> list[Match]:
-    out: list[Match] = []
-    for idx, row in enumerate(ranked_rows, start=1):
-        m = Match(
-            run_id=run_id,
-            student_id=student_id,
-            tutor_id=row["tutor_id"],
-            rank=idx,
-            similarity_score=row["final_score"],
-            embedding_similarity=row.get("embedding_similarity"),
-            class_strength=row.get("class_strength"),
-            availability_overlap=row.get("availability_overlap"),
-            location_match=row.get("location_match"),
+    if not ranked_rows:
+        return []
+    return list(
+        db.scalars(
+            insert(Match).returning(Match, sort_by_parameter_order=True),
+            _match_values(run_id, student_id, ranked_rows),
         )
-        db.add(m)
-        out.append(m)
-    db.flush()
-    return out
+    )
 
 
 def save_match_results(
@@ -75,8 +92,60 @@ def save_match_results(
     return run
 
 
-def get_latest_matches_for_student(db: Session, *, student_id: int) -> list[Match]:
-    latest_run = get_latest_match_run_for_student(db, student_id=student_id)
+def save_batch_match_runs(
+    db: Session,
+    runs: Sequence[BatchMatchRun],
+    *,
+    model_name: str,
+    weights_json: dict | None = None,
+) -> int:
+    """
+    Write one "batch" run per student with two multi-row INSERTs, replacing
+    those students' previous batch runs. Returns the number of match rows.
+
+    Does not commit.
+    """
+    if not runs:
+        return 0
+    run_ids = db.scalars(
+        insert(MatchRun).returning(MatchRun.id, sort_by_parameter_order=True),
+        [
+            {
+                "student_id": run["student_id"],
+                "model_name": model_name,
+                "top_k": len(run["ranked_rows"]),
+                "weights_json": weights_json,
+                "source": "batch",
+                "duration_ms": run["duration_ms"],
+                "stage_timings_json": run["stage_timings_json"],
+            }
+            for run in runs
+        ],
+    ).all()
+
+    match_values: list[dict] = []
+    for run_id, run in zip(run_ids, runs, strict=True):
+        match_values.extend(_match_values(run_id, run["student_id"], run["ranked_rows"]))
+    if match_values:
+        db.execute(insert(Match), match_values)
+
+    db.execute(
+        delete(MatchRun).where(
+            MatchRun.source == "batch",
+            MatchRun.student_id.in_([run["student_id"] for run in runs]),
+            MatchRun.id.not_in(run_ids),
+        )
+    )
+    return len(match_values)
+
+
+def get_latest_matches_for_student(
+    db: Session,
+    *,
+    student_id: int,
+    source: str = "interactive",
+) -> list[Match]:
+    latest_run = get_latest_match_run_for_student(db, student_id=student_id, source=source)
     if not latest_run:
         return []
 
@@ -88,10 +157,15 @@ def get_latest_matches_for_student(db: Session, *, student_id: int) -> list[Matc
     )
 
 
-def get_latest_match_run_for_student(db: Session, *, student_id: int) -> MatchRun | None:
+def get_latest_match_run_for_student(
+    db: Session,
+    *,
+    student_id: int,
+    source: str = "interactive",
+) -> MatchRun | None:
     return (
         db.query(MatchRun)
-        .filter(MatchRun.student_id == student_id)
+        .filter(MatchRun.student_id == student_id, MatchRun.source == source)
         .order_by(desc(MatchRun.created_at), desc(MatchRun.id))
         .first()
     )
@@ -153,7 +227,12 @@ def add_match_to_latest_run(
 def has_student_matched_tutor(db: Session, *, student_id: int, tutor_id: int) -> bool:
     existing = (
         db.query(Match.id)
-        .filter(Match.student_id == student_id, Match.tutor_id == tutor_id)
+        .join(MatchRun, MatchRun.id == Match.run_id)
+        .filter(
+            Match.student_id == student_id,
+            Match.tutor_id == tutor_id,
+            MatchRun.source == "interactive",
+        )
         .first()
     )
     return existing is not None
\ No newline at end of file
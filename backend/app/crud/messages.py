@@ -3,12 +3,19 @@ from typing import Optional
 
 - get_or_create_conversation(user1_id, user2_id)
 - get_conversation_by_id(conversation_id, user_id)  # only if user is participant
-- list_conversations_for_user(user_id)
-- get_messages(conversation_id, user_id, skip, limit)
-- create_message(conversation_id, sender_id, content)
+- list_conversations_for_user(user_id, limit, before)  # keyset on (updated_at, id)
+- get_messages(conversation_id, user_id, skip, limit, before, after, newest_first)  # keyset on (created_at, id)
+- get_messages_after_id(conversation_id, user_id, after_id, limit)  # reconnect catch-up
+- get_message_position(conversation_id, message_id)
+- create_message(conversation_id, sender_id, content)  # also updates the conversation's last message / unread
+- mark_conversation_read(conversation_id, user_id)
+- get_unread_summary(user_id)
 """
-from sqlalchemy import desc, select
-from sqlalchemy.orm import Session
+import base64
+from datetime import datetime
+
+from sqlalchemy import Select, Update, and_, case, desc, func, or_, select, tuple_, update
+from sqlalchemy.orm import Session, joinedload
 
 from app.models import Conversation, Message, MessageAttachment, User
 
@@ -47,39 +54,240 @@ def get_conversation_by_id(db: Session, conversation_id: int, user_id: int) -> O
     return conv
 
 
-def list_conversations_for_user(db: Session, user_id: int):
-    """List conversations for user. Returns list of dicts with conversation, other_user_id, last_message."""
+PREVIEW_LENGTH = 200
+
+
+def _for_participant(user_id: int, user1_value, user2_value):
+    """SQL expression picking the user1_* or user2_* column for `user_id`'s side."""
+    return case((Conversation.user1_id == user_id, user1_value), else_=user2_value)
+
+
+def conversations_query(
+    user_id: int,
+    *,
+    limit: Optional[int] = None,
+    before: Optional[tuple[datetime, Optional[int]]] = None,
+) -> Select:
+    """
+    One statement for a user's conversation list, newest first: each row is
+    (Conversation, other user's first_name, last_name, last Message or None).
+    The last message is found by the denormalized last_message_id (a primary key
+    lookup), so no per-conversation scan of messages is needed.
+
+    `before` is the keyset cursor (updated_at, id) of the last row of the
+    previous page; the id breaks ties between equal timestamps and may be None.
+    """
+    other_user_id = _for_participant(user_id, Conversation.user2_id, Conversation.user1_id)
     stmt = (
-        select(Conversation)
-        .where((Conversation.user1_id == user_id) | (Conversation.user2_id == user_id))
-        .order_by(desc(Conversation.updated_at))
+        select(Conversation, User.first_name, User.last_name, Message)
+        .outerjoin(User, User.id == other_user_id)
+        .outerjoin(Message, Message.id == Conversation.last_message_id)
+        .where(or_(Conversation.user1_id == user_id, Conversation.user2_id == user_id))
+        .options(joinedload(Message.attachment))
+        .order_by(desc(Conversation.updated_at), desc(Conversation.id))
     )
-    conversations = list(db.execute(stmt).scalars().all())
-    result = []
-    for conv in conversations:
-        other_id = conv.user2_id if conv.user1_id == user_id else conv.user1_id
-        other_user = db.get(User, other_id)
-        last_msg = (
-            db.execute(
-                select(Message)
-                .where(Message.conversation_id == conv.id)
-                .order_by(desc(Message.created_at))
-                .limit(1)
+    if before is not None:
+        updated_at, conversation_id = before
+        if conversation_id is None:
+            stmt = stmt.where(Conversation.updated_at < updated_at)
+        else:
+            stmt = stmt.where(
+                or_(
+                    Conversation.updated_at < updated_at,
+                    and_(Conversation.updated_at == updated_at, Conversation.id < conversation_id),
+                )
             )
-            .scalar_one_or_none()
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def conversation_row(row, user_id: int) -> dict:
+    """The list item dict for one row of conversations_query."""
+    conv, first_name, last_name, last_msg = row
+    is_user1 = conv.user1_id == user_id
+    return {
+        "id": conv.id,
+        "user1_id": conv.user1_id,
+        "user2_id": conv.user2_id,
+        "created_at": conv.created_at,
+        "updated_at": conv.updated_at,
+        "other_user_id": conv.user2_id if is_user1 else conv.user1_id,
+        "other_user_first_name": first_name,
+        "other_user_last_name": last_name,
+        "last_message": last_msg,
+        "last_message_at": conv.last_message_at,
+        "last_message_preview": conv.last_message_preview,
+        "unread_count": conv.user1_unread_count if is_user1 else conv.user2_unread_count,
+    }
+
+
+def _created_at(msg: Message):
+    # vars(): reading an unloaded attribute would lazy-load, which AsyncSession can't
+    return vars(msg).get("created_at") or func.now()
+
+
+def _newer_than_last(msg: Message):
+    """SQL predicate: `msg` sorts after the conversation's stored last message by (created_at, id)."""
+    return or_(
+        Conversation.last_message_at.is_(None),
+        tuple_(Conversation.last_message_at, Conversation.last_message_id) < tuple_(_created_at(msg), msg.id),
+    )
+
+
+def record_message_stmt(conv: Conversation, msg: Message) -> Update:
+    """
+    UPDATE making flushed `msg` the conversation's last message: bumps
+    updated_at, counts it unread for the recipient and moves the sender's read
+    cursor past it. The row lock orders concurrent senders; a message older
+    than the stored last message by (created_at, id), e.g. an earlier insert
+    committing later, only adds to the unread count.
+    """
+    return record_messages_stmt(conv, [msg])
+
+
+def record_messages_stmt(conv: Conversation, messages: list[Message]) -> Update:
+    """
+    record_message_stmt for several messages of one conversation, in order, in
+    a single UPDATE (write-behind batches). A message whose created_at is not
+    loaded (flushed with the server default) is stamped with now(), the same
+    transaction timestamp.
+    """
+    last = messages[-1]
+    last_at = _created_at(last)
+    newer = _newer_than_last(last)
+    values = {
+        Conversation.last_message_id: case((newer, last.id), else_=Conversation.last_message_id),
+        Conversation.last_message_at: case((newer, last_at), else_=Conversation.last_message_at),
+        Conversation.last_message_preview: case(
+            (newer, last.content[:PREVIEW_LENGTH]), else_=Conversation.last_message_preview
+        ),
+        Conversation.updated_at: func.now(),
+    }
+    for side, user_id in (("user1", conv.user1_id), ("user2", conv.user2_id)):
+        unread = getattr(Conversation, f"{side}_unread_count")
+        cursor = getattr(Conversation, f"{side}_last_read_message_id")
+        sent = [i for i, m in enumerate(messages) if m.sender_id == user_id]
+        if sent:
+            # Sending means having read up to here: unread restarts after their last
+            # message, unless a newer message is already stored (this one committed
+            # late), in which case the others' messages after it just add up. Ids
+            # from write-behind blocks aren't ordered across processes, so the
+            # cursor moves by (created_at, id) like last_message_id does.
+            own = messages[sent[-1]]
+            values[cursor] = case((_newer_than_last(own), own.id), else_=cursor)
+            after_sent = len(messages) - 1 - sent[-1]
+            values[unread] = case((newer, after_sent), else_=unread + after_sent)
+        else:
+            values[unread] = unread + len(messages)
+    return (
+        update(Conversation)
+        .where(Conversation.id == conv.id)
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def attachment_preview_stmt(message_id: int, file_name: str) -> Update:
+    """Use the file name as the preview when the last message is an attachment without text."""
+    return (
+        update(Conversation)
+        .where(
+            Conversation.id == select(Message.conversation_id).where(Message.id == message_id).scalar_subquery(),
+            Conversation.last_message_id == message_id,
+            Conversation.last_message_preview == "",
+        )
+        .values(last_message_preview=file_name[:PREVIEW_LENGTH], updated_at=Conversation.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def mark_read_stmt(conv: Conversation, user_id: int) -> Update:
+    """UPDATE moving `user_id`'s read cursor to the last message and clearing their unread count."""
+    prefix = "user1" if user_id == conv.user1_id else "user2"
+    return (
+        update(Conversation)
+        .where(Conversation.id == conv.id)
+        .values(
+            {
+                getattr(Conversation, f"{prefix}_last_read_message_id"): Conversation.last_message_id,
+                getattr(Conversation, f"{prefix}_unread_count"): 0,
+                # Reading doesn't reorder the inbox: keep updated_at (skips its onupdate)
+                Conversation.updated_at: Conversation.updated_at,
+            }
         )
-        result.append({
-            "id": conv.id,
-            "user1_id": conv.user1_id,
-            "user2_id": conv.user2_id,
-            "created_at": conv.created_at,
-            "updated_at": conv.updated_at,
-            "other_user_id": other_id,
-            "other_user_first_name": other_user.first_name if other_user else None,
-            "other_user_last_name": other_user.last_name if other_user else None,
-            "last_message": last_msg,
-        })
-    return result
+        .execution_options(synchronize_session=False)
+    )
+
+
+def unread_summary_query(user_id: int) -> Select:
+    """(conversations with unread messages, total unread messages) for `user_id`'s badge."""
+    unread = _for_participant(user_id, Conversation.user1_unread_count, Conversation.user2_unread_count)
+    return select(
+        func.count().filter(unread > 0),
+        func.coalesce(func.sum(unread), 0),
+    ).where(or_(Conversation.user1_id == user_id, Conversation.user2_id == user_id))
+
+
+def list_conversations_for_user(
+    db: Session,
+    user_id: int,
+    *,
+    limit: Optional[int] = None,
+    before: Optional[tuple[datetime, Optional[int]]] = None,
+) -> list[dict]:
+    """List conversations for user. Returns list of dicts with conversation, other_user_id, last_message."""
+    rows = db.execute(conversations_query(user_id, limit=limit, before=before)).all()
+    return [conversation_row(row, user_id) for row in rows]
+
+
+MessageCursor = tuple[datetime, int]
+
+
+def encode_message_cursor(msg: Message) -> str:
+    """Opaque cursor for `msg`'s position in its conversation: (created_at, id)."""
+    raw = f"{msg.created_at.isoformat()}|{msg.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_message_cursor(cursor: str) -> MessageCursor:
+    """Inverse of encode_message_cursor. Raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, message_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Invalid message cursor") from e
+
+
+def messages_query(
+    conversation_id: int,
+    *,
+    skip: int = 0,
+    limit: int = 50,
+    before: Optional[MessageCursor] = None,
+    after: Optional[MessageCursor] = None,
+    newest_first: bool = False,
+) -> Select:
+    """
+    A page of a conversation's messages ordered by (created_at, id), which the
+    (conversation_id, created_at, id) index serves directly. `before` / `after`
+    are exclusive keyset bounds; prefer them to `skip`, whose OFFSET rescans
+    every skipped row.
+    """
+    position = tuple_(Message.created_at, Message.id)
+    stmt = select(Message).where(Message.conversation_id == conversation_id)
+    if before is not None:
+        stmt = stmt.where(position < tuple_(*before))
+    if after is not None:
+        stmt = stmt.where(position > tuple_(*after))
+    if newest_first:
+        stmt = stmt.order_by(desc(Message.created_at), desc(Message.id))
+    else:
+        stmt = stmt.order_by(Message.created_at, Message.id)
+    if skip:
+        stmt = stmt.offset(skip)
+    return stmt.limit(limit)
 
 
 def get_messages(
@@ -88,19 +296,52 @@ def get_messages(
     user_id: int,
     skip: int = 0,
     limit: int = 50,
+    *,
+    before: Optional[MessageCursor] = None,
+    after: Optional[MessageCursor] = None,
+    newest_first: bool = False,
 ) -> list[Message]:
-    """Return messages in conversation (oldest first). Only if user is a participant."""
+    """Return messages in conversation (oldest first unless `newest_first`). Only if user is a participant."""
     conv = get_conversation_by_id(db, conversation_id, user_id)
     if conv is None:
         return []
-    stmt = (
+    stmt = messages_query(
+        conversation_id, skip=skip, limit=limit, before=before, after=after, newest_first=newest_first
+    )
+    return list(db.execute(stmt).scalars().all())
+
+
+def messages_after_id_query(conversation_id: int, after_id: int, limit: int) -> Select:
+    """The next `limit` messages with id > `after_id`, by id: what a reconnecting client missed."""
+    return (
         select(Message)
-        .where(Message.conversation_id == conversation_id)
-        .order_by(Message.created_at)
-        .offset(skip)
+        .where(Message.conversation_id == conversation_id, Message.id > after_id)
+        .order_by(Message.id)
         .limit(limit)
     )
-    return list(db.execute(stmt).scalars().all())
+
+
+def get_messages_after_id(
+    db: Session,
+    conversation_id: int,
+    user_id: int,
+    after_id: int,
+    limit: int = 100,
+) -> list[Message]:
+    """Messages newer than message `after_id` (by id). Only if user is a participant."""
+    if get_conversation_by_id(db, conversation_id, user_id) is None:
+        return []
+    return list(db.execute(messages_after_id_query(conversation_id, after_id, limit)).scalars().all())
+
+
+def get_message_position(db: Session, conversation_id: int, message_id: int) -> Optional[MessageCursor]:
+    """(created_at, id) of a stored message of the conversation, or None."""
+    row = db.execute(
+        select(Message.created_at, Message.id).where(
+            Message.id == message_id, Message.conversation_id == conversation_id
+        )
+    ).one_or_none()
+    return tuple(row) if row is not None else None
 
 
 def create_message(
@@ -115,6 +356,8 @@ def create_message(
         return None
     msg = Message(conversation_id=conversation_id, sender_id=sender_id, content=content)
     db.add(msg)
+    db.flush()
+    db.execute(record_message_stmt(conv, msg))
     db.commit()
     db.refresh(msg)
     return msg
@@ -137,11 +380,28 @@ def create_message_attachment(
         storage_path=storage_path,
     )
     db.add(row)
+    db.execute(attachment_preview_stmt(message_id, file_name))
     db.commit()
     db.refresh(row)
     return row
 
 
+def mark_conversation_read(db: Session, conversation_id: int, user_id: int) -> bool:
+    """Mark everything in the conversation read for `user_id`. False if they are not a participant."""
+    conv = get_conversation_by_id(db, conversation_id, user_id)
+    if conv is None:
+        return False
+    db.execute(mark_read_stmt(conv, user_id))
+    db.commit()
+    return True
+
+
+def get_unread_summary(db: Session, user_id: int) -> tuple[int, int]:
+    """(conversations with unread messages, total unread messages) for `user_id`."""
+    conversations, messages = db.execute(unread_summary_query(user_id)).one()
+    return conversations, messages
+
+
 def get_attachment_for_user(
     db: Session,
     *,
@@ -11,8 +11,11 @@ from typing import Optional, List
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 
+from app.crud.embeddings import refresh_tutor_embeddings
 from app.models import TutorProfile, User, TutorClass, Class
 from app.schemas import TutorProfileCreate, TutorProfileUpdate
+from app.services.embedding_index import queue_index_removal
+from app.services.principal_cache import invalidate_principal
 
 
 def create_tutor_profile(db: Session, user_id: int, data: TutorProfileCreate) -> TutorProfile:
@@ -38,7 +41,10 @@ def create_tutor_profile(db: Session, user_id: int, data: TutorProfileCreate) ->
         grad_year=data.grad_year,
     )
     db.add(tutor)
+    db.flush()
+    refresh_tutor_embeddings(db, tutor)
     db.commit()
+    invalidate_principal(user_id)
     db.refresh(tutor)
     return tutor
 
@@ -59,6 +65,7 @@ def update_tutor_profile(db: Session, tutor: TutorProfile, data: TutorProfileUpd
     """Update a tutor profile."""
     if data.bio is not None:
         tutor.bio = data.bio
+        refresh_tutor_embeddings(db, tutor)
     if data.hourly_rate_cents is not None:
         tutor.hourly_rate_cents = data.hourly_rate_cents
     if data.major is not None:
@@ -74,9 +81,12 @@ def update_tutor_profile(db: Session, tutor: TutorProfile, data: TutorProfileUpd
 def delete_tutor_profile(db: Session, tutor: TutorProfile) -> None:
     """Delete a tutor profile."""
     # Also update user.is_tutor to False
+    user_id = tutor.user_id
     tutor.user.is_tutor = False
+    queue_index_removal(db, user_id=user_id)
     db.delete(tutor)
     db.commit()
+    invalidate_principal(user_id)
 
 
 def list_tutors(
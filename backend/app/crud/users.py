@@ -5,6 +5,10 @@ from app.auth import hash_password
 from app.crud.embeddings import refresh_student_embeddings, refresh_tutor_embeddings
 from app.models import User, TutorProfile, StudentProfile, TutorClass, StudentClass
 from app.schemas import ProfileUpdate, UserCreate, SecurityPreferencesUpdate
+from app.services.availability import invalidate_availability
+from app.services.embedding_index import queue_index_removal
+from app.services.match_cache import bump_generation, invalidate_student
+from app.services.principal_cache import invalidate_principal
 
 
 
@@ -16,10 +20,11 @@ def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
     return db.get(User, user_id)
 
 
-def create_user(db: Session, data: UserCreate) -> User:
+def create_user(db: Session, data: UserCreate, *, hashed_password: str | None = None) -> User:
     """
     Create a new User (and optional Tutor/Student profiles) from a UserCreate schema.
-    Password is hashed before storing.
+    Password is hashed before storing, unless the caller already hashed it
+    (off the request thread) and passes `hashed_password`.
     """
     email = str(data.email).strip().lower()
     existing = get_user_by_email(db, email)
@@ -30,7 +35,7 @@ def create_user(db: Session, data: UserCreate) -> User:
         email=email,
         first_name=data.first_name,
         last_name=data.last_name,
-        hashed_password=hash_password(data.password),
+        hashed_password=hashed_password or hash_password(data.password),
         is_tutor=data.is_tutor,
         is_student=data.is_student,
     )
@@ -94,6 +99,8 @@ def create_user(db: Session, data: UserCreate) -> User:
 
 def update_user_profile(db: Session, user: User, data: ProfileUpdate) -> User:
     """Update user first/last name and optionally tutor/student profile fields."""
+    tutor_classes_changed = False
+    student_profile_changed = False
     if data.first_name is not None:
         user.first_name = data.first_name
     if data.last_name is not None:
@@ -134,10 +141,12 @@ def update_user_profile(db: Session, user: User, data: ProfileUpdate) -> User:
                     )
                 )
             tutor_embedding_needs_refresh = True
+            tutor_classes_changed = True
         if tutor_embedding_needs_refresh:
             refresh_tutor_embeddings(db, user.tutor)
     if data.student_profile is not None and user.student is not None:
         s = data.student_profile
+        student_profile_changed = True
         student_embedding_needs_refresh = False
         if s.bio is not None:
             user.student.bio = s.bio
@@ -155,14 +164,24 @@ def update_user_profile(db: Session, user: User, data: ProfileUpdate) -> User:
         if student_embedding_needs_refresh:
             refresh_student_embeddings(db, user.student)
     db.commit()
+    if tutor_classes_changed:
+        bump_generation("classes")
+    if student_profile_changed:
+        invalidate_student(user.id)
+    invalidate_principal(user.id)
     db.refresh(user)
     return user
 
 
 def delete_user(db: Session, user: User) -> None:
     """Permanently delete a user and all related data (cascade)."""
+    user_id = user.id
+    queue_index_removal(db, user_id=user_id)
     db.delete(user)
     db.commit()
+    invalidate_availability(user_id)
+    invalidate_student(user_id)
+    invalidate_principal(user_id)
 
 
 # change a user's security preferences
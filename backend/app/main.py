@@ -1,6 +1,14 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.auth import get_current_principal
+from app.config import settings
+from app.database import async_engine
+from app.services.broker import close_broker
+from app.services.message_writer import close_message_writers
+from app.services.password_hashing import get_password_hasher
 from app.routers import (
     auth,
     users,
@@ -13,9 +21,23 @@ from app.routers import (
     messages,
     matches,
     notifications,
+    metrics,
+    gateway,
 )
 
-app = FastAPI(title="BoilerTutors API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Write pending chat messages before the broker and engine go away
+    await close_message_writers()
+    get_password_hasher().shutdown()
+    await close_broker()
+    # asyncpg connections belong to this event loop; close them with it
+    await async_engine.dispose()
+
+
+app = FastAPI(title="BoilerTutors API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +50,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -41,6 +64,11 @@ app.include_router(availability.router, prefix="/availability", tags=["availabil
 app.include_router(messages.router, prefix="/messages", tags=["messages"])
 app.include_router(matches.router, prefix="/matches", tags=["matches"])
 app.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
+if settings.metrics_enabled:
+    app.include_router(
+        metrics.router, prefix="/metrics", tags=["metrics"], dependencies=[Depends(get_current_principal)]
+    )
+app.include_router(gateway.router, prefix="/gateway", tags=["gateway"])
 
 
 @app.get("/")
@@ -16,7 +16,11 @@ from sqlalchemy import (
     Float,
     CheckConstraint,
     JSON,
+    LargeBinary,
+    Index,
+    desc,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
 
@@ -117,6 +121,9 @@ class UserEmbedding(Base):
         ),
         CheckConstraint("entity_type IN ('student', 'tutor')", name="ck_embedding_entity"),
         CheckConstraint("field_name IN ('bio', 'help', 'locations')", name="ck_embedding_field"),
+        CheckConstraint(
+            "embedding IS NOT NULL OR embedding_bin IS NOT NULL", name="ck_embedding_present"
+        ),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -128,7 +135,11 @@ class UserEmbedding(Base):
     entity_type: Mapped[str] = mapped_column(String(16), nullable=False)
     field_name: Mapped[str] = mapped_column(String(32), nullable=False)
     model_name: Mapped[str] = mapped_column(String(128), nullable=False, default="local-hash-v1")
-    embedding: Mapped[list[float]] = mapped_column(ARRAY(Float), nullable=False)
+    # Exactly one of embedding / embedding_bin is set, per settings.embedding_encoding;
+    # read through app.services.embedding_codec.decode_row.
+    embedding: Mapped[Optional[list[float]]] = mapped_column(ARRAY(Float), nullable=True)
+    embedding_bin: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    embedding_dtype: Mapped[Optional[str]] = mapped_column(String(8), nullable=True)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
@@ -432,6 +443,9 @@ class Conversation(Base):
     __tablename__ = "conversations"
     __table_args__ = (
         UniqueConstraint("user1_id", "user2_id", name="uq_conversation_pair"),
+        # Inbox listing: a participant's conversations by recency
+        Index("ix_conversations_user1_recent", "user1_id", "updated_at", "id"),
+        Index("ix_conversations_user2_recent", "user2_id", "updated_at", "id"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -452,6 +466,18 @@ class Conversation(Base):
         nullable=False,
     )
 
+    # Denormalized from messages, kept in step by crud.messages.create_message.
+    # last_message_id is a plain id (no FK) to avoid a conversations <-> messages cycle.
+    last_message_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    last_message_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_message_preview: Mapped[Optional[str]] = mapped_column(String(200), nullable=True)
+
+    # Per-participant read cursor (last message id seen) and unread count
+    user1_last_read_message_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    user2_last_read_message_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    user1_unread_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    user2_unread_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+
     messages: Mapped[list["Message"]] = relationship(
         back_populates="conversation",
         cascade="all, delete-orphan",
@@ -461,6 +487,10 @@ class Conversation(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # History pages: keyset on (created_at, id) within a conversation
+        Index("ix_messages_conversation_created_id", "conversation_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     conversation_id: Mapped[int] = mapped_column(
@@ -586,6 +616,9 @@ class TutorClass(Base):
 
 class MatchRun(Base):
     __tablename__ = "match_runs"
+    __table_args__ = (
+        Index("ix_match_runs_student_source_created", "student_id", "source", desc("created_at")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     student_id: Mapped[int] = mapped_column(
@@ -594,6 +627,13 @@ class MatchRun(Base):
     model_name: Mapped[str] = mapped_column(String(128), nullable=False, default="local-hash-v1")
     top_k: Mapped[int] = mapped_column(Integer, nullable=False)
     weights_json: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    # "interactive" runs hold the matches a student selected; "batch" runs are
+    # precomputed recommendations written by app.services.match_materializer.
+    source: Mapped[str] = mapped_column(
+        String(16), nullable=False, default="interactive", server_default="interactive"
+    )
+    duration_ms: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    stage_timings_json: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), nullable=False, server_default=func.now()
     )
@@ -5,12 +5,14 @@ import secrets
 from datetime import datetime, timedelta, timezone
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.auth import verify_password, create_access_token
+from app.auth import verify_password_async, create_access_token
 from app.config import settings
+from app.crud.aio.users import get_user_by_email as get_user_by_email_async
 from app.crud.users import get_user_by_email
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app.schemas import LoginRequest, LoginResponse, MfaVerifyRequest, Token
 from app.services.email import send_otp_email
 
@@ -22,13 +24,13 @@ def _generate_otp() -> str:
 
 
 @router.post("/login", response_model=LoginResponse)
-def login(
+async def login(
     data: LoginRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user_by_email(db, data.email)
-    if not user or not verify_password(data.password, user.hashed_password):
+    user = await get_user_by_email_async(db, data.email)
+    if not user or not await verify_password_async(data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -44,7 +46,7 @@ def login(
         minutes=settings.mfa_code_expire_minutes
     )
     user.mfa_code_attempts = 0
-    db.commit()
+    await db.commit()
 
     background_tasks.add_task(send_otp_email, user.email, otp)
 
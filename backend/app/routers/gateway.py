@@ -0,0 +1,204 @@
+"""Multiplexed realtime WebSocket: chat and notifications on one socket.
+
+WebSocket:
+- WS     /gateway/ws?token=...             - one socket per client
+
+Client frames (JSON):
+- {"type": "subscribe", "conversation_id": 1}    -> {"type": "subscribed", "conversation_id": 1}
+- {"type": "subscribe", "conversation_id": 1, "last_message_id": 41}
+                                                 -> subscribed, then {"type": "history", ...} batches
+                                                    of the messages after 41 (may repeat a few already
+                                                    seen ones: dedupe by id), then {"type": "live", ...}
+- {"type": "unsubscribe", "conversation_id": 1}  -> {"type": "unsubscribed", "conversation_id": 1}
+- {"type": "send", "conversation_id": 1, "content": "hi", "client_id": "..."}
+                                                 -> {"type": "sent", "conversation_id": 1, "message_id": 5, "client_id": "..."}
+                                                    (with CHAT_WRITE_BEHIND, once the message is saved)
+- {"type": "ping"}                               -> {"type": "pong"}
+
+Server frames:
+- {"type": "message", "conversation_id": 1, "message": {...MessagePublic}}  (subscribed conversations)
+- {"type": "notification", "notification": {...}}                           (always)
+- {"type": "error", "detail": "...", ...}
+
+The socket holds no database session. Each frame that needs the database
+checks out its own short-lived session.
+"""
+import asyncio
+import json
+from functools import partial
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.auth import get_principal_from_token_async
+from app.config import settings
+from app.crud.aio import messages as crud_messages
+from app.database import get_async_sessionmaker
+from app.models import Conversation
+from app.services.chat import catch_up, post_chat_message, submit_chat_message
+from app.services.gateway_ws import GatewayConnection, gateway_manager
+from app.services.principal_cache import Principal
+
+router = APIRouter()
+
+MAX_SUBSCRIPTIONS = 200
+
+
+def _error(detail: str, frame: dict) -> dict:
+    error = {"type": "error", "detail": detail}
+    for key in ("conversation_id", "client_id"):
+        if key in frame:
+            error[key] = frame[key]
+    return error
+
+
+async def _handle_frame(
+    connection: GatewayConnection,
+    principal: Principal,
+    frame: dict,
+    sessions: async_sessionmaker[AsyncSession],
+) -> None:
+    kind = frame.get("type")
+    if kind == "ping":
+        connection.send({"type": "pong"})
+        return
+    if kind not in ("subscribe", "unsubscribe", "send"):
+        connection.send(_error("Unknown frame type", frame))
+        return
+
+    conversation_id = frame.get("conversation_id")
+    if not isinstance(conversation_id, int) or isinstance(conversation_id, bool):
+        connection.send(_error("conversation_id is required", frame))
+        return
+
+    if kind == "unsubscribe":
+        await gateway_manager.unsubscribe(connection, conversation_id)
+        connection.send({"type": "unsubscribed", "conversation_id": conversation_id})
+        return
+
+    if kind == "subscribe":
+        if conversation_id in connection.conversations:
+            connection.send({"type": "subscribed", "conversation_id": conversation_id})
+            return
+        last_message_id = frame.get("last_message_id")
+        if last_message_id is not None and (not isinstance(last_message_id, int) or isinstance(last_message_id, bool)):
+            connection.send(_error("last_message_id must be an integer", frame))
+            return
+        if len(connection.conversations) >= MAX_SUBSCRIPTIONS:
+            connection.send(_error("Too many subscriptions", frame))
+            return
+        if await _verified_conversation(connection, principal, conversation_id, sessions) is None:
+            connection.send(_error("Conversation not found or not allowed", frame))
+            return
+        connection.send({"type": "subscribed", "conversation_id": conversation_id})
+        sender = connection.sender
+        if last_message_id is None or sender is None:
+            await gateway_manager.subscribe(connection, conversation_id)
+            return
+        # Hold live frames from the moment of subscribing until the replay is out
+        sender.hold()
+        await gateway_manager.subscribe(connection, conversation_id)
+        await catch_up(
+            sender,
+            sessions,
+            conversation_id=conversation_id,
+            user_id=principal.id,
+            last_message_id=last_message_id,
+            message_id_of=lambda payload: (
+                payload["message"].get("id")
+                if payload.get("type") == "message" and payload.get("conversation_id") == conversation_id
+                else None
+            ),
+        )
+        return
+
+    content = frame.get("content")
+    if not isinstance(content, str) or not content.strip():
+        connection.send(_error("Message content is required", frame))
+        return
+    conv = await _verified_conversation(connection, principal, conversation_id, sessions)
+    if conv is None:
+        connection.send(_error("Conversation not found or not allowed", frame))
+        return
+    if settings.chat_write_behind:
+        pending = await submit_chat_message(
+            conversation=conv, sender=principal, content=content.strip(), sessions=sessions
+        )
+        pending.saved.add_done_callback(partial(_ack_saved, connection, frame, pending.message.id))
+        return
+    async with sessions() as db:
+        msg = await post_chat_message(db, conversation=conv, sender=principal, content=content.strip())
+    if msg is None:
+        connection.send(_error("Conversation not found or not allowed", frame))
+        return
+    connection.send(_sent(frame, msg.id))
+
+
+async def _verified_conversation(
+    connection: GatewayConnection,
+    principal: Principal,
+    conversation_id: int,
+    sessions: async_sessionmaker[AsyncSession],
+) -> Conversation | None:
+    """The conversation if `principal` participates in it, checked once per connection."""
+    conv = connection.verified.get(conversation_id)
+    if conv is None:
+        async with sessions() as db:
+            conv = await crud_messages.get_conversation_by_id(db, conversation_id, principal.id)
+        if conv is not None:
+            connection.verified[conversation_id] = conv
+    return conv
+
+
+def _sent(frame: dict, message_id: int) -> dict:
+    return {
+        "type": "sent",
+        "conversation_id": frame["conversation_id"],
+        "message_id": message_id,
+        "client_id": frame.get("client_id"),
+    }
+
+
+def _ack_saved(connection: GatewayConnection, frame: dict, message_id: int, saved: asyncio.Future) -> None:
+    """Write-behind: ack the sender once the message's batch commits (or report that it failed)."""
+    if saved.cancelled() or saved.exception() is not None:
+        error = _error("Message could not be saved", frame)
+        error["message_id"] = message_id
+        connection.send(error)
+    else:
+        connection.send(_sent(frame, message_id))
+
+
+@router.websocket("/ws")
+async def gateway_websocket(
+    websocket: WebSocket,
+    sessions: async_sessionmaker[AsyncSession] = Depends(get_async_sessionmaker),
+):
+    token = websocket.query_params.get("token")
+    if not token:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Not authenticated")
+        return
+
+    try:
+        async with sessions() as db:
+            principal = await get_principal_from_token_async(token, db)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid token")
+        return
+
+    connection = await gateway_manager.connect(websocket, principal.id)
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                frame = json.loads(text)
+            except ValueError:
+                frame = None
+            if not isinstance(frame, dict):
+                connection.send({"type": "error", "detail": "Frames must be JSON objects"})
+                continue
+            await _handle_frame(connection, principal, frame, sessions)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await gateway_manager.disconnect(connection)
@@ -1,16 +1,26 @@
+from datetime import datetime, timedelta, timezone
+
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
 
-from app.auth import get_current_user
-from app.crud.matches import (
-    add_match_to_latest_run,
-    get_latest_matches_for_student,
-    has_student_matched_tutor,
-)
-from app.database import get_db
-from app.models import TutorProfile, User
+from app.auth import get_current_user, get_current_user_async
+from app.config import settings
+from app.crud.aio import matches as crud_matches_async
+from app.crud.embeddings import EMBED_MODEL_NAME
+from app.crud.matches import get_latest_match_run_for_student
+from app.database import get_async_db, get_db, get_sessionmaker
+from app.models import Match, MatchRun, TutorProfile, User
 from app.schemas import MatchResultPublic, MatchSelectRequest
-from app.services.embeddings import knn_retrieve_candidates, rerank_candidates
+from app.services.embeddings import (
+    RERANK_WEIGHTS,
+    rerank_candidates,
+    retrieve_match_candidates,
+    sync_tutor_index_for_retrieval,
+)
+from app.services.match_cache import candidate_cache_key, get_cached_candidates, store_candidates
 from app.services.notification_events import build_and_store_notification, emit_notification
 
 router = APIRouter()
@@ -55,8 +65,22 @@ def _serialize_reranked_rows(db: Session, reranked: list[dict]) -> list[MatchRes
     return response
 
 
-def _build_saved_match_payload(db: Session, current_user_id: int) -> list[MatchResultPublic]:
-    latest_matches = get_latest_matches_for_student(db, student_id=current_user_id)
+async def _build_saved_match_payload(db: AsyncSession, current_user_id: int) -> list[MatchResultPublic]:
+    latest_matches = await crud_matches_async.get_latest_matches_for_student(db, student_id=current_user_id)
+    if not latest_matches:
+        return []
+
+    tutor_user_ids = [m.tutor_id for m in latest_matches]
+    tutors = await db.scalars(select(TutorProfile).where(TutorProfile.user_id.in_(tutor_user_ids)))
+    users = await db.scalars(select(User).where(User.id.in_(tutor_user_ids)))
+    return _match_results(
+        latest_matches,
+        {t.user_id: t for t in tutors},
+        {u.id: u for u in users},
+    )
+
+
+def _serialize_matches(db: Session, latest_matches: list[Match]) -> list[MatchResultPublic]:
     if not latest_matches:
         return []
 
@@ -69,7 +93,14 @@ def _build_saved_match_payload(db: Session, current_user_id: int) -> list[MatchR
         u.id: u
         for u in db.query(User).filter(User.id.in_(tutor_user_ids)).all()
     }
+    return _match_results(latest_matches, tutors_by_user_id, users_by_id)
+
 
+def _match_results(
+    latest_matches: list[Match],
+    tutors_by_user_id: dict[int, TutorProfile],
+    users_by_id: dict[int, User],
+) -> list[MatchResultPublic]:
     response: list[MatchResultPublic] = []
     for match in latest_matches:
         tutor_user = users_by_id.get(match.tutor_id)
@@ -95,22 +126,86 @@ def _build_saved_match_payload(db: Session, current_user_id: int) -> list[MatchR
 
 
 def _compute_reranked_rows(db: Session, student_user_id: int) -> list[dict]:
-    candidates = knn_retrieve_candidates(
+    sync_tutor_index_for_retrieval(db, EMBED_MODEL_NAME)
+    cache_key = candidate_cache_key(EMBED_MODEL_NAME)
+    candidate_tutor_ids = retrieve_match_candidates(
         db,
         student_id=student_user_id,
         top_k=50,
-        model_name="local-hash-v1",
+        model_name=EMBED_MODEL_NAME,
     )
-    candidate_tutor_ids = [row["tutor_id"] for row in candidates]
-    return rerank_candidates(
+    reranked = rerank_candidates(
         db,
         student_id=student_user_id,
         candidate_tutor_ids=candidate_tutor_ids,
         top_k=10,
-        model_name="local-hash-v1",
+        model_name=EMBED_MODEL_NAME,
+    )
+    store_candidates(student_user_id, cache_key, reranked)
+    return reranked
+
+
+def _compute_reranked_rows_in_session(sessions: sessionmaker[Session], student_user_id: int) -> list[dict]:
+    """_compute_reranked_rows on its own sync session, for async handlers to run in the threadpool."""
+    with sessions() as db:
+        return _compute_reranked_rows(db, student_user_id)
+
+
+def _fresh_batch_matches(db: Session, student_user_id: int) -> list[Match] | None:
+    """Rows of the student's latest precomputed run, unless it is missing or too old."""
+    return _batch_run_matches(
+        get_latest_match_run_for_student(db, student_id=student_user_id, source="batch")
     )
 
 
+def _batch_run_matches(run: MatchRun | None) -> list[Match] | None:
+    if run is None:
+        return None
+    max_age = timedelta(minutes=settings.match_batch_max_age_minutes)
+    if run.created_at < datetime.now(timezone.utc) - max_age:
+        return None
+    return sorted(run.matches, key=lambda match: match.rank)
+
+
+async def _find_selectable_candidate(
+    db: AsyncSession,
+    sessions: sessionmaker[Session],
+    student_user_id: int,
+    tutor_id: int,
+) -> dict | None:
+    """
+    The ranked row for `tutor_id` if the student could have been shown it: from
+    the cached /me/refresh result, the fresh batch run, or a live recompute
+    when neither is available.
+    """
+    cached = get_cached_candidates(student_user_id, candidate_cache_key(EMBED_MODEL_NAME))
+    if cached is not None:
+        selected = next((row for row in cached if int(row["tutor_id"]) == tutor_id), None)
+        if selected is not None:
+            return selected
+
+    batch_matches = _batch_run_matches(
+        await crud_matches_async.get_latest_match_run_for_student(
+            db, student_id=student_user_id, source="batch", with_matches=True
+        )
+    )
+    batch_match = next((m for m in batch_matches or [] if m.tutor_id == tutor_id), None)
+    if batch_match is not None:
+        return {
+            "tutor_id": batch_match.tutor_id,
+            "final_score": batch_match.similarity_score,
+            "embedding_similarity": batch_match.embedding_similarity,
+            "class_strength": batch_match.class_strength,
+            "availability_overlap": batch_match.availability_overlap,
+            "location_match": batch_match.location_match,
+        }
+
+    if cached is None:
+        reranked = await run_in_threadpool(_compute_reranked_rows_in_session, sessions, student_user_id)
+        return next((row for row in reranked if int(row["tutor_id"]) == tutor_id), None)
+    return None
+
+
 @router.post("/me/refresh", response_model=list[MatchResultPublic])
 def refresh_my_match_candidates(
     db: Session = Depends(get_db),
@@ -126,11 +221,30 @@ def refresh_my_match_candidates(
     return _serialize_reranked_rows(db, reranked)
 
 
+@router.get("/me/recommended", response_model=list[MatchResultPublic])
+def get_my_recommended_matches(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> list[MatchResultPublic]:
+    """Precomputed recommendations from the batch materializer, computed live if stale."""
+    if not current_user.is_student or current_user.student is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only student accounts can view tutor matches.",
+        )
+
+    batch_matches = _fresh_batch_matches(db, current_user.id)
+    if batch_matches is not None:
+        return _serialize_matches(db, batch_matches)
+    return _serialize_reranked_rows(db, _compute_reranked_rows(db, current_user.id))
+
+
 @router.post("/me/select", response_model=list[MatchResultPublic])
 async def select_match(
     body: MatchSelectRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    sessions: sessionmaker[Session] = Depends(get_sessionmaker),
+    current_user: User = Depends(get_current_user_async),
 ) -> list[MatchResultPublic]:
     if not current_user.is_student or current_user.student is None:
         raise HTTPException(
@@ -138,34 +252,30 @@ async def select_match(
             detail="Only student accounts can select tutor matches.",
         )
 
-    reranked = _compute_reranked_rows(db, current_user.id)
-    selected = next((row for row in reranked if int(row["tutor_id"]) == body.tutor_id), None)
+    selected = await _find_selectable_candidate(db, sessions, current_user.id, body.tutor_id)
     if selected is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Tutor not found in current match candidates.",
         )
-    if has_student_matched_tutor(db, student_id=current_user.id, tutor_id=body.tutor_id):
+    if await crud_matches_async.has_student_matched_tutor(
+        db, student_id=current_user.id, tutor_id=body.tutor_id
+    ):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="You have already matched with this tutor.",
         )
 
-    add_match_to_latest_run(
+    await crud_matches_async.add_match_to_latest_run(
         db,
         student_id=current_user.id,
         ranked_row=selected,
-        model_name="local-hash-v1",
-        weights_json={
-            "embedding_weight": 0.45,
-            "class_strength_weight": 0.35,
-            "availability_weight": 0.10,
-            "location_weight": 0.10,
-        },
+        model_name=EMBED_MODEL_NAME,
+        weights_json=RERANK_WEIGHTS,
     )
-    tutor_user = db.get(User, body.tutor_id)
+    tutor_user = await db.get(User, body.tutor_id)
     if tutor_user is not None:
-        row = build_and_store_notification(
+        row = await build_and_store_notification(
             db,
             user_id=tutor_user.id,
             event_type="notification",
@@ -174,17 +284,17 @@ async def select_match(
             payload_json={"student_id": current_user.id, "tutor_id": tutor_user.id},
         )
         await emit_notification(tutor_user.id, row)
-    return _build_saved_match_payload(db, current_user.id)
+    return await _build_saved_match_payload(db, current_user.id)
 
 
 @router.get("/me", response_model=list[MatchResultPublic])
-def get_my_matches(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def get_my_matches(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
 ) -> list[MatchResultPublic]:
     if not current_user.is_student or current_user.student is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only student accounts can view tutor matches.",
         )
-    return _build_saved_match_payload(db, current_user.id)
+    return await _build_saved_match_payload(db, current_user.id)
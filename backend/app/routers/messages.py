@@ -1,18 +1,31 @@
 """REST and WebSocket messaging.
 
 REST:
-- GET    /messages/conversations           - list my conversations
+- GET    /messages/conversations           - list my conversations (keyset-paginated: limit, updated_before, before_id)
 - POST   /messages/conversations           - get or create conversation with another user
 - GET    /messages/conversations/{id}      - get conversation (metadata)
-- GET    /messages/conversations/{id}/messages - list messages (paginated)
+- POST   /messages/conversations/{id}/read - mark conversation read (clears its unread count)
+- GET    /messages/unread-count            - unread badge counts
+- GET    /messages/conversations/{id}/messages - list messages (cursor-paginated: before/after, order)
 - POST   /messages/conversations/{id}/messages - send a message
 - POST   /messages/conversations/{id}/messages/attachment - send message with PDF attachment
 - GET    /messages/attachments/{id}/download - download message attachment
 
 WebSocket:
 - WS     /messages/ws/chat/{pairing_id}    - real-time chat (pairing_id = conversation_id)
+                                            ?last_message_id=N on reconnect: missed messages
+                                            arrive as "history" batches (dedupe by id), then a
+                                            "live" frame. With CHAT_WRITE_BEHIND, the sender
+                                            gets {"type": "ack", "message_id"} once the message
+                                            is saved
+                                            (one socket per conversation; new clients should
+                                            use the multiplexed /gateway/ws instead)
 """
+import asyncio
+from datetime import datetime
+from functools import partial
 from pathlib import Path
+from typing import Awaitable, Callable, Literal, Optional
 from uuid import uuid4
 
 from fastapi import (
@@ -22,56 +35,97 @@ from fastapi import (
     Depends,
     HTTPException,
     Query,
+    Response,
     status,
     UploadFile,
     File,
     Form,
 )
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.auth import get_current_user, get_user_from_token
-from app.database import get_db
-from app.crud import messages as crud_messages
-from app.models import User
+from app.auth import get_current_principal, get_principal_from_token_async
+from app.config import settings
+from app.database import get_async_db, get_async_sessionmaker
+from app.crud.aio import messages as crud_messages
 from app.schemas import (
     ConversationCreate,
     ConversationPublic,
     ConversationWithPartner,
     MessageCreate,
     MessagePublic,
+    UnreadSummary,
 )
+from app.services.broker import Broker, chat_channel, get_broker
+from app.services.chat import catch_up, post_chat_message, submit_chat_message
 from app.services.notification_events import build_and_store_notification, emit_notification
+from app.services.principal_cache import Principal
+from app.services.socket_sender import SocketSender
 
 router = APIRouter()
 MAX_ATTACHMENT_BYTES = 10 * 1024 * 1024  # 10MB
 ALLOWED_ATTACHMENT_MIME_TYPES = {"application/pdf"}
 ATTACHMENTS_DIR = Path(__file__).resolve().parents[2] / "uploads" / "message_attachments"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
 
 
 class ConnectionManager:
-    def __init__(self):
+    """
+    Chat sockets held by this process. broadcast publishes through the broker;
+    every process holding sockets for the pairing delivers to them (see
+    app.services.broker). Delivery only enqueues on each socket's
+    SocketSender, so a slow client never holds up the others.
+    """
+
+    def __init__(self, broker: Broker | None = None):
         # active_connections stores {pairing_id: [list_of_websockets]}
         self.active_connections: dict[int, list[WebSocket]] = {}
+        self.senders: dict[WebSocket, SocketSender] = {}
+        self._handlers: dict[int, Callable[[dict], Awaitable[None]]] = {}
+        self._broker = broker
 
-    async def connect(self, websocket: WebSocket, pairing_id: int):
+    @property
+    def broker(self) -> Broker:
+        return self._broker or get_broker()
+
+    async def connect(self, websocket: WebSocket, pairing_id: int, *, hold: bool = False) -> SocketSender:
+        """Accept and subscribe the socket. `hold` buffers live messages until a catch-up releases them."""
         await websocket.accept()
+        sender = self.senders[websocket] = SocketSender(websocket, partial(self.disconnect, websocket, pairing_id))
+        if hold:
+            sender.hold()
         if pairing_id not in self.active_connections:
             self.active_connections[pairing_id] = []
+            handler = self._handlers[pairing_id] = partial(self._deliver, pairing_id)
+            await self.broker.subscribe(chat_channel(pairing_id), handler)
         self.active_connections[pairing_id].append(websocket)
+        return sender
 
-    def disconnect(self, websocket: WebSocket, pairing_id: int):
+    async def disconnect(self, websocket: WebSocket, pairing_id: int):
+        sender = self.senders.pop(websocket, None)
+        if sender is not None:
+            sender.stop()
         if pairing_id not in self.active_connections:
             return
         if websocket in self.active_connections[pairing_id]:
             self.active_connections[pairing_id].remove(websocket)
         if not self.active_connections[pairing_id]:
             del self.active_connections[pairing_id]
+            await self.broker.unsubscribe(chat_channel(pairing_id), self._handlers.pop(pairing_id))
 
     async def broadcast(self, message: dict, pairing_id: int):
-        if pairing_id in self.active_connections:
-            for connection in self.active_connections[pairing_id]:
-                await connection.send_json(message)
+        await self.broker.publish(chat_channel(pairing_id), message)
+
+    def send_to_socket(self, websocket: WebSocket, message: dict) -> None:
+        """Queue a message for one socket, ordered with its broadcasts."""
+        sender = self.senders.get(websocket)
+        if sender is not None:
+            sender.send(message)
+
+    async def _deliver(self, pairing_id: int, message: dict):
+        for connection in list(self.active_connections.get(pairing_id, [])):
+            self.send_to_socket(connection, message)
 
 manager = ConnectionManager()
 
@@ -87,12 +141,22 @@ def _get_other_participant_id(user1_id: int, user2_id: int, current_user_id: int
 # ---------- REST endpoints ----------
 
 @router.get("/conversations", response_model=list[ConversationWithPartner])
-def list_conversations(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def list_conversations(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    updated_before: Optional[datetime] = Query(None),
+    before_id: Optional[int] = Query(None),
 ):
-    """List all conversations for the current user, with last message preview."""
-    rows = crud_messages.list_conversations_for_user(db, current_user.id)
+    """
+    List the current user's conversations (most recently updated first), with
+    last message preview. All of them by default; to page, pass `limit`, then
+    the last item's `updated_at` and `id` as `updated_before` / `before_id`.
+    """
+    if before_id is not None and updated_before is None:
+        raise HTTPException(status_code=400, detail="before_id requires updated_before")
+    before = (updated_before, before_id) if updated_before is not None else None
+    rows = await crud_messages.list_conversations_for_user(db, current_user.id, limit=limit, before=before)
     return [
         ConversationWithPartner(
             id=r["id"],
@@ -104,48 +168,100 @@ def list_conversations(
             other_user_first_name=r.get("other_user_first_name"),
             other_user_last_name=r.get("other_user_last_name"),
             last_message=MessagePublic.model_validate(r["last_message"]) if r["last_message"] else None,
+            last_message_at=r["last_message_at"],
+            last_message_preview=r["last_message_preview"],
+            unread_count=r["unread_count"],
         )
         for r in rows
     ]
 
 
+@router.get("/unread-count", response_model=UnreadSummary)
+async def get_unread_count(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+) -> UnreadSummary:
+    """Unread badge: conversations with unread messages and the total unread messages."""
+    conversations, messages = await crud_messages.get_unread_summary(db, current_user.id)
+    return UnreadSummary(unread_conversations=conversations, unread_messages=messages)
+
+
 @router.post("/conversations", response_model=ConversationPublic)
-def create_or_get_conversation(
+async def create_or_get_conversation(
     body: ConversationCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """Get existing conversation with another user or create a new one."""
     try:
-        conv = crud_messages.get_or_create_conversation(db, current_user.id, body.other_user_id)
+        conv = await crud_messages.get_or_create_conversation(db, current_user.id, body.other_user_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     return ConversationPublic.model_validate(conv)
 
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationPublic)
-def get_conversation(
+async def get_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """Get a conversation by id (only if current user is a participant)."""
-    conv = crud_messages.get_conversation_by_id(db, conversation_id, current_user.id)
+    conv = await crud_messages.get_conversation_by_id(db, conversation_id, current_user.id)
     if conv is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return ConversationPublic.model_validate(conv)
 
 
+@router.post("/conversations/{conversation_id}/read", status_code=status.HTTP_204_NO_CONTENT)
+async def mark_conversation_read(
+    conversation_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+) -> None:
+    """Mark every message in the conversation read for the current user."""
+    if not await crud_messages.mark_conversation_read(db, conversation_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Conversation not found or you are not a participant")
+    return None
+
+
 @router.get("/conversations/{conversation_id}/messages", response_model=list[MessagePublic])
-def list_messages(
+async def list_messages(
     conversation_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    before: Optional[str] = Query(None, description="Cursor: only messages older than this one"),
+    after: Optional[str] = Query(None, description="Cursor: only messages newer than this one"),
+    order: Literal["asc", "desc"] = Query("asc"),
 ):
-    """List messages in a conversation (oldest first). Paginated."""
-    messages = crud_messages.get_messages(db, conversation_id, current_user.id, skip=skip, limit=limit)
+    """
+    List messages in a conversation, oldest first (`order=desc` for newest first).
+
+    Page with the opaque cursor returned in the X-Next-Cursor header (the last
+    message of the page): scrollback is `order=desc&before=<cursor>`, forward
+    sync after a reconnect is `after=<cursor>`. `skip` still works but gets
+    slower the further it skips.
+    """
+    try:
+        before_key = crud_messages.decode_message_cursor(before) if before else None
+        after_key = crud_messages.decode_message_cursor(after) if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    messages = await crud_messages.get_messages(
+        db,
+        conversation_id,
+        current_user.id,
+        skip=skip,
+        limit=limit,
+        before=before_key,
+        after=after_key,
+        newest_first=order == "desc",
+    )
+    if messages:
+        response.headers[NEXT_CURSOR_HEADER] = crud_messages.encode_message_cursor(messages[-1])
     return [MessagePublic.model_validate(m) for m in messages]
 
 
@@ -153,18 +269,18 @@ def list_messages(
 async def send_message(
     conversation_id: int,
     body: MessageCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """Send a message in a conversation."""
-    msg = crud_messages.create_message(db, conversation_id, current_user.id, body.content)
+    msg = await crud_messages.create_message(db, conversation_id, current_user.id, body.content)
     if msg is None:
         raise HTTPException(status_code=404, detail="Conversation not found or you are not a participant")
-    conv = crud_messages.get_conversation_by_id(db, conversation_id, current_user.id)
+    conv = await crud_messages.get_conversation_by_id(db, conversation_id, current_user.id)
     if conv is not None:
         recipient_id = _get_other_participant_id(conv.user1_id, conv.user2_id, current_user.id)
         if recipient_id is not None:
-            row = build_and_store_notification(
+            row = await build_and_store_notification(
                 db,
                 user_id=recipient_id,
                 event_type="notification",
@@ -181,10 +297,10 @@ async def send_message_with_attachment(
     conversation_id: int,
     file: UploadFile = File(...),
     content: str = Form(default=""),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ) -> MessagePublic:
-    conv = crud_messages.get_conversation_by_id(db, conversation_id, current_user.id)
+    conv = await crud_messages.get_conversation_by_id(db, conversation_id, current_user.id)
     if conv is None:
         raise HTTPException(status_code=404, detail="Conversation not found or you are not a participant")
 
@@ -204,15 +320,15 @@ async def send_message_with_attachment(
     ATTACHMENTS_DIR.mkdir(parents=True, exist_ok=True)
     storage_name = f"{uuid4().hex}_{safe_name}"
     storage_path = ATTACHMENTS_DIR / storage_name
-    storage_path.write_bytes(file_bytes)
+    await run_in_threadpool(storage_path.write_bytes, file_bytes)
 
     raw_content = content.strip()
     message_content = raw_content
-    msg = crud_messages.create_message(db, conversation_id, current_user.id, message_content)
+    msg = await crud_messages.create_message(db, conversation_id, current_user.id, message_content)
     if msg is None:
         raise HTTPException(status_code=404, detail="Conversation not found or you are not a participant")
 
-    crud_messages.create_message_attachment(
+    msg = await crud_messages.create_message_attachment(
         db,
         message_id=msg.id,
         file_name=safe_name,
@@ -220,11 +336,10 @@ async def send_message_with_attachment(
         size_bytes=len(file_bytes),
         storage_path=str(storage_path),
     )
-    db.refresh(msg)
 
     recipient_id = _get_other_participant_id(conv.user1_id, conv.user2_id, current_user.id)
     if recipient_id is not None:
-        row = build_and_store_notification(
+        row = await build_and_store_notification(
             db,
             user_id=recipient_id,
             event_type="notification",
@@ -238,13 +353,13 @@ async def send_message_with_attachment(
 
 
 @router.get("/attachments/{attachment_id}/download")
-def download_attachment(
+async def download_attachment(
     attachment_id: int,
     token: str = Query(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> FileResponse:
-    current_user = get_user_from_token(token, db)
-    attachment = crud_messages.get_attachment_for_user(
+    current_user = await get_principal_from_token_async(token, db)
+    attachment = await crud_messages.get_attachment_for_user(
         db,
         attachment_id=attachment_id,
         user_id=current_user.id,
@@ -263,50 +378,85 @@ def download_attachment(
 
 # ---------- WebSocket ----------
 
+def _ack_saved(websocket: WebSocket, message_id: int, saved: asyncio.Future) -> None:
+    """Write-behind: ack the sender once the message's batch commits (or report that it failed)."""
+    if saved.cancelled() or saved.exception() is not None:
+        manager.send_to_socket(websocket, {"error": "Message could not be saved", "message_id": message_id})
+    else:
+        manager.send_to_socket(websocket, {"type": "ack", "message_id": message_id})
+
+
 @router.websocket("/ws/chat/{pairing_id}")
-async def websocket_endpoint(websocket: WebSocket, pairing_id: int, db: Session = Depends(get_db)):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    pairing_id: int,
+    sessions: async_sessionmaker[AsyncSession] = Depends(get_async_sessionmaker),
+):
     token = websocket.query_params.get("token")
     if not token:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Not authenticated")
         return
 
-    try:
-        current_user = get_user_from_token(token, db)
-    except HTTPException:
+    # Authenticate once and release the connection: an idle socket holds no session
+    async with sessions() as db:
+        try:
+            current_user = await get_principal_from_token_async(token, db)
+        except HTTPException:
+            current_user = None
+        conv = None
+        if current_user is not None:
+            conv = await crud_messages.get_conversation_by_id(db, pairing_id, current_user.id)
+    if current_user is None:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid token")
         return
-
-    conv = crud_messages.get_conversation_by_id(db, pairing_id, current_user.id)
     if conv is None:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Not a participant")
         return
 
-    await manager.connect(websocket, pairing_id)
+    last_message_id = websocket.query_params.get("last_message_id")
+    if last_message_id is not None:
+        try:
+            last_message_id = int(last_message_id)
+        except ValueError:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid last_message_id")
+            return
+
+    sender = await manager.connect(websocket, pairing_id, hold=last_message_id is not None)
     try:
+        if last_message_id is not None:
+            await catch_up(
+                sender,
+                sessions,
+                conversation_id=pairing_id,
+                user_id=current_user.id,
+                last_message_id=last_message_id,
+                message_id_of=lambda payload: payload.get("id"),
+            )
         while True:
             data = await websocket.receive_json()
             content = data.get("content") if isinstance(data, dict) else None
             if not isinstance(content, str) or not content.strip():
-                await websocket.send_json({"error": "Message content is required"})
+                manager.send_to_socket(websocket, {"error": "Message content is required"})
                 continue
 
-            msg = crud_messages.create_message(db, pairing_id, current_user.id, content.strip())
-            if msg is None:
-                await websocket.send_json({"error": "Conversation not found or not allowed"})
+            if settings.chat_write_behind:
+                pending = await submit_chat_message(
+                    conversation=conv,
+                    sender=current_user,
+                    content=content.strip(),
+                    sessions=sessions,
+                    broker=manager.broker,
+                )
+                pending.saved.add_done_callback(partial(_ack_saved, websocket, pending.message.id))
                 continue
 
-            payload = MessagePublic.model_validate(msg).model_dump(mode="json")
-            await manager.broadcast(payload, pairing_id)
-            recipient_id = _get_other_participant_id(conv.user1_id, conv.user2_id, current_user.id)
-            if recipient_id is not None:
-                row = build_and_store_notification(
-                    db,
-                    user_id=recipient_id,
-                    event_type="notification",
-                    title="New message",
-                    body=f"{current_user.first_name} sent you a message.",
-                    payload_json={"conversation_id": pairing_id, "sender_id": current_user.id},
+            async with sessions() as db:
+                msg = await post_chat_message(
+                    db, conversation=conv, sender=current_user, content=content.strip(), broker=manager.broker
                 )
-                await emit_notification(recipient_id, row)
+            if msg is None:
+                manager.send_to_socket(websocket, {"error": "Conversation not found or not allowed"})
     except WebSocketDisconnect:
-        manager.disconnect(websocket, pairing_id)
+        pass
+    finally:
+        await manager.disconnect(websocket, pairing_id)
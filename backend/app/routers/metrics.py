@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database import async_engine, engine, get_async_sessionmaker
+from app.services.message_writer import get_message_writer
+from app.services.password_hashing import get_password_hasher
+from app.services.pool_metrics import pool_snapshot
+
+router = APIRouter()
+
+
+@router.get("/db-pool")
+def get_db_pool_metrics() -> dict:
+    """Pool gauges and checkout/wait/invalidation counters for both engines (since process start)."""
+    return {
+        "sync": pool_snapshot(engine),
+        "async": pool_snapshot(async_engine.sync_engine),
+    }
+
+
+@router.get("/password-hashing")
+def get_password_hashing_metrics() -> dict:
+    """Hashing pool queue depth, 503 rejections and per-operation latency."""
+    return get_password_hasher().snapshot()
+
+
+@router.get("/chat-writes")
+def get_chat_write_metrics(
+    sessions: async_sessionmaker[AsyncSession] = Depends(get_async_sessionmaker),
+) -> dict:
+    """Write-behind queue depth and batches/messages written or failed (CHAT_WRITE_BEHIND)."""
+    return get_message_writer(sessions).snapshot()
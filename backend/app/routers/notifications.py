@@ -1,16 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.auth import get_current_user, get_user_from_token
-from app.crud.notifications import (
+from app.auth import get_current_principal, get_principal_from_token_async
+from app.crud.aio.notifications import (
     get_or_create_notification_settings,
     list_notifications_for_user,
     mark_notification_read,
     update_notification_settings,
     upsert_device_token,
 )
-from app.database import get_db
-from app.models import User
+from app.database import get_async_db, get_async_sessionmaker
 from app.schemas import (
     DeviceTokenPublic,
     DeviceTokenRegisterRequest,
@@ -19,17 +18,18 @@ from app.schemas import (
     NotificationPreferencesUpdate,
 )
 from app.services.notification_ws import notification_ws_manager
+from app.services.principal_cache import Principal
 
 router = APIRouter()
 
 
 @router.post("/device-tokens", response_model=DeviceTokenPublic)
-def register_device_token(
+async def register_device_token(
     body: DeviceTokenRegisterRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ) -> DeviceTokenPublic:
-    row = upsert_device_token(
+    row = await upsert_device_token(
         db,
         user_id=current_user.id,
         token=body.token,
@@ -39,42 +39,42 @@ def register_device_token(
 
 
 @router.get("/me", response_model=list[NotificationPublic])
-def get_my_notifications(
+async def get_my_notifications(
     limit: int = Query(default=50, ge=1, le=200),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ) -> list[NotificationPublic]:
-    return list_notifications_for_user(db, user_id=current_user.id, limit=limit)
+    return await list_notifications_for_user(db, user_id=current_user.id, limit=limit)
 
 
 @router.patch("/{notification_id}/read", response_model=NotificationPublic)
-def read_notification(
+async def read_notification(
     notification_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ) -> NotificationPublic:
-    row = mark_notification_read(db, notification_id=notification_id, user_id=current_user.id)
+    row = await mark_notification_read(db, notification_id=notification_id, user_id=current_user.id)
     if row is None:
         raise HTTPException(status_code=404, detail="Notification not found")
     return row
 
 
 @router.get("/preferences/me", response_model=NotificationPreferencesPublic)
-def get_my_notification_preferences(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def get_my_notification_preferences(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ) -> NotificationPreferencesPublic:
-    row = get_or_create_notification_settings(db, user_id=current_user.id)
+    row = await get_or_create_notification_settings(db, user_id=current_user.id)
     return row
 
 
 @router.put("/preferences/me", response_model=NotificationPreferencesPublic)
-def put_my_notification_preferences(
+async def put_my_notification_preferences(
     body: NotificationPreferencesUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ) -> NotificationPreferencesPublic:
-    row = update_notification_settings(
+    row = await update_notification_settings(
         db,
         user_id=current_user.id,
         email_digest_enabled=body.email_digest_enabled,
@@ -87,12 +87,20 @@ def put_my_notification_preferences(
 async def notifications_ws(
     websocket: WebSocket,
     token: str = Query(...),
-    db: Session = Depends(get_db),
+    sessions: async_sessionmaker[AsyncSession] = Depends(get_async_sessionmaker),
 ) -> None:
-    user = get_user_from_token(token, db)
+    # Authenticate once and release the connection: an idle socket holds no session
+    try:
+        async with sessions() as db:
+            user = await get_principal_from_token_async(token, db)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid token")
+        return
     await notification_ws_manager.connect(websocket, user.id)
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
-        notification_ws_manager.disconnect(websocket, user.id)
+        pass
+    finally:
+        await notification_ws_manager.disconnect(websocket, user.id)
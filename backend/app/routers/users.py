@@ -7,12 +7,14 @@
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session  # type: ignore[import]
 
-from app.auth import get_current_user
+from app.auth import get_current_user, hash_password_async
 from app.crud.users import create_user, get_user_by_email, get_user_by_id, update_user_profile, delete_user, update_user_security_preferences
 from app.database import get_db
 from app.models import User
+from app.services.principal_cache import invalidate_principal
 from app.schemas import (
     UserCreate,
     UserPublic,
@@ -29,17 +31,19 @@ router = APIRouter()
 
 
 @router.post("/", response_model=UserPublic, status_code=status.HTTP_201_CREATED)
-def register_user(data: UserCreate, db: Session = Depends(get_db)) -> UserPublic:
+async def register_user(data: UserCreate, db: Session = Depends(get_db)) -> UserPublic:
     """Register a new user account.
 
     Expects UserCreate and returns the public user representation.
     """
-    if get_user_by_email(db, str(data.email)):
+    # bcrypt runs in the hashing pool; the sync DB work stays on the threadpool
+    if await run_in_threadpool(get_user_by_email, db, str(data.email)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered",
         )
-    user = create_user(db, data)
+    hashed_password = await hash_password_async(data.password)
+    user = await run_in_threadpool(create_user, db, data, hashed_password=hashed_password)
     return UserPublic.model_validate(user)
 
 
@@ -109,6 +113,7 @@ def update_user_status(
 
     user.status = data.status
     db.commit()
+    invalidate_principal(user.id)
 
     return Message(message="User status updated")
 
@@ -464,6 +464,15 @@ class ConversationWithPartner(BaseModel):
     other_user_first_name: Optional[str] = None
     other_user_last_name: Optional[str] = None
     last_message: Optional[MessagePublic] = None
+    last_message_at: Optional[datetime] = None
+    last_message_preview: Optional[str] = None
+    unread_count: int = 0
+
+
+class UnreadSummary(BaseModel):
+    """Badge counts for the current user's inbox."""
+    unread_conversations: int
+    unread_messages: int
 
 
 # ===========================================================
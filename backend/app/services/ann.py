@@ -0,0 +1,216 @@
+"""Approximate nearest-neighbour retrieval over the tutor embedding index.
+
+IVF-flat: a k-means coarse quantizer partitions the tutor rows into `nlist`
+inverted lists and a query only scores the rows in its `nprobe` closest lists.
+Rows are the concatenated, per-field normalized [bio | help | locations]
+vectors from TutorEmbeddingIndex, and queries are built with
+TutorEmbeddingIndex.build_query, so the inner product still equals the weighted
+three-field cosine similarity for every row that gets scored.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from typing import Sequence
+
+import numpy as np
+
+from app.services.embedding_index import TutorEmbeddingIndex, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+# Retrain the quantizer once the pool has grown or shrunk this much since training.
+_RETRAIN_DRIFT = 0.2
+_TRAIN_POINTS_PER_LIST = 64
+# Re-snapshotting the tutor matrix is O(n); coalesce bursts of profile edits.
+_MIN_RESYNC_SECONDS = 5.0
+
+
+def kmeans(
+    vectors: np.ndarray,
+    k: int,
+    *,
+    max_iter: int = 20,
+    seed: int = 0,
+) -> np.ndarray:
+    """Plain Lloyd's k-means; returns a [k, dim] float32 centroid matrix."""
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    k = max(1, min(k, n))
+    centroids = vectors[rng.choice(n, size=k, replace=False)].copy()
+    for _ in range(max_iter):
+        assignment = assign_to_centroids(vectors, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        empty = counts == 0
+        order = np.argsort(assignment, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        updated = np.zeros_like(centroids)
+        updated[~empty] = np.add.reduceat(vectors[order], starts[~empty], axis=0)
+        updated /= np.maximum(counts, 1)[:, None]
+        if empty.any():
+            updated[empty] = vectors[rng.choice(n, size=int(empty.sum()), replace=False)]
+        if np.allclose(updated, centroids, atol=1e-6):
+            centroids = updated
+            break
+        centroids = updated
+    return centroids.astype(np.float32, copy=False)
+
+
+def assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest (L2) centroid for each row."""
+    # argmin ||x - c||^2 == argmax (2 x.c - ||c||^2)
+    scores = 2.0 * (vectors @ centroids.T) - np.einsum("ij,ij->i", centroids, centroids)
+    return np.argmax(scores, axis=1)
+
+
+class IVFFlatIndex:
+    """Inverted-file index with exact (flat) scoring inside the probed lists."""
+
+    def __init__(self, *, nlist: int = 0, nprobe: int = 8, seed: int = 0) -> None:
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.seed = seed
+        self.generation: int | None = None
+        self.synced_at = 0.0
+        self.trained_size = 0
+        self._centroids = np.zeros((0, 0), dtype=np.float32)
+        # (centroids, matrix, user_ids, list_offsets, list_rows), swapped as one unit
+        # so concurrent searches never see a half-updated index.
+        self._lists: tuple[np.ndarray, ...] | None = None
+        # Held while a sync runs, so only one retrain/refill happens at a time.
+        self._syncing = threading.Lock()
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids.shape[0] > 0
+
+    def train(self, matrix: np.ndarray) -> None:
+        n = matrix.shape[0]
+        nlist = self.nlist or max(1, int(round(math.sqrt(n))))
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(n, nlist * _TRAIN_POINTS_PER_LIST)
+        sample = matrix[rng.choice(n, size=sample_size, replace=False)] if sample_size < n else matrix
+        self._centroids = kmeans(sample, nlist, seed=self.seed)
+        self.trained_size = n
+
+    def add(self, matrix: np.ndarray, user_ids: np.ndarray, *, generation: int | None = None) -> None:
+        """(Re)fill the inverted lists with `matrix` rows under the current centroids."""
+        assignment = assign_to_centroids(matrix, self._centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=self._centroids.shape[0])
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        self._lists = (self._centroids, matrix, user_ids, offsets, order)
+        self.generation = generation
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        *,
+        nprobe: int | None = None,
+    ) -> list[tuple[int, float]]:
+        if self._lists is None:
+            return []
+        centroids, matrix, user_ids, offsets, list_rows = self._lists
+        probe = max(1, min(nprobe or self.nprobe, centroids.shape[0]))
+        probed = top_k_indices(centroids @ query, probe)
+        rows = np.concatenate([list_rows[offsets[i] : offsets[i + 1]] for i in probed])
+        if rows.size == 0:
+            return []
+        scores = matrix[rows] @ query
+        picked = top_k_indices(scores, top_k)
+        return [(int(user_ids[rows[i]]), float(scores[i])) for i in picked]
+
+    def sync(self, index: TutorEmbeddingIndex, *, min_interval: float = 0.0) -> None:
+        """Bring the lists up to date with `index`, retraining if the pool drifted."""
+        if self.generation == index.generation:
+            return
+        if self._lists is not None and time.monotonic() - self.synced_at < min_interval:
+            return
+        self.synced_at = time.monotonic()
+        matrix, user_ids, generation = index.snapshot()
+        if matrix.shape[0] == 0:
+            self._lists = None
+            self.generation = generation
+            return
+        drift = abs(matrix.shape[0] - self.trained_size) / max(self.trained_size, 1)
+        if not self.trained or drift > _RETRAIN_DRIFT:
+            self.train(matrix)
+        self.add(matrix, user_ids, generation=generation)
+
+    def sync_in_background(self, index: TutorEmbeddingIndex, *, min_interval: float = 0.0) -> None:
+        """
+        sync() in a daemon thread; searches keep using the current lists until
+        the new ones are swapped in. No-op while a sync is already running.
+        """
+        if self.generation == index.generation or not self._syncing.acquire(blocking=False):
+            return
+
+        def run() -> None:
+            try:
+                self.sync(index, min_interval=min_interval)
+            except Exception:
+                logger.exception("IVF index sync failed for %s", index.model_name)
+            finally:
+                self._syncing.release()
+
+        threading.Thread(target=run, name="ivf-sync", daemon=True).start()
+
+
+def recall_at_k(
+    exact: Sequence[Sequence[tuple[int, float]]],
+    approximate: Sequence[Sequence[tuple[int, float]]],
+) -> float:
+    """Mean fraction of the exact top-k ids that the approximate search also returned."""
+    recalls: list[float] = []
+    for exact_rows, approx_rows in zip(exact, approximate, strict=True):
+        expected = {tutor_id for tutor_id, _ in exact_rows}
+        if not expected:
+            continue
+        found = {tutor_id for tutor_id, _ in approx_rows}
+        recalls.append(len(expected & found) / len(expected))
+    return sum(recalls) / len(recalls) if recalls else 1.0
+
+
+def measure_recall(
+    index: TutorEmbeddingIndex,
+    ivf: IVFFlatIndex,
+    queries: Sequence[np.ndarray],
+    *,
+    top_k: int,
+    nprobe: int | None = None,
+) -> float:
+    """Recall@k of `ivf` against the exact scan of `index` for the given queries."""
+    ivf.sync(index)
+    exact = [index.search(query, top_k) for query in queries]
+    approximate = [ivf.search(query, top_k, nprobe=nprobe) for query in queries]
+    return recall_at_k(exact, approximate)
+
+
+_ivf_indexes: dict[str, IVFFlatIndex] = {}
+_ivf_lock = threading.Lock()
+
+
+def get_synced_ivf_index(index: TutorEmbeddingIndex, *, nlist: int, nprobe: int) -> IVFFlatIndex:
+    """
+    Return the process-wide IVF index for `index.model_name`. Only the first
+    build happens on the caller's thread; after that, retraining and refilling
+    for a newer `index` generation run in the background while requests are
+    served from the previous lists.
+    """
+    with _ivf_lock:
+        ivf = _ivf_indexes.get(index.model_name)
+        if ivf is None or ivf.nlist != nlist:
+            ivf = IVFFlatIndex(nlist=nlist, nprobe=nprobe)
+            _ivf_indexes[index.model_name] = ivf
+        ivf.nprobe = nprobe
+    if ivf.generation is None:
+        # Nothing to serve yet: build now (concurrent first callers wait for it)
+        with ivf._syncing:
+            if ivf.generation is None:
+                ivf.sync(index)
+    else:
+        ivf.sync_in_background(index, min_interval=_MIN_RESYNC_SECONDS)
+    return ivf
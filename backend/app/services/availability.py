@@ -0,0 +1,101 @@
+"""Weekly availability as a minute-resolution bitset.
+
+Bit `day_of_week * 1440 + minute` is set when the user is free during that
+minute, so the overlap between two users is popcount(a & b) and a point-in-time
+check is a single bit test. Masks are cached per user; crud.availability drops a
+user's entry when their slots change, and entries also expire after a short TTL
+so other workers pick up changes.
+"""
+from __future__ import annotations
+
+import threading
+import time as _time
+from collections import OrderedDict
+from datetime import time
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import UserAvailability
+
+MINUTES_PER_DAY = 24 * 60
+DAYS_PER_WEEK = 7
+
+_CACHE_TTL_SECONDS = 60.0
+_CACHE_MAX_USERS = 20000
+
+_cache: OrderedDict[int, tuple[float, int]] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _minutes(t: time) -> int:
+    return (t.hour * 60) + t.minute
+
+
+def availability_mask(slots: Iterable[UserAvailability]) -> int:
+    """Bitset of every minute of the week covered by `slots`."""
+    mask = 0
+    for slot in slots:
+        start = _minutes(slot.start_time)
+        end = _minutes(slot.end_time)
+        if end <= start:
+            continue
+        offset = slot.day_of_week * MINUTES_PER_DAY
+        mask |= ((1 << (end - start)) - 1) << (offset + start)
+    return mask
+
+
+def overlap_score(student_mask: int, tutor_mask: int) -> float:
+    """Fraction of the student's available minutes the tutor is also available."""
+    student_minutes = student_mask.bit_count()
+    if student_minutes == 0:
+        return 0.0
+    return (student_mask & tutor_mask).bit_count() / student_minutes
+
+
+def is_available(mask: int, day_of_week: int, minute: int) -> bool:
+    return bool(mask >> (day_of_week * MINUTES_PER_DAY + minute) & 1)
+
+
+def get_availability_masks(db: Session, user_ids: Iterable[int]) -> dict[int, int]:
+    """Masks for `user_ids`, loading every uncached user in one query."""
+    now = _time.monotonic()
+    masks: dict[int, int] = {}
+    missing: list[int] = []
+    with _cache_lock:
+        for user_id in dict.fromkeys(user_ids):
+            cached = _cache.get(user_id)
+            if cached is not None and now - cached[0] < _CACHE_TTL_SECONDS:
+                _cache.move_to_end(user_id)
+                masks[user_id] = cached[1]
+            else:
+                missing.append(user_id)
+    if not missing:
+        return masks
+
+    slots_by_user: dict[int, list[UserAvailability]] = {user_id: [] for user_id in missing}
+    for slot in db.execute(
+        select(UserAvailability).where(UserAvailability.user_id.in_(missing))
+    ).scalars():
+        slots_by_user[slot.user_id].append(slot)
+
+    with _cache_lock:
+        for user_id, slots in slots_by_user.items():
+            mask = availability_mask(slots)
+            masks[user_id] = mask
+            _cache[user_id] = (now, mask)
+            _cache.move_to_end(user_id)
+        while len(_cache) > _CACHE_MAX_USERS:
+            _cache.popitem(last=False)
+    return masks
+
+
+def invalidate_availability(user_id: int) -> None:
+    with _cache_lock:
+        _cache.pop(user_id, None)
+
+
+def clear_availability_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
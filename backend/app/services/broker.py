@@ -0,0 +1,165 @@
+"""Pub/sub fan-out for the realtime WebSocket managers.
+
+The chat, notification and gateway managers only hold the sockets connected
+to their own process. They publish each outgoing event to a broker channel
+(chat_channel / notification_channel) and subscribe to a channel while they
+hold at least one socket for it. Every process with a matching socket then
+receives the event and delivers it locally. A channel can have several
+handlers in one process (e.g. a legacy chat socket and a gateway socket).
+
+"memory" (InProcessBroker) is enough for a single worker. "redis"
+(RedisBroker) uses Redis pub/sub so events reach sockets on other workers and
+nodes. Select it with REALTIME_BROKER=redis and REDIS_URL. The redis package is
+only imported when that broker is used.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Protocol
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+CHANNEL_PREFIX = "tutorapp:"
+
+
+def chat_channel(conversation_id: int) -> str:
+    return f"chat:{conversation_id}"
+
+
+def notification_channel(user_id: int) -> str:
+    return f"notify:{user_id}"
+
+
+class Broker(Protocol):
+    async def subscribe(self, channel: str, handler: Handler) -> None: ...
+
+    async def unsubscribe(self, channel: str, handler: Handler) -> None: ...
+
+    async def publish(self, channel: str, message: dict) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class InProcessBroker:
+    """Delivers straight to this process's subscribers."""
+
+    def __init__(self) -> None:
+        self._handlers: dict[str, list[Handler]] = {}
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def unsubscribe(self, channel: str, handler: Handler) -> None:
+        _remove_handler(self._handlers, channel, handler)
+
+    async def publish(self, channel: str, message: dict) -> None:
+        for handler in list(self._handlers.get(channel, ())):
+            await handler(message)
+
+    async def close(self) -> None:
+        self._handlers.clear()
+
+
+class RedisBroker:
+    """
+    Redis pub/sub: one subscriber connection per process. A reader task
+    dispatches each message to the channel's handlers. Messages are JSON.
+    """
+
+    def __init__(self, url: str = "", *, client: Any = None) -> None:
+        if client is None:
+            import redis.asyncio as aioredis
+
+            client = aioredis.from_url(url)
+        self._client = client
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._handlers: dict[str, list[Handler]] = {}
+        self._reader: asyncio.Task | None = None
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        first = channel not in self._handlers
+        self._handlers.setdefault(channel, []).append(handler)
+        if first:
+            await self._pubsub.subscribe(CHANNEL_PREFIX + channel)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+
+    async def unsubscribe(self, channel: str, handler: Handler) -> None:
+        if _remove_handler(self._handlers, channel, handler):
+            await self._pubsub.unsubscribe(CHANNEL_PREFIX + channel)
+
+    async def publish(self, channel: str, message: dict) -> None:
+        await self._client.publish(CHANNEL_PREFIX + channel, json.dumps(message))
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Redis pub/sub read failed; retrying")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            handlers = list(self._handlers.get(channel.removeprefix(CHANNEL_PREFIX), ()))
+            if not handlers:
+                continue
+            payload = json.loads(message["data"])
+            for handler in handlers:
+                try:
+                    await handler(payload)
+                except Exception:
+                    logger.exception("Realtime handler failed for %s", channel)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        await self._pubsub.aclose()
+        await self._client.aclose()
+
+
+def _remove_handler(handlers: dict[str, list[Handler]], channel: str, handler: Handler) -> bool:
+    """Remove one registration of `handler`; True if `channel` has no handlers left."""
+    registered = handlers.get(channel)
+    if registered is None:
+        return False
+    if handler in registered:
+        registered.remove(handler)
+    if registered:
+        return False
+    del handlers[channel]
+    return True
+
+
+_broker: Broker | None = None
+
+
+def get_broker() -> Broker:
+    """This process's broker, created from settings on first use."""
+    global _broker
+    if _broker is None:
+        _broker = RedisBroker(settings.redis_url) if settings.realtime_broker == "redis" else InProcessBroker()
+    return _broker
+
+
+async def close_broker() -> None:
+    global _broker
+    broker, _broker = _broker, None
+    if broker is not None:
+        await broker.close()
@@ -0,0 +1,164 @@
+import asyncio
+from datetime import timedelta
+from typing import Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.crud.aio import messages as crud_messages
+from app.config import settings
+from app.models import Conversation, Message
+from app.schemas import MessagePublic
+from app.services.broker import Broker, chat_channel, get_broker
+from app.services.message_writer import PendingMessage, get_message_writer
+from app.services.notification_events import build_and_store_notification, emit_notification
+from app.services.principal_cache import Principal
+from app.services.socket_sender import SocketSender
+
+CATCHUP_BATCH_SIZE = 100
+# Replay also covers messages positioned this far before the client's last seen
+# one: created_at is taken when a transaction starts and ids when it flushes,
+# so a message can sort before one that committed (and was seen) earlier.
+CATCHUP_OVERLAP = timedelta(seconds=30)
+
+
+async def post_chat_message(
+    db: AsyncSession,
+    *,
+    conversation: Conversation,
+    sender: Principal,
+    content: str,
+    broker: Broker | None = None,
+) -> Message | None:
+    """
+    Store a realtime chat message, publish it to the conversation's chat
+    channel (legacy chat sockets and gateway subscribers), and notify the
+    other participant. Returns None if `sender` may not post there.
+    """
+    msg = await crud_messages.create_message(db, conversation.id, sender.id, content)
+    if msg is None:
+        return None
+
+    payload = MessagePublic.model_validate(msg).model_dump(mode="json")
+    await (broker or get_broker()).publish(chat_channel(conversation.id), payload)
+
+    notification = _new_message_notification(conversation, sender)
+    row = await build_and_store_notification(db, **notification)
+    await emit_notification(notification["user_id"], row)
+    return msg
+
+
+async def submit_chat_message(
+    *,
+    conversation: Conversation,
+    sender: Principal,
+    content: str,
+    sessions: async_sessionmaker[AsyncSession],
+    broker: Broker | None = None,
+) -> PendingMessage:
+    """
+    post_chat_message with CHAT_WRITE_BEHIND: the message and its notification
+    are broadcast now and inserted by the next batch of the MessageWriter for
+    `sessions`. The caller must already have checked that `sender` is a
+    participant. `saved` on the returned PendingMessage resolves once the
+    message is durable.
+    """
+    notification = _new_message_notification(conversation, sender)
+    pending = await get_message_writer(sessions).submit(
+        conversation, sender_id=sender.id, content=content, notification=notification
+    )
+    payload = MessagePublic.model_validate(pending.message).model_dump(mode="json")
+    await (broker or get_broker()).publish(chat_channel(conversation.id), payload)
+    await emit_notification(notification["user_id"], pending.notification)
+    return pending
+
+
+def _new_message_notification(conversation: Conversation, sender: Principal) -> dict:
+    recipient_id = conversation.user2_id if sender.id == conversation.user1_id else conversation.user1_id
+    return {
+        "user_id": recipient_id,
+        "event_type": "notification",
+        "title": "New message",
+        "body": f"{sender.first_name} sent you a message.",
+        "payload_json": {"conversation_id": conversation.id, "sender_id": sender.id},
+    }
+
+
+async def catch_up(
+    sender: SocketSender,
+    sessions: async_sessionmaker[AsyncSession],
+    *,
+    conversation_id: int,
+    user_id: int,
+    last_message_id: int,
+    message_id_of: Callable[[dict], int | None],
+) -> None:
+    """
+    Bring a reconnecting client from `last_message_id` to live. `sender` must
+    have been put on hold() before the socket was subscribed to the
+    conversation, so nothing published since is lost.
+
+    Streams the newer messages from the database as
+    {"type": "history", "conversation_id", "messages": [...]} batches (a
+    short session each), then sends {"type": "live", ...} and releases the
+    held live payloads, skipping any message already replayed
+    (`message_id_of` reads the message id from a live payload). History starts
+    CATCHUP_OVERLAP before the last seen message, so it can repeat messages
+    the client already has; clients drop those by id.
+    """
+    # Page by (created_at, id) from the last seen message when it is stored:
+    # with write-behind, ids come from per-process blocks and are not ordered
+    # across workers, while created_at follows broadcast order.
+    async with sessions() as db:
+        start = await crud_messages.get_message_position(db, conversation_id, last_message_id)
+    if start is not None:
+        start = (start[0] - CATCHUP_OVERLAP, 0)
+    started = asyncio.get_running_loop().time()
+    replayed: set[int] = set()
+    latest_id = last_message_id
+    # Write-behind: messages broadcast before the hold may still be unsaved, on
+    # this or another worker. A second pass (replayed ones are skipped) runs
+    # once they are all stored or failed: see _await_write_behind.
+    passes = 2 if settings.chat_write_behind else 1
+    for remaining_passes in range(passes - 1, -1, -1):
+        cursor, after_id = start, last_message_id
+        while True:
+            async with sessions() as db:
+                if cursor is not None:
+                    batch = await crud_messages.get_messages(
+                        db, conversation_id, user_id, limit=CATCHUP_BATCH_SIZE, after=cursor
+                    )
+                else:
+                    batch = await crud_messages.get_messages_after_id(
+                        db, conversation_id, user_id, after_id, limit=CATCHUP_BATCH_SIZE
+                    )
+            fresh = [m for m in batch if m.id not in replayed]
+            if fresh:
+                messages = [MessagePublic.model_validate(m).model_dump(mode="json") for m in fresh]
+                frame = {"type": "history", "conversation_id": conversation_id, "messages": messages}
+                if not await sender.send_wait(frame):
+                    return
+                replayed.update(m.id for m in fresh)
+            if batch:
+                latest_id = batch[-1].id
+                cursor, after_id = (batch[-1].created_at, batch[-1].id), batch[-1].id
+            if len(batch) < CATCHUP_BATCH_SIZE:
+                break
+        if remaining_passes:
+            await _await_write_behind(sessions, started)
+    live = {"type": "live", "conversation_id": conversation_id, "last_message_id": latest_id}
+    if not await sender.send_wait(live):
+        return
+    await sender.release(lambda payload: message_id_of(payload) not in replayed)
+
+
+async def _await_write_behind(sessions: async_sessionmaker[AsyncSession], started: float) -> None:
+    """
+    Wait until every message submitted before loop time `started` is stored or
+    has failed: exactly, via the barrier, for this process's writer; with the
+    redis broker, other workers' writers too, by waiting out the max lag they
+    enforce on every message.
+    """
+    writer = get_message_writer(sessions)
+    await writer.barrier()
+    if settings.realtime_broker == "redis":
+        await asyncio.sleep(max(0.0, started + writer.settle_seconds - asyncio.get_running_loop().time()))
@@ -0,0 +1,87 @@
+"""In-memory inverted index from class_id to the tutors who can teach it.
+
+Each entry keeps what class-strength scoring needs, (grade points, has_taed),
+so reranking and class-overlap candidate generation never load TutorClass ORM
+objects. The index is rebuilt from `tutor_classes` whenever its signature
+(row count, sum of row ids) no longer matches the table; crud.classes patches
+it in place after its own commits and advances the signature to match, so
+local edits do not force a rebuild while edits from other workers still do.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Iterable
+
+# (tutor_classes.id, class_id, tutor user id, grade points, has_taed)
+ClassIndexRow = tuple[int, int, int, float, bool]
+
+
+class ClassTutorIndex:
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._by_class: dict[int, dict[int, tuple[float, bool]]] = {}
+        self._rows: dict[int, tuple[int, int]] = {}
+        self.signature: tuple[int, int] | None = None
+        self.generation = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self.signature is not None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def rebuild(self, rows: Iterable[ClassIndexRow], *, signature: tuple[int, int]) -> None:
+        by_class: dict[int, dict[int, tuple[float, bool]]] = {}
+        row_keys: dict[int, tuple[int, int]] = {}
+        for row_id, class_id, tutor_id, grade_points, has_taed in rows:
+            by_class.setdefault(class_id, {})[tutor_id] = (grade_points, has_taed)
+            row_keys[row_id] = (class_id, tutor_id)
+        with self._lock:
+            self._by_class = by_class
+            self._rows = row_keys
+            self.signature = signature
+            self.generation += 1
+
+    def add(self, row: ClassIndexRow) -> None:
+        row_id, class_id, tutor_id, grade_points, has_taed = row
+        with self._lock:
+            if not self.loaded or row_id in self._rows:
+                return
+            self._by_class.setdefault(class_id, {})[tutor_id] = (grade_points, has_taed)
+            self._rows[row_id] = (class_id, tutor_id)
+            count, id_sum = self.signature
+            self.signature = (count + 1, id_sum + row_id)
+            self.generation += 1
+
+    def remove(self, row_id: int) -> bool:
+        with self._lock:
+            key = self._rows.pop(row_id, None)
+            if key is None or not self.loaded:
+                return False
+            class_id, tutor_id = key
+            tutors = self._by_class.get(class_id, {})
+            tutors.pop(tutor_id, None)
+            if not tutors:
+                self._by_class.pop(class_id, None)
+            count, id_sum = self.signature
+            self.signature = (count - 1, id_sum - row_id)
+            self.generation += 1
+            return True
+
+    def overlap(self, class_ids: Iterable[int]) -> list[tuple[int, int, float, bool]]:
+        """(class_id, tutor user id, grade points, has_taed) for every tutor of `class_ids`."""
+        with self._lock:
+            return [
+                (class_id, tutor_id, grade_points, has_taed)
+                for class_id in class_ids
+                for tutor_id, (grade_points, has_taed) in self._by_class.get(class_id, {}).items()
+            ]
+
+
+_class_index = ClassTutorIndex()
+
+
+def get_class_index() -> ClassTutorIndex:
+    """The process-wide class index (empty and unloaded until first refreshed)."""
+    return _class_index
@@ -0,0 +1,57 @@
+"""Storage encodings for user_embeddings vectors.
+
+"array" keeps the original float8[] `embedding` column. "float32" and
+"float16" store the raw little-endian bytes in `embedding_bin` (tagged in
+`embedding_dtype`) and leave `embedding` NULL: 4x / 8x smaller than float8[]
+with its array header, and decoded with np.frombuffer instead of psycopg2
+building one Python float per element. Readers always decode per row, so
+tables holding a mix of encodings (mid-backfill) read correctly.
+"""
+from __future__ import annotations
+
+from typing import Literal, Sequence, TypedDict
+
+import numpy as np
+
+EmbeddingEncoding = Literal["array", "float32", "float16"]
+
+_DTYPES: dict[str, str] = {"float32": "<f4", "float16": "<f2"}
+
+
+class EncodedEmbedding(TypedDict):
+    embedding: list[float] | None
+    embedding_bin: bytes | None
+    embedding_dtype: str | None
+
+
+def encode_embedding(values: Sequence[float], encoding: EmbeddingEncoding) -> EncodedEmbedding:
+    if encoding == "array":
+        return {"embedding": [float(x) for x in values], "embedding_bin": None, "embedding_dtype": None}
+    dtype = _DTYPES[encoding]
+    return {
+        "embedding": None,
+        "embedding_bin": np.asarray(values, dtype=dtype).tobytes(),
+        "embedding_dtype": dtype,
+    }
+
+
+def decode_embedding(
+    array: Sequence[float] | None,
+    data: bytes | None,
+    dtype: str | None,
+) -> np.ndarray:
+    """
+    The stored vector as a 1-D array. float32 bytes are wrapped without a copy
+    (the result is read-only); float16 is widened to float32.
+    """
+    if data is not None:
+        vector = np.frombuffer(data, dtype=dtype or _DTYPES["float32"])
+        return vector if vector.dtype == np.float32 else vector.astype(np.float32)
+    if array is None:
+        return np.zeros(0, dtype=np.float32)
+    return np.asarray(array, dtype=np.float64)
+
+
+def decode_row(row: object) -> np.ndarray:
+    """decode_embedding for a UserEmbedding (or a row selecting the same three columns)."""
+    return decode_embedding(row.embedding, row.embedding_bin, row.embedding_dtype)  # type: ignore[attr-defined]
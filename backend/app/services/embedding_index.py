@@ -0,0 +1,306 @@
+"""Process-resident tutor embedding index for first-stage KNN retrieval.
+
+Every tutor occupies one row of a contiguous float32 matrix laid out as
+[bio | help | locations] blocks of `dim` columns. Each block is L2-normalized
+when it is written, so cosine similarity against a normalized query block is a
+plain dot product and the weighted three-field score is a single mat-vec.
+
+The index is patched in place as embeddings change: rows are replaced or
+appended, removed tutors are tombstoned and compacted away once enough of them
+accumulate. Writes made through a Session are queued on `session.info` and only
+applied after the transaction commits, so a rollback never leaks into the index.
+`generation` increments on every mutation so derived structures can tell when
+they were built from an older snapshot.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Iterable, Mapping, Sequence
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+FIELDS: tuple[str, ...] = ("bio", "help", "locations")
+
+_MIN_CAPACITY = 64
+_COMPACT_MIN_TOMBSTONES = 64
+_COMPACT_TOMBSTONE_RATIO = 0.25
+_PENDING_KEY = "tutor_index_pending"
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row in place; all-zero rows are left as zeros."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the `top_k` highest finite scores, best first, ties broken by index."""
+    candidates = np.flatnonzero(np.isfinite(scores))
+    if top_k <= 0 or candidates.size == 0:
+        return np.empty(0, dtype=np.int64)
+    candidate_scores = scores[candidates]
+    if top_k < candidates.size:
+        picked = np.argpartition(-candidate_scores, top_k - 1)[:top_k]
+    else:
+        picked = np.arange(candidates.size)
+    picked = picked[np.lexsort((candidates[picked], -candidate_scores[picked]))]
+    return candidates[picked]
+
+
+class TutorEmbeddingIndex:
+    """Dense [n_tutors, 3 * dim] matrix with a users.id -> row map."""
+
+    def __init__(self, model_name: str, dim: int) -> None:
+        self.model_name = model_name
+        self.dim = dim
+        # Database signature the index was last reconciled with; None = never loaded.
+        self.signature: tuple | None = None
+        # Highest user_embeddings.updated_at seen, used for delta catch-up.
+        self.high_water = None
+        # time.monotonic() of the last full rebuild; None = never rebuilt.
+        self.rebuilt_at: float | None = None
+        self.generation = 0
+        # Increments only when tutors join or leave the index (or it is rebuilt).
+        self.pool_generation = 0
+        self._lock = threading.RLock()
+        self._matrix = np.zeros((0, self.width), dtype=np.float32)
+        self._user_ids = np.zeros(0, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._tombstones = 0
+        self._row_by_user: dict[int, int] = {}
+
+    @property
+    def width(self) -> int:
+        return self.dim * len(FIELDS)
+
+    @property
+    def loaded(self) -> bool:
+        return self.signature is not None
+
+    def __len__(self) -> int:
+        return len(self._row_by_user)
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._row_by_user
+
+    def user_ids(self) -> set[int]:
+        with self._lock:
+            return set(self._row_by_user)
+
+    def field_slice(self, field_name: str) -> slice:
+        offset = FIELDS.index(field_name) * self.dim
+        return slice(offset, offset + self.dim)
+
+    def field_matrix(self, field_name: str) -> np.ndarray:
+        """Read-only [rows, dim] view over one field block (tombstoned rows are zero)."""
+        with self._lock:
+            view = self._matrix[: self._size, self.field_slice(field_name)]
+        view.flags.writeable = False
+        return view
+
+    def snapshot(self) -> tuple[np.ndarray, np.ndarray, int]:
+        """Return (live matrix copy, live user ids, generation) for derived indexes."""
+        with self._lock:
+            live = self._alive[: self._size]
+            return (
+                self._matrix[: self._size][live].copy(),
+                self._user_ids[: self._size][live].copy(),
+                self.generation,
+            )
+
+    def rebuild(
+        self,
+        rows: Iterable[tuple[int, Mapping[str, Sequence[float]]]],
+        *,
+        signature: tuple | None = None,
+        high_water=None,
+    ) -> None:
+        """Replace the whole index with (user_id, {field: vector}) rows."""
+        user_ids: list[int] = []
+        blocks: list[np.ndarray] = []
+        for user_id, vectors in rows:
+            user_ids.append(int(user_id))
+            blocks.append(self._row_from_vectors(vectors))
+
+        matrix = np.vstack(blocks) if blocks else np.zeros((0, self.width), dtype=np.float32)
+        for field_name in FIELDS:
+            normalize_rows(matrix[:, self.field_slice(field_name)])
+
+        with self._lock:
+            self._matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+            self._user_ids = np.asarray(user_ids, dtype=np.int64)
+            self._alive = np.ones(len(user_ids), dtype=bool)
+            self._size = len(user_ids)
+            self._tombstones = 0
+            self._row_by_user = {user_id: row for row, user_id in enumerate(user_ids)}
+            self.signature = signature
+            self.high_water = high_water
+            self.rebuilt_at = time.monotonic()
+            self.generation += 1
+            self.pool_generation += 1
+
+    def upsert_field(self, user_id: int, field_name: str, vector: Sequence[float]) -> None:
+        """Replace one field block for a tutor, appending a new row if needed."""
+        block = np.zeros((1, self.dim), dtype=np.float32)
+        if len(vector):
+            block[0] = np.asarray(vector, dtype=np.float32)[: self.dim]
+        normalize_rows(block)
+        with self._lock:
+            row = self._row_by_user.get(user_id)
+            if row is None:
+                row = self._append_row(user_id)
+            self._matrix[row, self.field_slice(field_name)] = block[0]
+            self.generation += 1
+
+    def upsert(self, user_id: int, vectors: Mapping[str, Sequence[float]]) -> None:
+        with self._lock:
+            for field_name in FIELDS:
+                vector = vectors.get(field_name)
+                self.upsert_field(user_id, field_name, [] if vector is None else vector)
+
+    def remove(self, user_id: int) -> bool:
+        """Tombstone a tutor's row; compacts once tombstones pile up."""
+        with self._lock:
+            row = self._row_by_user.pop(user_id, None)
+            if row is None:
+                return False
+            self._alive[row] = False
+            self._matrix[row] = 0.0
+            self._tombstones += 1
+            self.generation += 1
+            self.pool_generation += 1
+            if self._tombstones >= max(
+                _COMPACT_MIN_TOMBSTONES, int(self._size * _COMPACT_TOMBSTONE_RATIO)
+            ):
+                self.compact()
+            return True
+
+    def compact(self) -> None:
+        """Drop tombstoned rows and re-pack the matrix."""
+        with self._lock:
+            live = self._alive[: self._size]
+            self._matrix = np.ascontiguousarray(self._matrix[: self._size][live])
+            self._user_ids = self._user_ids[: self._size][live].copy()
+            self._size = self._user_ids.shape[0]
+            self._alive = np.ones(self._size, dtype=bool)
+            self._tombstones = 0
+            self._row_by_user = {int(user_id): row for row, user_id in enumerate(self._user_ids)}
+
+    def build_query(
+        self,
+        vectors: Mapping[str, Sequence[float]],
+        weights: Mapping[str, float],
+    ) -> np.ndarray:
+        """
+        Concatenate normalized query blocks, each scaled by weight / sum(weights),
+        so `matrix @ query` equals the weighted mean of per-field cosine sims.
+        """
+        weight_sum = sum(weights.get(field_name, 0.0) for field_name in FIELDS)
+        if weight_sum <= 0:
+            weight_sum = 1.0
+        query = self._row_from_vectors(vectors)[0]
+        for field_name in FIELDS:
+            block = query[self.field_slice(field_name)]
+            norm = float(np.linalg.norm(block))
+            if norm > 0:
+                block *= weights.get(field_name, 0.0) / (norm * weight_sum)
+        return query
+
+    def search(self, query: np.ndarray, top_k: int) -> list[tuple[int, float]]:
+        """Return up to `top_k` (tutor user_id, score) pairs, best first."""
+        with self._lock:
+            if self._size == 0:
+                return []
+            scores = self._matrix[: self._size] @ query.astype(np.float32, copy=False)
+            if self._tombstones:
+                scores[~self._alive[: self._size]] = -np.inf
+            picked = top_k_indices(scores, top_k)
+            return [(int(self._user_ids[row]), float(scores[row])) for row in picked]
+
+    def _append_row(self, user_id: int) -> int:
+        if self._size == self._matrix.shape[0]:
+            capacity = max(_MIN_CAPACITY, self._size * 2)
+            matrix = np.zeros((capacity, self.width), dtype=np.float32)
+            matrix[: self._size] = self._matrix[: self._size]
+            user_ids = np.zeros(capacity, dtype=np.int64)
+            user_ids[: self._size] = self._user_ids[: self._size]
+            alive = np.zeros(capacity, dtype=bool)
+            alive[: self._size] = self._alive[: self._size]
+            self._matrix, self._user_ids, self._alive = matrix, user_ids, alive
+        row = self._size
+        self._matrix[row] = 0.0
+        self._user_ids[row] = user_id
+        self._alive[row] = True
+        self._row_by_user[user_id] = row
+        self._size += 1
+        self.pool_generation += 1
+        return row
+
+    def _row_from_vectors(self, vectors: Mapping[str, Sequence[float]]) -> np.ndarray:
+        row = np.zeros((1, self.width), dtype=np.float32)
+        for field_name in FIELDS:
+            vector = vectors.get(field_name)
+            if vector is None or len(vector) == 0:
+                continue
+            row[0, self.field_slice(field_name)] = np.asarray(vector, dtype=np.float32)[: self.dim]
+        return row
+
+
+_indexes: dict[str, TutorEmbeddingIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_tutor_index(model_name: str, dim: int) -> TutorEmbeddingIndex:
+    """Return the process-wide index for `model_name`, creating it empty if needed."""
+    with _indexes_lock:
+        index = _indexes.get(model_name)
+        if index is None:
+            index = TutorEmbeddingIndex(model_name, dim)
+            _indexes[model_name] = index
+        return index
+
+
+def queue_index_upsert(
+    db: Session,
+    *,
+    user_id: int,
+    field_name: str,
+    model_name: str,
+    embedding: Sequence[float],
+) -> None:
+    """Patch the tutor index with a new field vector once `db` commits."""
+    db.info.setdefault(_PENDING_KEY, []).append(("upsert", user_id, field_name, model_name, list(embedding)))
+
+
+def queue_index_removal(db: Session, *, user_id: int) -> None:
+    """Tombstone a tutor in every loaded index once `db` commits."""
+    db.info.setdefault(_PENDING_KEY, []).append(("remove", user_id, None, None, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_index_patches(session: Session) -> None:
+    for action, user_id, field_name, model_name, embedding in session.info.pop(_PENDING_KEY, []):
+        if action == "remove":
+            with _indexes_lock:
+                indexes = list(_indexes.values())
+            for index in indexes:
+                index.remove(user_id)
+            continue
+        with _indexes_lock:
+            index = _indexes.get(model_name)
+        # An index that was never loaded will read the row from the database anyway.
+        if index is not None and index.loaded:
+            index.upsert_field(user_id, field_name, embedding)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_index_patches(session: Session, transaction) -> None:
+    # Runs after after_commit; anything still queued belongs to a rolled-back
+    # or abandoned transaction.
+    if transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
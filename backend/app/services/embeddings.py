@@ -1,14 +1,25 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import timedelta
 import hashlib
 import math
-from datetime import time
-from typing import Sequence, TypedDict
-
-from sqlalchemy.orm import Session
-
-from app.models import StudentProfile, TutorProfile, UserAvailability, UserEmbedding
+import time
+from functools import lru_cache
+from typing import Callable, Sequence, TypedDict
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, selectinload
+
+from app.config import settings
+from app.models import StudentClass, StudentProfile, TutorClass, TutorProfile, UserEmbedding
+from app.services.ann import get_synced_ivf_index
+from app.services.availability import get_availability_masks, overlap_score
+from app.services.class_index import ClassTutorIndex, get_class_index
+from app.services.embedding_codec import decode_row
+from app.services.embedding_index import FIELDS, TutorEmbeddingIndex, get_tutor_index, normalize_rows
+from app.services.pgvector import incomplete_tutor_ids, pgvector_available, pgvector_knn
 
 # Embedding config
 EMBED_DIM = 128
@@ -17,6 +28,13 @@ WEIGHTS = {
     "help": 1.0,         # student.help_needed <-> tutor.help_provided
     "locations": 0.5,    # student.locations <-> tutor.locations
 }
+# Final-score weights passed to rerank_candidates and recorded on match runs.
+RERANK_WEIGHTS = {
+    "embedding_weight": 0.45,
+    "class_strength_weight": 0.35,
+    "availability_weight": 0.10,
+    "location_weight": 0.10,
+}
 
 GRADE_POINTS = {
     "A+": 4.3,
@@ -62,21 +80,65 @@ def _tokenize(text: str) -> list[str]:
     return [token for token in text.lower().strip().split() if token]
 
 
+_EMBED_CHUNK = 256
+# Columns decode_row needs; embeddings are stored as float8[] or raw bytes.
+_EMBEDDING_COLUMNS = (UserEmbedding.embedding, UserEmbedding.embedding_bin, UserEmbedding.embedding_dtype)
+
+
+@lru_cache(maxsize=65536)
+def _token_digest_vector(token: str) -> np.ndarray:
+    """SHA-256 of a token as a read-only float64 vector of byte / 255."""
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    vector = np.frombuffer(digest, dtype=np.uint8) / 255.0
+    vector.flags.writeable = False
+    return vector
+
+
+def _embed_matrix(texts: Sequence[str]) -> np.ndarray:
+    """
+    Batch form of the local-hash-v1 embedding as a [len(texts), EMBED_DIM] array.
+
+    Each dimension i accumulates digest[i % 32] / 255 over the text's tokens,
+    then the vector is L2-normalized. Token sums and the squared norm use
+    cumsum, which adds strictly left-to-right like the original per-token
+    Python loop (np.add.reduce/reduceat may pair terms differently), so the
+    output stays bit-for-bit identical to stored local-hash-v1 vectors.
+    """
+    out = np.zeros((len(texts), EMBED_DIM), dtype=np.float64)
+    token_lists = [_tokenize(text) for text in texts]
+    rows = sorted((i for i, tokens in enumerate(token_lists) if tokens), key=lambda i: len(token_lists[i]))
+    if not rows:
+        return out
+
+    # All token vectors plus a trailing zero row used as padding; x + 0.0 == x.
+    digests = [_token_digest_vector(token) for i in rows for token in token_lists[i]]
+    token_vectors = np.vstack([*digests, np.zeros_like(digests[0])])
+    pad = token_vectors.shape[0] - 1
+    lengths = np.array([len(token_lists[i]) for i in rows])
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    dims = np.arange(EMBED_DIM) % token_vectors.shape[1]
+
+    # Rows are sorted by token count, so each chunk pads only to similar lengths.
+    for lo in range(0, len(rows), _EMBED_CHUNK):
+        hi = min(lo + _EMBED_CHUNK, len(rows))
+        width = int(lengths[hi - 1])
+        offsets = np.arange(width)
+        gather = starts[lo:hi, None] + offsets
+        gather[offsets >= lengths[lo:hi, None]] = pad
+        sums = np.cumsum(token_vectors[gather], axis=1)[:, -1]
+        vectors = sums[:, dims]
+        norms = np.sqrt(np.cumsum(vectors * vectors, axis=1)[:, -1])
+        np.divide(vectors, norms[:, None], out=vectors, where=norms[:, None] > 0)
+        out[rows[lo:hi]] = vectors
+    return out
+
+
 def _embed_from_text(text: str) -> list[float]:
     """
     Deterministic local embedding placeholder.
     Replace this with Together/OpenAI provider call if desired.
     """
-    tokens = _tokenize(text)
-    if not tokens:
-        return [0.0] * EMBED_DIM
-
-    vector = [0.0] * EMBED_DIM
-    for token in tokens:
-        digest = hashlib.sha256(token.encode("utf-8")).digest()
-        for i in range(EMBED_DIM):
-            vector[i] += digest[i % len(digest)] / 255.0
-    return _normalize(vector)
+    return _embed_matrix([text])[0].tolist()
 
 
 def join_list(values: Sequence[str] | None) -> str:
@@ -89,6 +151,26 @@ def embed_text(text: str) -> list[float]:
     return _embed_from_text(text)
 
 
+def embed_texts(texts: Sequence[str]) -> list[list[float]]:
+    """Embed many texts in one vectorized pass; same output as embed_text per item."""
+    return _embed_matrix(texts).tolist()
+
+
+Embedder = Callable[[Sequence[str]], list[list[float]]]
+
+# Batch embedders by the model_name stored on user_embeddings rows.
+EMBEDDERS: dict[str, Embedder] = {
+    "local-hash-v1": embed_texts,
+}
+
+
+def get_embedder(model_name: str) -> Embedder:
+    try:
+        return EMBEDDERS[model_name]
+    except KeyError:
+        raise ValueError(f"Unknown embedding model: {model_name}") from None
+
+
 def cosine_sim(a: Sequence[float], b: Sequence[float]) -> float:
     a_norm = _normalize(list(a))
     b_norm = _normalize(list(b))
@@ -118,6 +200,28 @@ def _get_value(item: object, attr_name: str, default: object) -> object:
     return getattr(item, attr_name, default)
 
 
+def _tutor_strength_norm(grade_points: float, has_taed: bool, *, ta_bonus: float) -> float:
+    tutor_strength_points = grade_points + (ta_bonus if has_taed else 0.0)
+    return max(0.0, min(1.0, tutor_strength_points / (MAX_GRADE_POINTS + ta_bonus)))
+
+
+def _student_need(row: object, *, help_weight: float, inverse_grade_weight: float) -> float:
+    help_level = _as_number(_get_value(row, "help_level", 5), 5.0)
+    help_level_norm = max(0.0, min(1.0, (help_level - 1.0) / 9.0))
+
+    student_grade_points = _grade_to_points(str(_get_value(row, "estimated_grade", "")))
+    student_grade_norm = _normalize_grade(student_grade_points)
+    inverse_grade_need = 1.0 - student_grade_norm
+
+    student_need = (
+        help_weight * help_level_norm
+        + inverse_grade_weight * inverse_grade_need
+    )
+    if (help_weight + inverse_grade_weight) > 0:
+        student_need = student_need / (help_weight + inverse_grade_weight)
+    return max(0.0, min(1.0, student_need))
+
+
 def compute_class_strength_score(
     tutor_classes: Sequence[object],
     student_classes: Sequence[object],
@@ -165,27 +269,12 @@ def compute_class_strength_score(
             continue
 
         tutor_grade_points, has_taed = tutor_by_class[class_id]
-        tutor_strength_points = tutor_grade_points + (ta_bonus if has_taed else 0.0)
-        tutor_strength_norm = max(
-            0.0,
-            min(1.0, tutor_strength_points / (MAX_GRADE_POINTS + ta_bonus)),
+        tutor_strength_norm = _tutor_strength_norm(tutor_grade_points, has_taed, ta_bonus=ta_bonus)
+        student_need = _student_need(
+            row,
+            help_weight=help_weight,
+            inverse_grade_weight=inverse_grade_weight,
         )
-
-        help_level = _as_number(_get_value(row, "help_level", 5), 5.0)
-        help_level_norm = max(0.0, min(1.0, (help_level - 1.0) / 9.0))
-
-        student_grade_points = _grade_to_points(str(_get_value(row, "estimated_grade", "")))
-        student_grade_norm = _normalize_grade(student_grade_points)
-        inverse_grade_need = 1.0 - student_grade_norm
-
-        student_need = (
-            help_weight * help_level_norm
-            + inverse_grade_weight * inverse_grade_need
-        )
-        if (help_weight + inverse_grade_weight) > 0:
-            student_need = student_need / (help_weight + inverse_grade_weight)
-        student_need = max(0.0, min(1.0, student_need))
-
         overlap_scores.append(tutor_strength_norm * student_need)
 
     if not overlap_scores:
@@ -231,48 +320,16 @@ class TutorMatchResult(TypedDict):
     location_match: float
 
 
+class TutorClassCandidateResult(TypedDict):
+    tutor_id: int
+    class_strength: float
+
+
 class TutorCandidateResult(TypedDict):
     tutor_id: int  # users.id
     embedding_similarity: float
 
 
-def _minutes(t: time) -> int:
-    return (t.hour * 60) + t.minute
-
-
-def _availability_overlap_score(
-    student_slots: Sequence[UserAvailability],
-    tutor_slots: Sequence[UserAvailability],
-) -> float:
-    if not student_slots or not tutor_slots:
-        return 0.0
-
-    total_student_minutes = 0
-    overlap_minutes = 0
-    tutor_by_day: dict[int, list[UserAvailability]] = {}
-
-    for slot in tutor_slots:
-        tutor_by_day.setdefault(slot.day_of_week, []).append(slot)
-
-    for s in student_slots:
-        s_start = _minutes(s.start_time)
-        s_end = _minutes(s.end_time)
-        if s_end <= s_start:
-            continue
-        total_student_minutes += (s_end - s_start)
-        for t_slot in tutor_by_day.get(s.day_of_week, []):
-            t_start = _minutes(t_slot.start_time)
-            t_end = _minutes(t_slot.end_time)
-            if t_end <= t_start:
-                continue
-            overlap = max(0, min(s_end, t_end) - max(s_start, t_start))
-            overlap_minutes += overlap
-
-    if total_student_minutes <= 0:
-        return 0.0
-    return max(0.0, min(1.0, overlap_minutes / total_student_minutes))
-
-
 def _location_match_score(
     student_locations: Sequence[str] | None,
     tutor_locations: Sequence[str] | None,
@@ -284,6 +341,211 @@ def _location_match_score(
     return len(student_set.intersection(tutor_set)) / len(student_set)
 
 
+def _tutor_index_signature(db: Session, model_name: str) -> tuple:
+    """Cheap aggregate that changes whenever the tutor pool or its embeddings change."""
+    tutor_embeddings = (UserEmbedding.entity_type == "tutor", UserEmbedding.model_name == model_name)
+    row = db.execute(
+        select(
+            select(func.count(TutorProfile.id)).scalar_subquery(),
+            select(func.count(UserEmbedding.id)).where(*tutor_embeddings).scalar_subquery(),
+            select(func.max(UserEmbedding.updated_at)).where(*tutor_embeddings).scalar_subquery(),
+        )
+    ).one()
+    return tuple(row)
+
+
+def _tutor_field_texts(tutor: TutorProfile) -> dict[str, str]:
+    return {
+        "bio": tutor.bio or "",
+        "help": join_list(tutor.help_provided),
+        "locations": join_list(tutor.preferred_locations),
+    }
+
+
+def _tutor_rows(
+    tutors: Sequence[TutorProfile],
+    embedding_map: dict,
+    embed: Embedder,
+) -> list[tuple[int, dict]]:
+    """(user_id, {field: vector}) rows, embedding any missing fields in one batch."""
+    rows: list[tuple[int, dict]] = []
+    missing: list[tuple[dict, str, str]] = []
+    for tutor in tutors:
+        vectors: dict = {}
+        for field_name, text in _tutor_field_texts(tutor).items():
+            stored = embedding_map.get((tutor.user_id, field_name))
+            if stored is not None and len(stored):
+                vectors[field_name] = stored
+            else:
+                # Fallback to embedding the profile text if cached row is missing.
+                missing.append((vectors, field_name, text))
+        rows.append((tutor.user_id, vectors))
+    if missing:
+        for (vectors, field_name, _), vector in zip(
+            missing, embed([text for _, _, text in missing]), strict=True
+        ):
+            vectors[field_name] = vector
+    return rows
+
+
+def _tutor_embedding_map(db: Session, model_name: str, user_ids: list[int] | None = None) -> dict:
+    query = db.query(UserEmbedding.user_id, UserEmbedding.field_name, *_EMBEDDING_COLUMNS).filter(
+        UserEmbedding.model_name == model_name,
+        UserEmbedding.entity_type == "tutor",
+        UserEmbedding.field_name.in_(FIELDS),
+    )
+    if user_ids is not None:
+        query = query.filter(UserEmbedding.user_id.in_(user_ids))
+    return {(row.user_id, row.field_name): decode_row(row) for row in query}
+
+
+def _load_tutor_index(db: Session, index: TutorEmbeddingIndex, signature: tuple) -> None:
+    tutors = db.query(TutorProfile).all()
+    embedding_map = _tutor_embedding_map(db, index.model_name)
+    index.rebuild(
+        _tutor_rows(tutors, embedding_map, get_embedder(index.model_name)),
+        signature=signature,
+        high_water=signature[2],
+    )
+
+
+def _sync_tutor_index(db: Session, index: TutorEmbeddingIndex, signature: tuple) -> None:
+    """
+    Catch the index up with writes made by other processes: re-read embedding
+    rows touched since the last sync (with an overlap for late commits), then
+    reconcile the set of tutor ids. Tutors the index has not seen yet are
+    loaded as whole rows rather than one field at a time.
+    """
+    changed = db.query(UserEmbedding.user_id, UserEmbedding.field_name, *_EMBEDDING_COLUMNS).filter(
+        UserEmbedding.model_name == index.model_name,
+        UserEmbedding.entity_type == "tutor",
+        UserEmbedding.field_name.in_(FIELDS),
+    )
+    if index.high_water is not None:
+        overlap = timedelta(seconds=settings.tutor_index_sync_overlap_seconds)
+        changed = changed.filter(UserEmbedding.updated_at >= index.high_water - overlap)
+    for row in changed:
+        if row.user_id in index:
+            index.upsert_field(row.user_id, row.field_name, decode_row(row))
+
+    tutor_ids = set(db.execute(select(TutorProfile.user_id)).scalars().all())
+    indexed_ids = index.user_ids()
+    for user_id in indexed_ids - tutor_ids:
+        index.remove(user_id)
+    missing_ids = sorted(tutor_ids - indexed_ids)
+    if missing_ids:
+        tutors = db.query(TutorProfile).filter(TutorProfile.user_id.in_(missing_ids)).all()
+        embedding_map = _tutor_embedding_map(db, index.model_name, missing_ids)
+        for user_id, vectors in _tutor_rows(tutors, embedding_map, get_embedder(index.model_name)):
+            index.upsert(user_id, vectors)
+
+    index.signature = signature
+    index.high_water = signature[2]
+
+
+def get_fresh_tutor_index(db: Session, model_name: str) -> TutorEmbeddingIndex:
+    """
+    Return the in-process tutor index, reconciled with the database.
+
+    Commits in this process patch the index directly (see embedding_index);
+    the signature check only has to catch up on writes from other workers.
+    Writes the signature and delta sync can miss (a late commit with an older
+    updated_at) are reconciled by a full reload every
+    tutor_index_reconcile_seconds.
+    """
+    index = get_tutor_index(model_name, EMBED_DIM)
+    signature = _tutor_index_signature(db, model_name)
+    reconcile_due = (
+        index.rebuilt_at is None
+        or time.monotonic() - index.rebuilt_at >= settings.tutor_index_reconcile_seconds
+    )
+    if index.signature == signature and not reconcile_due:
+        return index
+    if index.loaded and not reconcile_due:
+        _sync_tutor_index(db, index, signature)
+    else:
+        _load_tutor_index(db, index, signature)
+    return index
+
+
+def _class_index_signature(db: Session) -> tuple[int, int]:
+    count, id_sum = db.execute(
+        select(func.count(TutorClass.id), func.coalesce(func.sum(TutorClass.id), 0))
+    ).one()
+    return (int(count), int(id_sum))
+
+
+def get_fresh_class_index(db: Session) -> ClassTutorIndex:
+    """Return the in-process class index, rebuilt if `tutor_classes` changed elsewhere."""
+    index = get_class_index()
+    signature = _class_index_signature(db)
+    if index.signature != signature:
+        rows = db.execute(
+            select(
+                TutorClass.id,
+                TutorClass.class_id,
+                TutorProfile.user_id,
+                TutorClass.grade_received,
+                TutorClass.has_taed,
+            ).join(TutorProfile, TutorProfile.id == TutorClass.tutor_id)
+        )
+        index.rebuild(
+            (
+                (row_id, class_id, tutor_user_id, _grade_to_points(grade), bool(has_taed))
+                for row_id, class_id, tutor_user_id, grade, has_taed in rows
+            ),
+            signature=signature,
+        )
+    return index
+
+
+def index_tutor_class(tutor_user_id: int, row: TutorClass) -> None:
+    """Add a just-committed tutor_classes row to the class index."""
+    get_class_index().add(
+        (row.id, row.class_id, tutor_user_id, _grade_to_points(row.grade_received), bool(row.has_taed))
+    )
+
+
+def unindex_tutor_class(row_id: int) -> None:
+    """Drop a just-deleted tutor_classes row from the class index."""
+    get_class_index().remove(row_id)
+
+
+def _pgvector_retrieval(db: Session) -> bool:
+    return (
+        settings.tutor_ann_backend == "pgvector"
+        and settings.embedding_encoding == "array"
+        and pgvector_available(db)
+    )
+
+
+def _merge_rescored_tutors(
+    results: list[tuple[int, float]],
+    rows: list[tuple[int, dict]],
+    vectors: dict,
+    weights: dict[str, float],
+    top_k: int,
+    *,
+    model_name: str,
+) -> list[tuple[int, float]]:
+    """
+    Replace the pgvector scores of `rows`' tutors (whose missing fields it
+    counted as zero) with the in-process index's scores, then re-take the top k.
+    """
+    index = TutorEmbeddingIndex(model_name, EMBED_DIM)
+    index.rebuild(rows)
+    rescored = dict(index.search(index.build_query(vectors, weights), len(rows)))
+    merged = {tutor_id: score for tutor_id, score in results if tutor_id not in rescored}
+    merged.update(rescored)
+    return sorted(merged.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+
+
+def sync_tutor_index_for_retrieval(db: Session, model_name: str) -> None:
+    """Reconcile the in-process tutor index ahead of retrieval, unless pgvector serves it."""
+    if not _pgvector_retrieval(db):
+        get_fresh_tutor_index(db, model_name)
+
+
 def knn_retrieve_candidates(
     db: Session,
     *,
@@ -293,10 +555,18 @@ def knn_retrieve_candidates(
     bio_weight: float = 1.0,
     help_weight: float = 1.0,
     locations_weight: float = 0.5,
+    nprobe: int | None = None,
 ) -> list[TutorCandidateResult]:
     """
     First-stage KNN-like retrieval over weighted embedding similarity.
 
+    Tutors are scored with one mat-vec against the process-resident
+    TutorEmbeddingIndex; only the student's own embeddings are read per call.
+    With settings.tutor_ann_backend == "ivf" and a large enough pool, only the
+    `nprobe` closest IVF lists are scored (see app.services.ann). With
+    "pgvector" and the embedding_vec column present, the search runs in
+    Postgres and the in-process index is never loaded (see app.services.pgvector).
+
     Returns tutor user IDs (users.id), suitable to pass directly into
     rerank_candidates(..., candidate_tutor_ids=[...]).
     """
@@ -304,61 +574,184 @@ def knn_retrieve_candidates(
     if student is None:
         return []
 
-    tutors = db.query(TutorProfile).all()
-    if not tutors:
-        return []
-
-    tutor_user_ids = [t.user_id for t in tutors]
     embedding_rows = (
         db.query(UserEmbedding)
         .filter(
             UserEmbedding.model_name == model_name,
-            UserEmbedding.user_id.in_([student.user_id, *tutor_user_ids]),
-            UserEmbedding.field_name.in_(["bio", "help", "locations"]),
+            UserEmbedding.user_id == student.user_id,
+            UserEmbedding.entity_type == "student",
+            UserEmbedding.field_name.in_(FIELDS),
         )
         .all()
     )
-    embedding_map = {
-        (row.user_id, row.entity_type, row.field_name): row.embedding
-        for row in embedding_rows
-    }
+    embedding_map = {row.field_name: decode_row(row) for row in embedding_rows}
 
-    # Fallback to deterministic local embedding if cached row is missing.
-    student_bio_vec = embedding_map.get((student.user_id, "student", "bio")) or embed_text(student.bio or "")
-    student_help_vec = embedding_map.get((student.user_id, "student", "help")) or embed_text(
-        join_list(student.help_needed)
-    )
-    student_locations_vec = embedding_map.get((student.user_id, "student", "locations")) or embed_text(
-        join_list(student.preferred_locations)
-    )
+    # Fallback to embedding the profile text if cached row is missing.
+    student_texts = {
+        "bio": student.bio or "",
+        "help": join_list(student.help_needed),
+        "locations": join_list(student.preferred_locations),
+    }
+    missing = [
+        field_name
+        for field_name in FIELDS
+        if field_name not in embedding_map or len(embedding_map[field_name]) == 0
+    ]
+    if missing:
+        embed = get_embedder(model_name)
+        embedding_map.update(zip(missing, embed([student_texts[f] for f in missing]), strict=True))
+    weights = {"bio": bio_weight, "help": help_weight, "locations": locations_weight}
+
+    if _pgvector_retrieval(db) and all(len(embedding_map[f]) == EMBED_DIM for f in FIELDS):
+        results = pgvector_knn(
+            db,
+            model_name=model_name,
+            vectors=embedding_map,
+            weights=weights,
+            top_k=top_k,
+        )
+        incomplete = incomplete_tutor_ids(db, model_name=model_name)
+        if incomplete:
+            tutors = db.query(TutorProfile).filter(TutorProfile.user_id.in_(incomplete)).all()
+            rows = _tutor_rows(tutors, _tutor_embedding_map(db, model_name, incomplete), get_embedder(model_name))
+            results = _merge_rescored_tutors(results, rows, embedding_map, weights, top_k, model_name=model_name)
+        return [
+            {"tutor_id": tutor_id, "embedding_similarity": score}
+            for tutor_id, score in results
+        ]
+
+    index = get_fresh_tutor_index(db, model_name)
+    if len(index) == 0:
+        return []
+    query = index.build_query(embedding_map, weights)
+    if settings.tutor_ann_backend == "ivf" and len(index) >= settings.tutor_ann_min_tutors:
+        ivf = get_synced_ivf_index(
+            index,
+            nlist=settings.tutor_ann_nlist,
+            nprobe=settings.tutor_ann_nprobe,
+        )
+        results = ivf.search(query, top_k, nprobe=nprobe)
+    else:
+        results = index.search(query, top_k)
+    return [
+        {"tutor_id": tutor_id, "embedding_similarity": score}
+        for tutor_id, score in results
+    ]
+
+
+def _embedding_similarity_column(
+    student_vectors: dict[str, Sequence[float]],
+    tutor_vectors: Sequence[dict[str, Sequence[float]]],
+) -> np.ndarray:
+    """Weighted three-field cosine similarity of every tutor against the student.
+
+    A field missing on either side contributes 0, like cosine_sim on an empty vector.
+    """
+    weighted = np.zeros(len(tutor_vectors), dtype=np.float64)
+    for field_name in FIELDS:
+        student_vector = student_vectors.get(field_name)
+        if student_vector is None or len(student_vector) == 0:
+            continue
+        query = normalize_rows(np.asarray([student_vector], dtype=np.float64))[0]
+        matrix = np.zeros((len(tutor_vectors), query.shape[0]), dtype=np.float64)
+        for i, vectors in enumerate(tutor_vectors):
+            vector = vectors.get(field_name)
+            if vector is not None and len(vector) == query.shape[0]:
+                matrix[i] = vector
+        weighted += WEIGHTS[field_name] * (normalize_rows(matrix) @ query)
+    return weighted / sum(WEIGHTS[field_name] for field_name in FIELDS)
 
-    weight_sum = bio_weight + help_weight + locations_weight
-    if weight_sum <= 0:
-        weight_sum = 1.0
 
-    scored: list[TutorCandidateResult] = []
-    for tutor in tutors:
-        tutor_bio_vec = embedding_map.get((tutor.user_id, "tutor", "bio")) or embed_text(tutor.bio or "")
-        tutor_help_vec = embedding_map.get((tutor.user_id, "tutor", "help")) or embed_text(
-            join_list(tutor.help_provided)
-        )
-        tutor_locations_vec = embedding_map.get((tutor.user_id, "tutor", "locations")) or embed_text(
-            join_list(tutor.preferred_locations)
+def _student_needs(
+    student_classes: Sequence[object],
+    *,
+    help_weight: float = 0.5,
+    inverse_grade_weight: float = 0.5,
+) -> dict[int, float]:
+    return {
+        int(row.class_id): _student_need(
+            row,
+            help_weight=help_weight,
+            inverse_grade_weight=inverse_grade_weight,
         )
+        for row in student_classes
+        if row.class_id is not None
+    }
 
-        sim_bio = cosine_sim(student_bio_vec, tutor_bio_vec)
-        sim_help = cosine_sim(student_help_vec, tutor_help_vec)
-        sim_locations = cosine_sim(student_locations_vec, tutor_locations_vec)
-        embedding_similarity = (
-            (bio_weight * sim_bio)
-            + (help_weight * sim_help)
-            + (locations_weight * sim_locations)
-        ) / weight_sum
 
-        scored.append({"tutor_id": tutor.user_id, "embedding_similarity": embedding_similarity})
+def _class_strengths(
+    index: ClassTutorIndex,
+    need_by_class: dict[int, float],
+    *,
+    ta_bonus: float = 0.5,
+) -> dict[int, float]:
+    """compute_class_strength_score for every tutor sharing a class, from the class index."""
+    totals: dict[int, float] = {}
+    counts: dict[int, int] = {}
+    for class_id, tutor_id, grade_points, has_taed in index.overlap(need_by_class):
+        strength = _tutor_strength_norm(grade_points, has_taed, ta_bonus=ta_bonus)
+        totals[tutor_id] = totals.get(tutor_id, 0.0) + strength * need_by_class[class_id]
+        counts[tutor_id] = counts.get(tutor_id, 0) + 1
+    return {tutor_id: total / counts[tutor_id] for tutor_id, total in totals.items()}
+
+
+def _class_strength_column(
+    tutor_user_ids: Sequence[int],
+    student_classes: Sequence[object],
+    index: ClassTutorIndex,
+) -> np.ndarray:
+    strengths = _class_strengths(index, _student_needs(student_classes))
+    return np.array([strengths.get(tutor_id, 0.0) for tutor_id in tutor_user_ids], dtype=np.float64)
 
-    scored.sort(key=lambda row: row["embedding_similarity"], reverse=True)
-    return scored[:top_k]
+
+def class_overlap_candidates(
+    db: Session,
+    *,
+    student_id: int,
+    top_k: int = 50,
+) -> list[TutorClassCandidateResult]:
+    """
+    Tutors sharing a class with the student, strongest class match first.
+
+    Used alongside KNN retrieval so tutors with a strong class match are not
+    lost to the embedding top-k cutoff.
+    """
+    student_classes = db.execute(
+        select(StudentClass.class_id, StudentClass.help_level, StudentClass.estimated_grade)
+        .join(StudentProfile, StudentProfile.id == StudentClass.student_id)
+        .where(StudentProfile.user_id == student_id)
+    ).all()
+    need_by_class = _student_needs(student_classes)
+    if not need_by_class or top_k <= 0:
+        return []
+
+    strengths = _class_strengths(get_fresh_class_index(db), need_by_class)
+    ranked = sorted(strengths.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+    return [{"tutor_id": tutor_id, "class_strength": strength} for tutor_id, strength in ranked]
+
+
+def retrieve_match_candidates(
+    db: Session,
+    *,
+    student_id: int,
+    top_k: int = 50,
+    class_top_k: int | None = None,
+    model_name: str = "local-hash-v1",
+) -> list[int]:
+    """KNN candidates followed by any class-overlap candidates not already among them."""
+    candidates = knn_retrieve_candidates(
+        db,
+        student_id=student_id,
+        top_k=top_k,
+        model_name=model_name,
+    )
+    tutor_ids = [row["tutor_id"] for row in candidates]
+    class_top_k = settings.match_class_candidates if class_top_k is None else class_top_k
+    if class_top_k > 0:
+        tutor_ids.extend(
+            row["tutor_id"] for row in class_overlap_candidates(db, student_id=student_id, top_k=class_top_k)
+        )
+    return list(dict.fromkeys(tutor_ids))
 
 
 def rerank_candidates(
@@ -373,98 +766,91 @@ def rerank_candidates(
     location_weight: float = 0.10,
     model_name: str = "local-hash-v1",
 ) -> list[TutorMatchResult]:
+    """
+    Score candidate tutors for a student on the four match features.
+
+    Runs a fixed number of queries however many candidates there are: the
+    student comes with their class rows via selectinload, tutor locations and
+    embeddings for the student and every candidate are read in one query each,
+    class strength comes from the class index and availability from the cached
+    weekly bitsets. Features are gathered into one column per feature and
+    combined at once.
+    """
     if not candidate_tutor_ids:
         return []
 
-    student = db.query(StudentProfile).filter(StudentProfile.user_id == student_id).first()
+    student = db.execute(
+        select(StudentProfile)
+        .options(selectinload(StudentProfile.classes_enrolled))
+        .where(StudentProfile.user_id == student_id)
+    ).scalar_one_or_none()
     if student is None:
         return []
 
-    tutors = (
-        db.query(TutorProfile)
-        .filter(TutorProfile.user_id.in_(candidate_tutor_ids))
-        .all()
-    )
+    candidate_order = list(dict.fromkeys(candidate_tutor_ids))
+    tutor_by_id = {
+        tutor.user_id: tutor
+        for tutor in db.execute(
+            select(TutorProfile.user_id, TutorProfile.preferred_locations)
+            .where(TutorProfile.user_id.in_(candidate_order))
+        )
+    }
+    tutors = [tutor_by_id[tutor_id] for tutor_id in candidate_order if tutor_id in tutor_by_id]
     if not tutors:
         return []
-
-    tutor_by_id = {t.user_id: t for t in tutors}
-    tutor_user_ids = [t.user_id for t in tutors]
-
-    embedding_rows = (
-        db.query(UserEmbedding)
-        .filter(
+    tutor_user_ids = [tutor.user_id for tutor in tutors]
+
+    embedding_map: dict[tuple[int, str, str], np.ndarray] = {}
+    for row in db.execute(
+        select(
+            UserEmbedding.user_id,
+            UserEmbedding.entity_type,
+            UserEmbedding.field_name,
+            *_EMBEDDING_COLUMNS,
+        ).where(
             UserEmbedding.model_name == model_name,
             UserEmbedding.user_id.in_([student.user_id, *tutor_user_ids]),
-            UserEmbedding.field_name.in_(["bio", "help", "locations"]),
+            UserEmbedding.field_name.in_(FIELDS),
         )
-        .all()
-    )
-    embedding_map = {
-        (row.user_id, row.entity_type, row.field_name): row.embedding
-        for row in embedding_rows
-    }
+    ):
+        embedding_map[(row.user_id, row.entity_type, row.field_name)] = decode_row(row)
 
-    student_slots = db.query(UserAvailability).filter(UserAvailability.user_id == student.user_id).all()
-    tutor_slots = db.query(UserAvailability).filter(UserAvailability.user_id.in_(tutor_user_ids)).all()
-    tutor_slots_by_user: dict[int, list[UserAvailability]] = {}
-    for slot in tutor_slots:
-        tutor_slots_by_user.setdefault(slot.user_id, []).append(slot)
+    masks = get_availability_masks(db, [student.user_id, *tutor_user_ids])
 
-    scored: list[TutorMatchResult] = []
-    for tutor_id in candidate_tutor_ids:
-        tutor = tutor_by_id.get(tutor_id)
-        if tutor is None:
-            continue
-
-        sim_bio = cosine_sim(
-            embedding_map.get((student.user_id, "student", "bio"), []),
-            embedding_map.get((tutor.user_id, "tutor", "bio"), []),
-        )
-        sim_help = cosine_sim(
-            embedding_map.get((student.user_id, "student", "help"), []),
-            embedding_map.get((tutor.user_id, "tutor", "help"), []),
-        )
-        sim_locations = cosine_sim(
-            embedding_map.get((student.user_id, "student", "locations"), []),
-            embedding_map.get((tutor.user_id, "tutor", "locations"), []),
-        )
-        embedding_similarity = (
-            (WEIGHTS["bio"] * sim_bio)
-            + (WEIGHTS["help"] * sim_help)
-            + (WEIGHTS["locations"] * sim_locations)
-        ) / (WEIGHTS["bio"] + WEIGHTS["help"] + WEIGHTS["locations"])
-
-        class_strength = compute_class_strength_score(
-            tutor_classes=tutor.classes_tutoring,
-            student_classes=student.classes_enrolled,
-        )
-        availability_overlap = _availability_overlap_score(
-            student_slots=student_slots,
-            tutor_slots=tutor_slots_by_user.get(tutor.user_id, []),
-        )
-        location_match = _location_match_score(student.preferred_locations, tutor.preferred_locations)
-
-        weight_sum = embedding_weight + class_strength_weight + availability_weight + location_weight
-        if weight_sum <= 0:
-            weight_sum = 1.0
-        final_score = (
-            (embedding_weight * embedding_similarity)
-            + (class_strength_weight * class_strength)
-            + (availability_weight * availability_overlap)
-            + (location_weight * location_match)
-        ) / weight_sum
-
-        scored.append(
-            {
-                "tutor_id": tutor.user_id,
-                "final_score": final_score,
-                "embedding_similarity": embedding_similarity,
-                "class_strength": class_strength,
-                "availability_overlap": availability_overlap,
-                "location_match": location_match,
-            }
-        )
+    embedding_similarity = _embedding_similarity_column(
+        {f: embedding_map.get((student.user_id, "student", f)) for f in FIELDS},
+        [{f: embedding_map.get((t.user_id, "tutor", f)) for f in FIELDS} for t in tutors],
+    )
+    class_strength = _class_strength_column(tutor_user_ids, student.classes_enrolled, get_fresh_class_index(db))
+    availability_overlap = np.array(
+        [overlap_score(masks[student.user_id], masks[t.user_id]) for t in tutors],
+        dtype=np.float64,
+    )
+    location_match = np.array(
+        [_location_match_score(student.preferred_locations, t.preferred_locations) for t in tutors],
+        dtype=np.float64,
+    )
 
-    scored.sort(key=lambda row: row["final_score"], reverse=True)
-    return scored[:top_k]
\ No newline at end of file
+    weight_sum = embedding_weight + class_strength_weight + availability_weight + location_weight
+    if weight_sum <= 0:
+        weight_sum = 1.0
+    final_score = (
+        (embedding_weight * embedding_similarity)
+        + (class_strength_weight * class_strength)
+        + (availability_weight * availability_overlap)
+        + (location_weight * location_match)
+    ) / weight_sum
+
+    # Highest score first; equal scores keep candidate order.
+    order = np.lexsort((np.arange(len(tutors)), -final_score))[: max(top_k, 0)]
+    return [
+        {
+            "tutor_id": tutors[i].user_id,
+            "final_score": float(final_score[i]),
+            "embedding_similarity": float(embedding_similarity[i]),
+            "class_strength": float(class_strength[i]),
+            "availability_overlap": float(availability_overlap[i]),
+            "location_match": float(location_match[i]),
+        }
+        for i in order
+    ]
\ No newline at end of file
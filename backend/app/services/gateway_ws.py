@@ -0,0 +1,108 @@
+"""One multiplexed WebSocket per client for chat and notifications.
+
+Instead of a socket per open conversation plus one for notifications, a
+client keeps a single gateway socket. It subscribes to conversations with
+frames, and its notifications are pushed on the same socket. Each process
+subscribes to a broker channel while any of its gateway connections needs it:
+the user's notification channel for as long as they are connected, and a
+conversation's chat channel while one of its sockets is subscribed.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import partial
+
+from fastapi import WebSocket
+
+from app.models import Conversation
+from app.services.broker import Broker, Handler, chat_channel, get_broker, notification_channel
+from app.services.socket_sender import SocketSender
+
+
+@dataclass(eq=False)
+class GatewayConnection:
+    websocket: WebSocket
+    user_id: int
+    conversations: set[int] = field(default_factory=set)
+    sender: SocketSender | None = None
+    # Conversations this user was checked to participate in, by id
+    verified: dict[int, Conversation] = field(default_factory=dict)
+
+    def send(self, frame: dict) -> None:
+        """Queue a frame for this client (see SocketSender)."""
+        if self.sender is not None:
+            self.sender.send(frame)
+
+
+class GatewayManager:
+    def __init__(self, broker: Broker | None = None) -> None:
+        self.by_user: dict[int, list[GatewayConnection]] = {}
+        self.by_conversation: dict[int, list[GatewayConnection]] = {}
+        self._user_handlers: dict[int, Handler] = {}
+        self._chat_handlers: dict[int, Handler] = {}
+        self._broker = broker
+
+    @property
+    def broker(self) -> Broker:
+        return self._broker or get_broker()
+
+    async def connect(self, websocket: WebSocket, user_id: int) -> GatewayConnection:
+        await websocket.accept()
+        connection = GatewayConnection(websocket=websocket, user_id=user_id)
+        connection.sender = SocketSender(websocket, partial(self.disconnect, connection))
+        if user_id not in self.by_user:
+            self.by_user[user_id] = []
+            handler = self._user_handlers[user_id] = partial(self._deliver_notification, user_id)
+            await self.broker.subscribe(notification_channel(user_id), handler)
+        self.by_user[user_id].append(connection)
+        return connection
+
+    async def subscribe(self, connection: GatewayConnection, conversation_id: int) -> None:
+        if conversation_id in connection.conversations:
+            return
+        connection.conversations.add(conversation_id)
+        if conversation_id not in self.by_conversation:
+            self.by_conversation[conversation_id] = []
+            handler = self._chat_handlers[conversation_id] = partial(self._deliver_chat, conversation_id)
+            await self.broker.subscribe(chat_channel(conversation_id), handler)
+        self.by_conversation[conversation_id].append(connection)
+
+    async def unsubscribe(self, connection: GatewayConnection, conversation_id: int) -> None:
+        if conversation_id not in connection.conversations:
+            return
+        connection.conversations.discard(conversation_id)
+        subscribers = self.by_conversation.get(conversation_id, [])
+        if connection in subscribers:
+            subscribers.remove(connection)
+        if not subscribers and conversation_id in self.by_conversation:
+            del self.by_conversation[conversation_id]
+            await self.broker.unsubscribe(chat_channel(conversation_id), self._chat_handlers.pop(conversation_id))
+
+    async def disconnect(self, connection: GatewayConnection) -> None:
+        if connection.sender is not None:
+            connection.sender.stop()
+            connection.sender = None
+        for conversation_id in list(connection.conversations):
+            await self.unsubscribe(connection, conversation_id)
+        connections = self.by_user.get(connection.user_id)
+        if connections is None:
+            return
+        if connection in connections:
+            connections.remove(connection)
+        if not connections:
+            del self.by_user[connection.user_id]
+            await self.broker.unsubscribe(
+                notification_channel(connection.user_id), self._user_handlers.pop(connection.user_id)
+            )
+
+    async def _deliver_chat(self, conversation_id: int, message: dict) -> None:
+        frame = {"type": "message", "conversation_id": conversation_id, "message": message}
+        for connection in list(self.by_conversation.get(conversation_id, [])):
+            connection.send(frame)
+
+    async def _deliver_notification(self, user_id: int, payload: dict) -> None:
+        for connection in list(self.by_user.get(user_id, [])):
+            connection.send(payload)
+
+
+gateway_manager = GatewayManager()
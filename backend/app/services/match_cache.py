@@ -0,0 +1,77 @@
+"""Per-student cache of the last reranked tutor candidates.
+
+/matches/me/refresh computes the candidates and stores them here; /me/select
+only needs to check that the chosen tutor is among them, so it reads the cache
+instead of rerunning KNN + rerank. An entry is only served while the key it was
+stored under is still current: the tutor index pool generation (tutors joining
+or leaving) plus the availability and class generations bumped by the crud
+writers. A tutor editing their own profile does not drop every entry; the
+candidates a student was shown stay selectable until the TTL. A student's own
+profile and class edits drop just their entry. Entries also expire after a TTL,
+which bounds staleness from writes made on other workers.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+from app.services.embedding_index import get_tutor_index
+from app.services.embeddings import EMBED_DIM, TutorMatchResult
+
+_CACHE_TTL_SECONDS = 300.0
+_CACHE_MAX_STUDENTS = 10000
+
+GENERATION_SOURCES: tuple[str, ...] = ("availability", "classes")
+
+_generations: dict[str, int] = {source: 0 for source in GENERATION_SOURCES}
+_cache: OrderedDict[int, tuple[float, tuple, list[TutorMatchResult]]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def bump_generation(source: str) -> None:
+    """Mark every cached entry stale after a write that can change any student's scores."""
+    with _lock:
+        _generations[source] += 1
+
+
+def candidate_cache_key(model_name: str) -> tuple:
+    """
+    Current key. Take it before computing so a concurrent write is not masked,
+    but after syncing the tutor index (sync_tutor_index_for_retrieval): a sync
+    during retrieval would otherwise leave the entry under an already dead key.
+    """
+    index = get_tutor_index(model_name, EMBED_DIM)
+    with _lock:
+        return (model_name, index.pool_generation, *(_generations[s] for s in GENERATION_SOURCES))
+
+
+def store_candidates(student_id: int, key: tuple, rows: list[TutorMatchResult]) -> None:
+    with _lock:
+        _cache[student_id] = (time.monotonic(), key, list(rows))
+        _cache.move_to_end(student_id)
+        while len(_cache) > _CACHE_MAX_STUDENTS:
+            _cache.popitem(last=False)
+
+
+def get_cached_candidates(student_id: int, key: tuple) -> list[TutorMatchResult] | None:
+    with _lock:
+        entry = _cache.get(student_id)
+        if entry is None:
+            return None
+        stored_at, stored_key, rows = entry
+        if stored_key != key or time.monotonic() - stored_at >= _CACHE_TTL_SECONDS:
+            del _cache[student_id]
+            return None
+        _cache.move_to_end(student_id)
+        return rows
+
+
+def invalidate_student(student_id: int) -> None:
+    with _lock:
+        _cache.pop(student_id, None)
+
+
+def clear_match_cache() -> None:
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,188 @@
+"""Batch materialization of tutor recommendations for every active student.
+
+Students are split into chunks and scored (KNN retrieval + rerank) in a
+ProcessPoolExecutor; each worker process keeps its own tutor index warm across
+chunks. The parent writes each finished chunk as "batch" match runs with
+save_batch_match_runs (two multi-row INSERTs per chunk) and commits, so
+/matches/me/recommended can serve the precomputed rows directly.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.crud.matches import BatchMatchRun, save_batch_match_runs
+from app.database import SessionLocal, engine
+from app.models import StudentProfile, User
+from app.services.embeddings import RERANK_WEIGHTS, rerank_candidates, retrieve_match_candidates
+
+logger = logging.getLogger(__name__)
+
+STAGES: tuple[str, ...] = ("knn", "rerank", "write")
+
+
+@dataclass
+class MaterializeReport:
+    model_name: str
+    students: int = 0
+    matches: int = 0
+    failed_chunks: int = 0
+    elapsed_seconds: float = 0.0
+    stage_ms: dict[str, float] = field(default_factory=lambda: {stage: 0.0 for stage in STAGES})
+
+    @property
+    def students_per_second(self) -> float:
+        return self.students / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+
+def active_student_ids(db: Session) -> list[int]:
+    """User ids of students whose account is active (status 0)."""
+    return list(
+        db.scalars(
+            select(User.id)
+            .join(StudentProfile, StudentProfile.user_id == User.id)
+            .where(User.status == 0)
+            .order_by(User.id)
+        )
+    )
+
+
+def score_students(
+    db: Session,
+    student_ids: Sequence[int],
+    *,
+    model_name: str,
+    top_k: int = 10,
+    candidate_k: int = 50,
+) -> list[BatchMatchRun]:
+    """Candidate retrieval + rerank for each student, timing both stages per student."""
+    runs: list[BatchMatchRun] = []
+    for student_id in student_ids:
+        started = time.perf_counter()
+        candidate_tutor_ids = retrieve_match_candidates(
+            db,
+            student_id=student_id,
+            top_k=candidate_k,
+            model_name=model_name,
+        )
+        retrieved = time.perf_counter()
+        ranked_rows = rerank_candidates(
+            db,
+            student_id=student_id,
+            candidate_tutor_ids=candidate_tutor_ids,
+            top_k=top_k,
+            model_name=model_name,
+            **RERANK_WEIGHTS,
+        )
+        finished = time.perf_counter()
+        runs.append(
+            {
+                "student_id": student_id,
+                "ranked_rows": ranked_rows,
+                "duration_ms": (finished - started) * 1000,
+                "stage_timings_json": {
+                    "knn_ms": (retrieved - started) * 1000,
+                    "rerank_ms": (finished - retrieved) * 1000,
+                },
+            }
+        )
+        # Rerank loads the student profile and class rows; don't let them pile up across a chunk.
+        db.expunge_all()
+    return runs
+
+
+def _init_worker() -> None:
+    # Forked workers must not reuse the parent's pooled connections.
+    engine.dispose(close=False)
+
+
+def _score_chunk(student_ids: list[int], model_name: str, top_k: int, candidate_k: int) -> list[BatchMatchRun]:
+    with SessionLocal() as db:
+        return score_students(
+            db,
+            student_ids,
+            model_name=model_name,
+            top_k=top_k,
+            candidate_k=candidate_k,
+        )
+
+
+def materialize_matches(
+    session_factory: sessionmaker,
+    *,
+    model_name: str,
+    top_k: int = 10,
+    candidate_k: int = 50,
+    workers: int | None = None,
+    chunk_size: int = 200,
+) -> MaterializeReport:
+    """
+    Recompute and store the top-k tutors for every active student.
+
+    With workers=1 everything runs in this process (useful for debugging and
+    small pools); otherwise chunks go to a ProcessPoolExecutor. A chunk that
+    raises is logged and skipped so one bad profile does not abort the run.
+    """
+    report = MaterializeReport(model_name=model_name)
+    started = time.perf_counter()
+    with session_factory() as db:
+        student_ids = active_student_ids(db)
+    chunks = [student_ids[i : i + chunk_size] for i in range(0, len(student_ids), chunk_size)]
+    workers = workers or min(len(chunks), os.cpu_count() or 1) or 1
+
+    def _write(runs: list[BatchMatchRun]) -> None:
+        write_started = time.perf_counter()
+        with session_factory() as db:
+            report.matches += save_batch_match_runs(
+                db, runs, model_name=model_name, weights_json=RERANK_WEIGHTS
+            )
+            db.commit()
+        report.stage_ms["write"] += (time.perf_counter() - write_started) * 1000
+        report.students += len(runs)
+        for run in runs:
+            report.stage_ms["knn"] += run["stage_timings_json"]["knn_ms"]
+            report.stage_ms["rerank"] += run["stage_timings_json"]["rerank_ms"]
+        logger.info("%s: %d/%d students materialized", model_name, report.students, len(student_ids))
+
+    def _failed(chunk: list[int]) -> None:
+        logger.exception("Scoring students %d..%d failed", chunk[0], chunk[-1])
+        report.failed_chunks += 1
+
+    if workers == 1:
+        for chunk in chunks:
+            try:
+                with session_factory() as db:
+                    runs = score_students(
+                        db,
+                        chunk,
+                        model_name=model_name,
+                        top_k=top_k,
+                        candidate_k=candidate_k,
+                    )
+            except Exception:
+                _failed(chunk)
+                continue
+            _write(runs)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(_score_chunk, chunk, model_name, top_k, candidate_k): chunk
+                for chunk in chunks
+            }
+            for future in as_completed(futures):
+                try:
+                    runs = future.result()
+                except Exception:
+                    _failed(futures[future])
+                    continue
+                _write(runs)
+
+    report.elapsed_seconds = time.perf_counter() - started
+    return report
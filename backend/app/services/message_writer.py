@@ -0,0 +1,327 @@
+"""Write-behind persistence for chat messages sent over WebSockets.
+
+With CHAT_WRITE_BEHIND on, a socket message does not commit its own
+transaction. Instead:
+
+1. It takes its id (and its notification's id) from a block of sequence
+   values reserved by this process.
+2. It is broadcast at once.
+3. It waits in a bounded queue. A background task writes the queue in
+   micro-batches: one multi-row INSERT for the messages, one for their
+   notifications, and one conversation UPDATE per conversation, all in a single
+   transaction.
+
+A batch is written at most chat_write_behind_max_delay_ms after its first
+message arrived.
+
+Durability contract: a pending message's `saved` future resolves only after
+its batch commits. The sender is acked from that future, so an acked message
+is durable. A failed batch is retried. Rows rejected by the database (e.g. the
+conversation was deleted meanwhile) are isolated by retrying them one at a
+time, and only their futures fail. close() drains the queue on shutdown. A
+process crash loses at most the unacked pending messages, which recipients may
+already have seen.
+
+Lag bound: a message is committed within chat_write_behind_max_lag_ms of
+submit() or not at all (its future fails with LagExceeded). Reconnect
+catch-up relies on this to know when every message broadcast before it
+started has been stored (settle_seconds); barrier() gives the same answer
+exactly for this process's own writer.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.crud.messages import record_messages_stmt
+from app.models import Conversation, Message, Notification
+
+logger = logging.getLogger(__name__)
+
+_MAX_ATTEMPTS = 5
+_RETRY_BACKOFF_SECONDS = 0.1
+# Allowance for the COMMIT itself, which starts before the deadline
+_COMMIT_GRACE_SECONDS = 1.0
+
+ReserveIds = Callable[[str, int], Awaitable[list[int]]]
+
+
+class IdBlock:
+    """Ids of `table` handed out from blocks reserved `block_size` at a time."""
+
+    def __init__(self, table: str, reserve: ReserveIds, block_size: int) -> None:
+        self._table = table
+        self._reserve = reserve
+        self._block_size = block_size
+        self._ids: deque[int] = deque()
+        self._lock = asyncio.Lock()
+
+    async def next(self) -> int:
+        if not self._ids:
+            async with self._lock:
+                if not self._ids:
+                    self._ids.extend(await self._reserve(self._table, self._block_size))
+        return self._ids.popleft()
+
+
+def _sequence_reserver(sessions: async_sessionmaker[AsyncSession]) -> ReserveIds:
+    async def reserve(table: str, count: int) -> list[int]:
+        # nextval is not transactional, so the values are ours even though nothing commits
+        async with sessions() as db:
+            rows = await db.execute(
+                text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+                {"table": table, "count": count},
+            )
+            return [row[0] for row in rows]
+
+    return reserve
+
+
+class LagExceeded(Exception):
+    """The message could not be committed within chat_write_behind_max_lag_ms."""
+
+
+class _DeadlinePassed(Exception):
+    pass
+
+
+@dataclass(eq=False)
+class PendingMessage:
+    conversation: Conversation
+    message: Message
+    notification: Notification | None
+    # Event loop time after which the message must not be committed
+    deadline: float
+    saved: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+class MessageWriter:
+    def __init__(
+        self,
+        sessions: async_sessionmaker[AsyncSession],
+        *,
+        batch_size: int | None = None,
+        max_delay_seconds: float | None = None,
+        max_pending: int | None = None,
+        max_lag_seconds: float | None = None,
+        id_block_size: int | None = None,
+        reserve_ids: ReserveIds | None = None,
+    ) -> None:
+        self._sessions = sessions
+        self.batch_size = batch_size or settings.chat_write_behind_batch_size
+        self.max_delay_seconds = (
+            max_delay_seconds if max_delay_seconds is not None else settings.chat_write_behind_max_delay_ms / 1000
+        )
+        self.max_lag_seconds = (
+            max_lag_seconds if max_lag_seconds is not None else settings.chat_write_behind_max_lag_ms / 1000
+        )
+        reserve = reserve_ids or _sequence_reserver(sessions)
+        block_size = id_block_size or settings.chat_id_block_size
+        self._message_ids = IdBlock("messages", reserve, block_size)
+        self._notification_ids = IdBlock("notifications", reserve, block_size)
+        self._queue: asyncio.Queue[PendingMessage] = asyncio.Queue(
+            maxsize=max_pending or settings.chat_write_behind_max_pending
+        )
+        self._task: asyncio.Task | None = None
+        self._closed = False
+        self._last: PendingMessage | None = None
+        self.batches_written = 0
+        self.messages_written = 0
+        self.messages_failed = 0
+
+    @property
+    def settle_seconds(self) -> float:
+        """After this long, every message submitted (on any worker) is stored or failed."""
+        return self.max_lag_seconds + _COMMIT_GRACE_SECONDS
+
+    async def submit(
+        self,
+        conversation: Conversation,
+        *,
+        sender_id: int,
+        content: str,
+        notification: dict | None = None,
+    ) -> PendingMessage:
+        """
+        Assign ids and timestamps and queue the message (and an optional
+        notification row, given as Notification column values) for the next
+        batch. Waits only when max_pending messages are already unsaved.
+        """
+        if self._closed:
+            raise RuntimeError("MessageWriter is closed")
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        now = datetime.now(timezone.utc)
+        message = Message(
+            id=await self._message_ids.next(),
+            conversation_id=conversation.id,
+            sender_id=sender_id,
+            content=content,
+            created_at=now,
+        )
+        row = None
+        if notification is not None:
+            row = Notification(id=await self._notification_ids.next(), is_read=False, created_at=now, **notification)
+        pending = PendingMessage(
+            conversation=conversation,
+            message=message,
+            notification=row,
+            deadline=asyncio.get_running_loop().time() + self.max_lag_seconds,
+        )
+        await self._queue.put(pending)
+        self._last = pending
+        return pending
+
+    async def barrier(self) -> None:
+        """Wait until every message submitted so far is saved or has failed."""
+        # Batches are written one at a time in queue order, so the last one is enough
+        last = self._last
+        if last is not None and not last.saved.done():
+            await asyncio.wait([last.saved])
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: list[PendingMessage]) -> None:
+        attempt = 0
+        while True:
+            batch = self._expire(batch)
+            if not batch:
+                return
+            try:
+                await self._write(batch)
+            except _DeadlinePassed:
+                continue
+            except IntegrityError as e:
+                if len(batch) == 1:
+                    self._fail(batch, e)
+                    return
+                logger.warning("Chat batch of %d rejected; retrying its messages one by one", len(batch))
+                for pending in batch:
+                    await self._flush([pending])
+                return
+            except Exception as e:
+                attempt += 1
+                if attempt == _MAX_ATTEMPTS:
+                    logger.exception("Dropping chat batch of %d after %d attempts", len(batch), _MAX_ATTEMPTS)
+                    self._fail(batch, e)
+                    return
+                logger.warning("Chat batch write failed (attempt %d); retrying", attempt, exc_info=True)
+                await asyncio.sleep(_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            else:
+                self.batches_written += 1
+                self.messages_written += len(batch)
+                for pending in batch:
+                    if not pending.saved.done():
+                        pending.saved.set_result(None)
+                return
+
+    def _expire(self, batch: list[PendingMessage]) -> list[PendingMessage]:
+        """Fail the messages past their deadline; return the rest."""
+        now = asyncio.get_running_loop().time()
+        expired = [pending for pending in batch if now > pending.deadline]
+        if not expired:
+            return batch
+        logger.warning("Failing %d chat messages not saved within the max lag", len(expired))
+        self._fail(expired, LagExceeded(f"not saved within {self.max_lag_seconds:.3f}s"))
+        return [pending for pending in batch if now <= pending.deadline]
+
+    async def _write(self, batch: list[PendingMessage]) -> None:
+        by_conversation: dict[int, tuple[Conversation, list[Message]]] = {}
+        for pending in batch:
+            by_conversation.setdefault(pending.conversation.id, (pending.conversation, []))[1].append(pending.message)
+        async with self._sessions() as db:
+            await db.execute(insert(Message).values([_columns(Message, p.message) for p in batch]))
+            notifications = [_columns(Notification, p.notification) for p in batch if p.notification is not None]
+            if notifications:
+                await db.execute(insert(Notification).values(notifications))
+            # Lock conversations in id order so concurrent batches can't deadlock
+            for conversation_id in sorted(by_conversation):
+                conversation, messages = by_conversation[conversation_id]
+                await db.execute(record_messages_stmt(conversation, messages))
+            if asyncio.get_running_loop().time() > min(pending.deadline for pending in batch):
+                # Too late to commit: roll back, and _flush fails the expired ones
+                raise _DeadlinePassed
+            await db.commit()
+
+    def _fail(self, batch: list[PendingMessage], error: Exception) -> None:
+        for pending in batch:
+            if not pending.saved.done():
+                pending.saved.set_exception(error)
+                self.messages_failed += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "pending": self._queue.qsize(),
+            "batches_written": self.batches_written,
+            "messages_written": self.messages_written,
+            "messages_failed": self.messages_failed,
+        }
+
+    async def close(self) -> None:
+        """Stop accepting messages and write everything still pending."""
+        self._closed = True
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+def _columns(model, row) -> dict:
+    return {column.key: getattr(row, column.key) for column in model.__table__.columns}
+
+
+_writers: dict[async_sessionmaker[AsyncSession], MessageWriter] = {}
+
+
+def get_message_writer(sessions: async_sessionmaker[AsyncSession]) -> MessageWriter:
+    """
+    This process's writer for `sessions` (the get_async_sessionmaker
+    dependency), created on first use.
+    """
+    writer = _writers.get(sessions)
+    if writer is None:
+        writer = _writers[sessions] = MessageWriter(sessions)
+    return writer
+
+
+async def close_message_writers() -> None:
+    writers = list(_writers.values())
+    _writers.clear()
+    for writer in writers:
+        await writer.close()
@@ -1,6 +1,6 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.crud.notifications import create_notification
+from app.crud.aio.notifications import create_notification
 from app.models import Notification
 from app.services.notification_ws import notification_ws_manager
 
@@ -23,8 +23,8 @@ async def emit_notification(user_id: int, notification: Notification) -> None:
     )
 
 
-def build_and_store_notification(
-    db: Session,
+async def build_and_store_notification(
+    db: AsyncSession,
     *,
     user_id: int,
     event_type: str,
@@ -32,7 +32,7 @@ def build_and_store_notification(
     body: str,
     payload_json: dict | None = None,
 ) -> Notification:
-    row = create_notification(
+    row = await create_notification(
         db,
         user_id=user_id,
         event_type=event_type,
@@ -40,6 +40,6 @@ def build_and_store_notification(
         body=body,
         payload_json=payload_json,
     )
-    db.commit()
-    db.refresh(row)
+    await db.commit()
+    await db.refresh(row)
     return row
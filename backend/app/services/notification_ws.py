@@ -1,41 +1,61 @@
+from functools import partial
+from typing import Awaitable, Callable
+
 from fastapi import WebSocket
 
+from app.services.broker import Broker, get_broker, notification_channel
+from app.services.socket_sender import SocketSender
+
 
 class NotificationConnectionManager:
     """
     Dedicated WebSocket manager for notifications.
     Kept separate from chat sockets so notification realtime logic remains isolated.
+
+    send_to_user publishes through the broker; each process delivers to the
+    sockets it holds for that user (see app.services.broker) by enqueueing on
+    their SocketSenders.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, broker: Broker | None = None) -> None:
         self.active_connections: dict[int, list[WebSocket]] = {}
+        self.senders: dict[WebSocket, SocketSender] = {}
+        self._handlers: dict[int, Callable[[dict], Awaitable[None]]] = {}
+        self._broker = broker
+
+    @property
+    def broker(self) -> Broker:
+        return self._broker or get_broker()
 
     async def connect(self, websocket: WebSocket, user_id: int) -> None:
         await websocket.accept()
+        self.senders[websocket] = SocketSender(websocket, partial(self.disconnect, websocket, user_id))
+        first = user_id not in self.active_connections
         self.active_connections.setdefault(user_id, []).append(websocket)
-
-    def disconnect(self, websocket: WebSocket, user_id: int) -> None:
+        if first:
+            handler = self._handlers[user_id] = partial(self._deliver, user_id)
+            await self.broker.subscribe(notification_channel(user_id), handler)
+
+    async def disconnect(self, websocket: WebSocket, user_id: int) -> None:
+        sender = self.senders.pop(websocket, None)
+        if sender is not None:
+            sender.stop()
         if user_id not in self.active_connections:
             return
         if websocket in self.active_connections[user_id]:
             self.active_connections[user_id].remove(websocket)
         if not self.active_connections[user_id]:
             del self.active_connections[user_id]
+            await self.broker.unsubscribe(notification_channel(user_id), self._handlers.pop(user_id))
 
     async def send_to_user(self, user_id: int, payload: dict) -> None:
-        connections = list(self.active_connections.get(user_id, []))
-        if not connections:
-            return
-
-        stale: list[WebSocket] = []
-        for connection in connections:
-            try:
-                await connection.send_json(payload)
-            except Exception:
-                stale.append(connection)
+        await self.broker.publish(notification_channel(user_id), payload)
 
-        for connection in stale:
-            self.disconnect(connection, user_id)
+    async def _deliver(self, user_id: int, payload: dict) -> None:
+        for connection in list(self.active_connections.get(user_id, [])):
+            sender = self.senders.get(connection)
+            if sender is not None:
+                sender.send(payload)
 
 
 notification_ws_manager = NotificationConnectionManager()
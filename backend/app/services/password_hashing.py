@@ -0,0 +1,176 @@
+"""bcrypt hashing and verification off the request path.
+
+Each bcrypt call is ~250ms of CPU. Run on the request threadpool, a login
+storm takes every worker thread and fights over the GIL. PasswordHasher sends
+the work to a small dedicated ProcessPoolExecutor, and handlers await it. At
+most `max_pending` calls may be queued or running. Past that, calls fail fast
+with HasherBusy (the API answers 503) rather than queueing for seconds. A call
+that times out keeps its slot until the pool finishes it.
+
+Worker processes are spawned, not forked, so they don't inherit the server's
+event loop or DB pool threads.
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, TypeVar
+
+from passlib.context import CryptContext
+
+from app.config import settings
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+T = TypeVar("T")
+
+OPERATIONS: tuple[str, ...] = ("hash", "verify")
+
+
+class HasherBusy(Exception):
+    """The hashing pool is saturated or a call exceeded its timeout."""
+
+
+def _timed(fn: Callable[..., T], *args: str) -> tuple[T, float]:
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000.0
+
+
+def _hash_in_worker(password: str) -> tuple[str, float]:
+    return _timed(pwd_context.hash, password)
+
+
+def _verify_in_worker(plain_password: str, hashed_password: str) -> tuple[bool, float]:
+    return _timed(pwd_context.verify, plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Async bcrypt API over a bounded process pool. `workers=0` runs in the
+    event loop's default threadpool instead (same limits and metrics).
+    """
+
+    def __init__(self, *, workers: int, max_pending: int, timeout_seconds: float) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout_seconds = timeout_seconds
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {
+            op: {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "run_ms": 0.0} for op in OPERATIONS
+        }
+        self._rejected = 0
+        self._timeouts = 0
+        self._peak_pending = 0
+
+    def _get_executor(self) -> Executor | None:
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HasherBusy("password hashing queue is full")
+            self._pending += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+
+    def _release(self, future: asyncio.Future) -> None:
+        # Runs when the pool call finishes, even after the caller timed out or
+        # was cancelled: until then the worker is still busy with bcrypt.
+        if not future.cancelled():
+            future.exception()  # retrieved so an abandoned failure isn't logged as unhandled
+        with self._lock:
+            self._pending -= 1
+
+    def _record(self, op: str, total_ms: float, run_ms: float) -> None:
+        with self._lock:
+            stats = self._stats[op]
+            stats["calls"] += 1
+            stats["total_ms"] += total_ms
+            stats["max_ms"] = max(stats["max_ms"], total_ms)
+            stats["run_ms"] += run_ms
+
+    async def _run(self, op: str, fn: Callable[..., tuple[T, float]], *args: str) -> T:
+        self._acquire()
+        started = time.perf_counter()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._release)
+        try:
+            # shield: timing out stops the wait, not the (uncancellable) running call
+            result, run_ms = await asyncio.wait_for(asyncio.shield(future), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            raise HasherBusy(f"password {op} timed out") from None
+        self._record(op, (time.perf_counter() - started) * 1000.0, run_ms)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash_in_worker, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", _verify_in_worker, plain_password, hashed_password)
+
+    def snapshot(self) -> dict:
+        """Queue depth, rejections and per-operation latency (total = queue wait + bcrypt run)."""
+        with self._lock:
+            operations = {}
+            for op, stats in self._stats.items():
+                calls = stats["calls"]
+                operations[op] = {
+                    "calls": calls,
+                    "avg_ms": round(stats["total_ms"] / calls, 3) if calls else 0.0,
+                    "avg_run_ms": round(stats["run_ms"] / calls, 3) if calls else 0.0,
+                    "avg_queue_ms": round((stats["total_ms"] - stats["run_ms"]) / calls, 3) if calls else 0.0,
+                    "max_ms": round(stats["max_ms"], 3),
+                }
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "peak_pending": self._peak_pending,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "operations": operations,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_hasher: PasswordHasher | None = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher() -> PasswordHasher:
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher(
+                    workers=settings.password_hash_workers,
+                    max_pending=settings.password_hash_max_pending,
+                    timeout_seconds=settings.password_hash_timeout_seconds,
+                )
+    return _hasher
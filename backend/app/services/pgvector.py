@@ -0,0 +1,140 @@
+"""In-database tutor retrieval over the optional pgvector column.
+
+When the b8d0f2a4c6e8 migration found the pgvector extension, every
+user_embeddings row carries an L2-normalized `embedding_vec` with a partial
+HNSW index per tutor field. A query asks each field's index for its nearest
+tutors, then rescores the union on the weighted three-field cosine inside
+Postgres, so only the top-k (tutor id, score) pairs reach the web worker.
+Without the column the caller falls back to the in-process index.
+
+A tutor with no vector for some field is scored as if that field were zero
+here, while the in-process index embeds the profile text instead. The caller
+rescores those tutors (incomplete_tutor_ids) so both backends rank alike.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Mapping, Sequence
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Per-field HNSW candidates fetched for each final result.
+_CANDIDATES_PER_RESULT = 4
+_MIN_CANDIDATES = 100
+_MAX_EF_SEARCH = 1000
+
+_available: bool | None = None
+_available_lock = threading.Lock()
+
+# Query vectors are bound parameters (not CTE columns) so the planner can use
+# the partial HNSW indexes for the per-field ORDER BY ... LIMIT scans.
+_KNN_SQL = text(
+    """
+    WITH candidates AS (
+      (SELECT user_id FROM user_embeddings
+       WHERE entity_type = 'tutor' AND field_name = 'bio' AND model_name = :model_name
+       ORDER BY embedding_vec <#> CAST(:bio AS vector) LIMIT :candidate_k)
+      UNION
+      (SELECT user_id FROM user_embeddings
+       WHERE entity_type = 'tutor' AND field_name = 'help' AND model_name = :model_name
+       ORDER BY embedding_vec <#> CAST(:help AS vector) LIMIT :candidate_k)
+      UNION
+      (SELECT user_id FROM user_embeddings
+       WHERE entity_type = 'tutor' AND field_name = 'locations' AND model_name = :model_name
+       ORDER BY embedding_vec <#> CAST(:locations AS vector) LIMIT :candidate_k)
+    )
+    SELECT e.user_id,
+           SUM(
+             CASE e.field_name
+               WHEN 'bio' THEN :bio_weight * -(e.embedding_vec <#> CAST(:bio AS vector))
+               WHEN 'help' THEN :help_weight * -(e.embedding_vec <#> CAST(:help AS vector))
+               ELSE :locations_weight * -(e.embedding_vec <#> CAST(:locations AS vector))
+             END
+           ) / :weight_sum AS score
+    FROM user_embeddings e
+    JOIN candidates c ON c.user_id = e.user_id
+    JOIN tutors t ON t.user_id = e.user_id
+    WHERE e.entity_type = 'tutor' AND e.model_name = :model_name AND e.embedding_vec IS NOT NULL
+    GROUP BY e.user_id
+    ORDER BY score DESC, e.user_id
+    LIMIT :top_k
+    """
+)
+
+_INCOMPLETE_SQL = text(
+    """
+    SELECT t.user_id
+    FROM tutors t
+    LEFT JOIN user_embeddings e
+      ON e.user_id = t.user_id AND e.entity_type = 'tutor' AND e.model_name = :model_name
+     AND e.field_name IN ('bio', 'help', 'locations') AND e.embedding_vec IS NOT NULL
+    GROUP BY t.user_id
+    HAVING COUNT(e.id) < 3
+    """
+)
+
+
+def pgvector_available(db: Session) -> bool:
+    """Whether user_embeddings has the embedding_vec column (checked once per process)."""
+    global _available
+    if _available is None:
+        with _available_lock:
+            if _available is None:
+                _available = bool(
+                    db.execute(
+                        text(
+                            "SELECT 1 FROM information_schema.columns "
+                            "WHERE table_name = 'user_embeddings' AND column_name = 'embedding_vec'"
+                        )
+                    ).scalar()
+                )
+    return _available
+
+
+def vector_literal(values: Sequence[float]) -> str:
+    """pgvector text form of an L2-normalized copy of `values` (zeros stay zeros)."""
+    vector = np.asarray(values, dtype=np.float64)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector = vector / norm
+    return "[" + ",".join(repr(float(x)) for x in vector) + "]"
+
+
+def pgvector_knn(
+    db: Session,
+    *,
+    model_name: str,
+    vectors: Mapping[str, Sequence[float]],
+    weights: Mapping[str, float],
+    top_k: int,
+) -> list[tuple[int, float]]:
+    """Top-k (tutor user id, weighted cosine) for the student's 128-dim field `vectors`."""
+    weight_sum = sum(weights.values()) or 1.0
+    candidate_k = max(top_k * _CANDIDATES_PER_RESULT, _MIN_CANDIDATES)
+    db.execute(
+        text("SELECT set_config('hnsw.ef_search', :ef_search, true)"),
+        {"ef_search": str(min(candidate_k, _MAX_EF_SEARCH))},
+    )
+    rows = db.execute(
+        _KNN_SQL,
+        {
+            "bio": vector_literal(vectors["bio"]),
+            "help": vector_literal(vectors["help"]),
+            "locations": vector_literal(vectors["locations"]),
+            "bio_weight": weights["bio"],
+            "help_weight": weights["help"],
+            "locations_weight": weights["locations"],
+            "weight_sum": weight_sum,
+            "model_name": model_name,
+            "candidate_k": candidate_k,
+            "top_k": top_k,
+        },
+    )
+    return [(int(user_id), float(score)) for user_id, score in rows]
+
+
+def incomplete_tutor_ids(db: Session, *, model_name: str) -> list[int]:
+    """Tutors missing an embedding_vec for at least one field (usually none after a backfill)."""
+    return [int(user_id) for (user_id,) in db.execute(_INCOMPLETE_SQL, {"model_name": model_name})]
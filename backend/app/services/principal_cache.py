@@ -0,0 +1,95 @@
+"""Cache of verified bearer tokens -> the authenticated user's Principal.
+
+Authenticating a request otherwise costs a jwt.decode plus a db.get(User).
+An entry holds the small Principal that most handlers need. It is served
+until the token's own expiry or the TTL, whichever is sooner. Account writes
+(status, profile, deletion) drop all of that user's entries. The TTL bounds
+staleness from writes made on other workers.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.models import User
+
+_CACHE_TTL_SECONDS = 60.0
+_CACHE_MAX_TOKENS = 50000
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The authenticated user without an ORM session: enough for most handlers."""
+
+    id: int
+    status: int
+    is_tutor: bool
+    is_student: bool
+    first_name: str
+
+    @classmethod
+    def from_user(cls, user: User) -> Principal:
+        return cls(
+            id=user.id,
+            status=user.status,
+            is_tutor=user.is_tutor,
+            is_student=user.is_student,
+            first_name=user.first_name,
+        )
+
+
+# token -> (deadline on the monotonic clock, principal)
+_cache: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+_tokens_by_user: dict[int, set[str]] = {}
+_lock = threading.Lock()
+
+
+def _drop(token: str) -> None:
+    _, principal = _cache.pop(token)
+    tokens = _tokens_by_user.get(principal.id)
+    if tokens is not None:
+        tokens.discard(token)
+        if not tokens:
+            del _tokens_by_user[principal.id]
+
+
+def store_principal(token: str, principal: Principal, *, expires_at: float) -> None:
+    """Cache `principal` for `token`, whose JWT `exp` is the Unix time `expires_at`."""
+    ttl = min(_CACHE_TTL_SECONDS, expires_at - time.time())
+    if ttl <= 0:
+        return
+    with _lock:
+        if token in _cache:
+            _drop(token)
+        _cache[token] = (time.monotonic() + ttl, principal)
+        _tokens_by_user.setdefault(principal.id, set()).add(token)
+        while len(_cache) > _CACHE_MAX_TOKENS:
+            _drop(next(iter(_cache)))
+
+
+def get_cached_principal(token: str) -> Principal | None:
+    with _lock:
+        entry = _cache.get(token)
+        if entry is None:
+            return None
+        deadline, principal = entry
+        if time.monotonic() >= deadline:
+            _drop(token)
+            return None
+        _cache.move_to_end(token)
+        return principal
+
+
+def invalidate_principal(user_id: int) -> None:
+    """Forget every cached token of `user_id` after a write to their account."""
+    with _lock:
+        for token in list(_tokens_by_user.get(user_id, ())):
+            _drop(token)
+
+
+def clear_principal_cache() -> None:
+    with _lock:
+        _cache.clear()
+        _tokens_by_user.clear()
@@ -0,0 +1,151 @@
+"""Bulk re-embedding of every student and tutor profile for one embedding model.
+
+Used to roll out a new EMBED_MODEL_NAME: profiles are streamed in user_id
+order through a server-side cursor (yield_per), embedded a batch at a time and
+written with one multi-row upsert per batch. After every committed batch the
+last user_id per entity type is saved to a checkpoint file so an interrupted
+run can resume where it stopped.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.crud.embeddings import EmbeddingRow, bulk_upsert_user_embeddings
+from app.models import StudentProfile, TutorProfile
+from app.services.embedding_index import FIELDS
+from app.services.embeddings import get_embedder, join_list
+
+logger = logging.getLogger(__name__)
+
+ENTITY_TYPES: tuple[str, ...] = ("student", "tutor")
+
+
+@dataclass
+class ReembedReport:
+    model_name: str
+    profiles: int = 0
+    vectors: int = 0
+    batches: int = 0
+    elapsed_seconds: float = 0.0
+    profiles_by_entity: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def profiles_per_second(self) -> float:
+        return self.profiles / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    @property
+    def vectors_per_second(self) -> float:
+        return self.vectors / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+
+def load_checkpoint(path: Path, model_name: str) -> dict[str, int]:
+    """Return {entity_type: last completed user_id} from a previous run, if any."""
+    if not path.exists():
+        return {}
+    data = json.loads(path.read_text())
+    if data.get("model_name") != model_name:
+        raise ValueError(
+            f"Checkpoint {path} is for model {data.get('model_name')!r}, not {model_name!r}"
+        )
+    return {entity: int(user_id) for entity, user_id in data.get("last_user_id", {}).items()}
+
+
+def save_checkpoint(path: Path, model_name: str, last_user_id: dict[str, int]) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps({"model_name": model_name, "last_user_id": last_user_id}))
+    tmp.replace(path)
+
+
+def _profile_stream(read_db: Session, entity_type: str, after_user_id: int, batch_size: int):
+    model, help_column = (
+        (StudentProfile, StudentProfile.help_needed)
+        if entity_type == "student"
+        else (TutorProfile, TutorProfile.help_provided)
+    )
+    result = read_db.execute(
+        select(model.user_id, model.bio, help_column, model.preferred_locations)
+        .where(model.user_id > after_user_id)
+        .order_by(model.user_id)
+        .execution_options(yield_per=batch_size)
+    )
+    return result.partitions()
+
+
+def reembed_profiles(
+    session_factory: sessionmaker,
+    *,
+    model_name: str,
+    batch_size: int = 500,
+    entity_types: Sequence[str] = ENTITY_TYPES,
+    checkpoint_path: Path | None = None,
+    resume: bool = False,
+) -> ReembedReport:
+    """
+    Re-embed all profiles of `entity_types` into `model_name`.
+
+    Reads go through a dedicated session so the server-side cursor survives the
+    per-batch commits made on the write session.
+    """
+    embed = get_embedder(model_name)
+    last_user_id: dict[str, int] = {}
+    if resume and checkpoint_path is not None:
+        last_user_id = load_checkpoint(checkpoint_path, model_name)
+        if last_user_id:
+            logger.info("Resuming %s from %s", model_name, last_user_id)
+
+    report = ReembedReport(model_name=model_name)
+    started = time.perf_counter()
+
+    with session_factory() as read_db, session_factory() as write_db:
+        for entity_type in entity_types:
+            after = last_user_id.get(entity_type, 0)
+            done = 0
+            for batch in _profile_stream(read_db, entity_type, after, batch_size):
+                texts: list[str] = []
+                for _, bio, help_items, locations in batch:
+                    texts.extend([bio or "", join_list(help_items), join_list(locations)])
+                vectors = embed(texts)
+
+                rows: list[EmbeddingRow] = []
+                for i, (user_id, *_rest) in enumerate(batch):
+                    for j, field_name in enumerate(FIELDS):
+                        rows.append(
+                            {
+                                "user_id": user_id,
+                                "entity_type": entity_type,
+                                "field_name": field_name,
+                                "embedding": vectors[i * len(FIELDS) + j],
+                            }
+                        )
+                bulk_upsert_user_embeddings(write_db, rows, model_name=model_name)
+                write_db.commit()
+
+                last_user_id[entity_type] = batch[-1][0]
+                if checkpoint_path is not None:
+                    save_checkpoint(checkpoint_path, model_name, last_user_id)
+
+                done += len(batch)
+                report.profiles += len(batch)
+                report.vectors += len(rows)
+                report.batches += 1
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    "%s %s: %d profiles (last user_id=%d), %.0f profiles/s",
+                    model_name,
+                    entity_type,
+                    done,
+                    last_user_id[entity_type],
+                    report.profiles / elapsed if elapsed > 0 else 0.0,
+                )
+            report.profiles_by_entity[entity_type] = done
+
+    report.elapsed_seconds = time.perf_counter() - started
+    return report
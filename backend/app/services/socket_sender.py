@@ -0,0 +1,132 @@
+"""Per-connection outgoing queue for WebSocket fan-out.
+
+Broadcasting used to await send_json on each socket in turn, so one slow or
+dead client stalled every other recipient and could raise into the sender's
+loop. Each connection now gets a SocketSender: a bounded asyncio queue plus a
+writer task. Delivery only enqueues. The writer sends with a per-send timeout.
+A socket that falls behind (queue full), times out, or errors is closed and
+handed to the manager's cleanup callback.
+
+While a reconnecting client catches up on missed messages, the sender can
+hold live payloads (hold / release) and queue the bulk replay with
+backpressure (send_wait).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from fastapi import WebSocket, status
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Close tasks outlive the call that scheduled them; keep them referenced.
+_closing: set[asyncio.Task] = set()
+
+
+class SocketSender:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_close: Callable[[], Awaitable[None]],
+        *,
+        max_queue: int | None = None,
+        send_timeout: float | None = None,
+    ) -> None:
+        self.websocket = websocket
+        self.dropped = False
+        self._on_close = on_close
+        self._send_timeout = send_timeout if send_timeout is not None else settings.ws_send_timeout_seconds
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(
+            maxsize=max_queue if max_queue is not None else settings.ws_send_queue_size
+        )
+        self._held: list[dict] | None = None
+        self._writer = asyncio.create_task(self._write())
+
+    def send(self, payload: dict) -> bool:
+        """
+        Queue `payload` without waiting. Returns False if the socket is already
+        dropped, or if its queue is full, in which case it is dropped now.
+        """
+        if self.dropped:
+            return False
+        if self._held is not None:
+            if len(self._held) >= self._queue.maxsize:
+                self._drop(status.WS_1013_TRY_AGAIN_LATER, "Client too slow")
+                return False
+            self._held.append(payload)
+            return True
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self._drop(status.WS_1013_TRY_AGAIN_LATER, "Client too slow")
+            return False
+        return True
+
+    async def send_wait(self, payload: dict) -> bool:
+        """
+        Queue `payload`, waiting up to the send timeout for room. For bulk
+        sends such as a catch-up replay; bypasses hold().
+        """
+        if self.dropped:
+            return False
+        try:
+            await asyncio.wait_for(self._queue.put(payload), self._send_timeout)
+        except asyncio.TimeoutError:
+            self._drop(status.WS_1013_TRY_AGAIN_LATER, "Client too slow")
+            return False
+        return True
+
+    def hold(self) -> None:
+        """Buffer send() payloads instead of queueing them, until release()."""
+        if self._held is None:
+            self._held = []
+
+    async def release(self, keep: Callable[[dict], bool] | None = None) -> None:
+        """Queue the held payloads that pass `keep`, in order, and stop holding."""
+        # Keep holding while draining: send_wait can yield, and a live send()
+        # must land behind the payloads still waiting here, not ahead of them.
+        while self._held:
+            payload = self._held.pop(0)
+            if (keep is None or keep(payload)) and not await self.send_wait(payload):
+                return
+        self._held = None
+
+    def stop(self) -> None:
+        """Stop writing (the manager is forgetting this socket)."""
+        self.dropped = True
+        self._writer.cancel()
+
+    async def _write(self) -> None:
+        while True:
+            payload = await self._queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_json(payload), self._send_timeout)
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                self._drop(status.WS_1013_TRY_AGAIN_LATER, "Send timed out")
+                return
+            except Exception:
+                # Already closed or broken: just clean up
+                self._drop(status.WS_1011_INTERNAL_ERROR, "Send failed")
+                return
+
+    def _drop(self, code: int, reason: str) -> None:
+        if self.dropped:
+            return
+        self.dropped = True
+        logger.info("Dropping WebSocket (%s)", reason)
+        task = asyncio.create_task(self._close(code, reason))
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
+
+    async def _close(self, code: int, reason: str) -> None:
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code, reason=reason), self._send_timeout)
+        except Exception:
+            pass
+        await self._on_close()
@@ -0,0 +1,81 @@
+"""Report IVF recall and latency against the exact tutor scan.
+
+Uses real student profiles as queries. Run from backend/:
+
+    python dev/ann_recall.py --samples 200 --top-k 50 --nprobe 1 4 8 16
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Run from backend/ so app.database and app.models resolve
+backend = Path(__file__).resolve().parents[1]
+if str(backend) not in sys.path:
+    sys.path.insert(0, str(backend))
+
+from app.crud.embeddings import EMBED_MODEL_NAME  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.models import StudentProfile  # noqa: E402
+from app.services.ann import IVFFlatIndex, recall_at_k  # noqa: E402
+from app.services.embeddings import WEIGHTS, embed_text, get_fresh_tutor_index, join_list  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--model-name", default=EMBED_MODEL_NAME)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        index = get_fresh_tutor_index(db, args.model_name)
+        students = db.query(StudentProfile).limit(args.samples).all()
+        queries = [
+            index.build_query(
+                {
+                    "bio": embed_text(s.bio or ""),
+                    "help": embed_text(join_list(s.help_needed)),
+                    "locations": embed_text(join_list(s.preferred_locations)),
+                },
+                WEIGHTS,
+            )
+            for s in students
+        ]
+
+    if not queries or len(index) == 0:
+        print("Need at least one student and one tutor to measure recall.")
+        return
+
+    started = time.perf_counter()
+    ivf = IVFFlatIndex(nlist=args.nlist)
+    ivf.sync(index)
+    print(f"tutors={len(index)} queries={len(queries)} train={time.perf_counter() - started:.2f}s")
+
+    exact_latency: list[float] = []
+    exact = []
+    for query in queries:
+        started = time.perf_counter()
+        exact.append(index.search(query, args.top_k))
+        exact_latency.append(time.perf_counter() - started)
+    print(f"exact      p50={statistics.median(exact_latency) * 1000:.2f}ms")
+
+    for nprobe in args.nprobe:
+        latency: list[float] = []
+        approximate = []
+        for query in queries:
+            started = time.perf_counter()
+            approximate.append(ivf.search(query, args.top_k, nprobe=nprobe))
+            latency.append(time.perf_counter() - started)
+        recall = recall_at_k(exact, approximate)
+        print(
+            f"nprobe={nprobe:<3} p50={statistics.median(latency) * 1000:.2f}ms "
+            f"recall@{args.top_k}={recall:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
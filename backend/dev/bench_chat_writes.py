@@ -0,0 +1,120 @@
+"""Benchmark chat message writes: one transaction per message vs write-behind.
+
+Seeds throwaway conversations, then has --senders concurrent senders post
+--messages each, spread over the conversations, the way the chat sockets do:
+first with post_chat_message (a transaction per message), then with
+submit_chat_message and the MessageWriter (batched inserts), waiting until
+every message is saved. Prints messages/second for both. The seeded rows are
+deleted afterwards. Run from backend/:
+
+    python dev/bench_chat_writes.py --conversations 50 --senders 200 --messages 50
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from uuid import uuid4
+
+# Run from backend/ so app.database and app.models resolve
+backend = Path(__file__).resolve().parents[1]
+if str(backend) not in sys.path:
+    sys.path.insert(0, str(backend))
+
+from sqlalchemy import delete, insert  # noqa: E402
+
+from app.database import AsyncSessionLocal, SessionLocal, async_engine  # noqa: E402
+from app.models import Conversation, User  # noqa: E402
+from app.services.broker import InProcessBroker  # noqa: E402
+from app.services.chat import post_chat_message, submit_chat_message  # noqa: E402
+from app.services.message_writer import close_message_writers, get_message_writer  # noqa: E402
+from app.services.principal_cache import Principal  # noqa: E402
+
+
+def seed(count: int) -> tuple[list[int], list[Conversation]]:
+    tag = uuid4().hex[:8]
+    rows = [
+        {"email": f"bench-{tag}-{i}@example.com", "first_name": "Bench", "last_name": str(i), "hashed_password": "x"}
+        for i in range(2 * count)
+    ]
+    with SessionLocal() as db:
+        user_ids = list(db.execute(insert(User).returning(User.id), rows).scalars())
+        conversations = list(
+            db.execute(
+                insert(Conversation).returning(Conversation),
+                [{"user1_id": user_ids[2 * i], "user2_id": user_ids[2 * i + 1]} for i in range(count)],
+            ).scalars()
+        )
+        db.commit()
+        db.expunge_all()
+    return user_ids, conversations
+
+
+def principal(user_id: int) -> Principal:
+    return Principal(id=user_id, status=0, is_tutor=False, is_student=True, first_name="Bench")
+
+
+async def per_message(conversations: list[Conversation], senders: int, messages: int) -> float:
+    broker = InProcessBroker()
+
+    async def send(n: int) -> None:
+        conv = conversations[n % len(conversations)]
+        sender = principal(conv.user1_id if n % 2 else conv.user2_id)
+        for i in range(messages):
+            async with AsyncSessionLocal() as db:
+                await post_chat_message(db, conversation=conv, sender=sender, content=f"message {i}", broker=broker)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(n) for n in range(senders)))
+    return senders * messages / (time.perf_counter() - started)
+
+
+async def write_behind(conversations: list[Conversation], senders: int, messages: int) -> tuple[float, dict]:
+    broker = InProcessBroker()
+
+    async def send(n: int) -> list[asyncio.Future]:
+        conv = conversations[n % len(conversations)]
+        sender = principal(conv.user1_id if n % 2 else conv.user2_id)
+        saved = []
+        for i in range(messages):
+            pending = await submit_chat_message(
+                conversation=conv, sender=sender, content=f"message {i}", sessions=AsyncSessionLocal, broker=broker
+            )
+            saved.append(pending.saved)
+        return saved
+
+    started = time.perf_counter()
+    futures = [f for saved in await asyncio.gather(*(send(n) for n in range(senders))) for f in saved]
+    await asyncio.gather(*futures)
+    elapsed = time.perf_counter() - started
+    snapshot = get_message_writer(AsyncSessionLocal).snapshot()
+    await close_message_writers()
+    return senders * messages / elapsed, snapshot
+
+
+async def run(args: argparse.Namespace) -> None:
+    user_ids, conversations = seed(args.conversations)
+    try:
+        synchronous = await per_message(conversations, args.senders, args.messages)
+        batched, snapshot = await write_behind(conversations, args.senders, args.messages)
+    finally:
+        await async_engine.dispose()
+        with SessionLocal() as db:
+            db.execute(delete(User).where(User.id.in_(user_ids)))
+            db.commit()
+    print(f"{'mode':>14} {'msgs/s':>9}")
+    print(f"{'per-message':>14} {synchronous:>9.0f}")
+    print(f"{'write-behind':>14} {batched:>9.0f}   ({snapshot['batches_written']} batches, {batched / synchronous:.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--senders", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
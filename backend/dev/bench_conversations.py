@@ -0,0 +1,121 @@
+"""Benchmark the conversation list as a user's conversation count grows.
+
+For each count it seeds a throwaway user with that many conversations (a few
+messages each), then times the single-statement list_conversations_for_user
+(full list and a first page) against the old per-conversation lookups (2N+1
+queries). The seeded rows are deleted afterwards. Run from backend/:
+
+    python dev/bench_conversations.py --counts 10 100 500 1000 --page-size 50
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from uuid import uuid4
+
+# Run from backend/ so app.database and app.models resolve
+backend = Path(__file__).resolve().parents[1]
+if str(backend) not in sys.path:
+    sys.path.insert(0, str(backend))
+
+from sqlalchemy import delete, desc, func, insert, select, update  # noqa: E402
+
+from app.crud.messages import list_conversations_for_user  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.models import Conversation, Message, User  # noqa: E402
+
+
+def list_conversations_per_row(db, user_id: int) -> list:
+    """The previous implementation: one query for conversations, then two per conversation."""
+    conversations = db.execute(
+        select(Conversation)
+        .where((Conversation.user1_id == user_id) | (Conversation.user2_id == user_id))
+        .order_by(desc(Conversation.updated_at))
+    ).scalars().all()
+    result = []
+    for conv in conversations:
+        other_id = conv.user2_id if conv.user1_id == user_id else conv.user1_id
+        other_user = db.get(User, other_id)
+        last_msg = db.execute(
+            select(Message).where(Message.conversation_id == conv.id).order_by(desc(Message.created_at)).limit(1)
+        ).scalar_one_or_none()
+        result.append((conv, other_user, last_msg))
+    return result
+
+
+def seed(db, count: int, messages_per_conversation: int) -> list[int]:
+    tag = uuid4().hex[:8]
+    rows = [
+        {"email": f"bench-{tag}-{i}@example.com", "first_name": "Bench", "last_name": str(i), "hashed_password": "x"}
+        for i in range(count + 1)
+    ]
+    user_ids = list(db.execute(insert(User).returning(User.id), rows).scalars())
+    owner, partners = user_ids[0], user_ids[1:]
+    conv_ids = list(
+        db.execute(
+            insert(Conversation).returning(Conversation.id),
+            [{"user1_id": owner, "user2_id": partner} for partner in partners],
+        ).scalars()
+    )
+    if conv_ids and messages_per_conversation:
+        db.execute(
+            insert(Message),
+            [
+                {"conversation_id": conv_id, "sender_id": owner, "content": f"message {n}"}
+                for conv_id in conv_ids
+                for n in range(messages_per_conversation)
+            ],
+        )
+        # Bulk inserts skip create_message, so fill the denormalized last-message columns here
+        last_ids = (
+            select(Message.conversation_id, func.max(Message.id).label("id"))
+            .where(Message.conversation_id.in_(conv_ids))
+            .group_by(Message.conversation_id)
+            .subquery()
+        )
+        db.execute(
+            update(Conversation)
+            .where(Conversation.id == last_ids.c.conversation_id)
+            .values(last_message_id=last_ids.c.id, last_message_at=func.now(), last_message_preview="message")
+        )
+    db.commit()
+    return user_ids
+
+
+def timed(fn, repeats: int) -> float:
+    """Median wall time of `fn` in milliseconds."""
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 500, 1000])
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'conversations':>13} {'per-row ms':>11} {'single ms':>10} {'page ms':>8}")
+    for count in args.counts:
+        with SessionLocal() as db:
+            user_ids = seed(db, count, args.messages)
+            owner = user_ids[0]
+            try:
+                per_row = timed(lambda: list_conversations_per_row(db, owner), args.repeats)
+                single = timed(lambda: list_conversations_for_user(db, owner), args.repeats)
+                page = timed(lambda: list_conversations_for_user(db, owner, limit=args.page_size), args.repeats)
+                print(f"{count:>13} {per_row:>11.1f} {single:>10.1f} {page:>8.1f}")
+            finally:
+                db.rollback()
+                db.execute(delete(User).where(User.id.in_(user_ids)))
+                db.commit()
+
+
+if __name__ == "__main__":
+    main()
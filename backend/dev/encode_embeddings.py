@@ -0,0 +1,73 @@
+"""Convert stored user_embeddings rows to another storage encoding.
+
+Run from backend/ after setting EMBEDDING_ENCODING for new writes:
+
+    python dev/encode_embeddings.py --encoding float32 --batch-size 1000
+
+Rows are rewritten in id order, one committed batch at a time, so the script
+can be stopped and rerun. The app decodes every row by its own encoding, so it
+keeps serving matches while this runs. Use --encoding array before
+downgrading past the binary-encoding migration.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Run from backend/ so app.database and app.models resolve
+backend = Path(__file__).resolve().parents[1]
+if str(backend) not in sys.path:
+    sys.path.insert(0, str(backend))
+
+from sqlalchemy import select, update  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.models import UserEmbedding  # noqa: E402
+from app.services.embedding_codec import decode_row, encode_embedding  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--encoding", choices=["array", "float32", "float16"], required=True)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    target_dtype = encode_embedding([0.0], args.encoding)["embedding_dtype"]
+    already_encoded = (
+        UserEmbedding.embedding.is_not(None)
+        if target_dtype is None
+        else UserEmbedding.embedding_dtype == target_dtype
+    )
+
+    started = time.perf_counter()
+    converted = 0
+    last_id = 0
+    with SessionLocal() as db:
+        while True:
+            rows = db.execute(
+                select(
+                    UserEmbedding.id,
+                    UserEmbedding.embedding,
+                    UserEmbedding.embedding_bin,
+                    UserEmbedding.embedding_dtype,
+                )
+                .where(UserEmbedding.id > last_id, ~already_encoded)
+                .order_by(UserEmbedding.id)
+                .limit(args.batch_size)
+            ).all()
+            if not rows:
+                break
+            db.execute(
+                update(UserEmbedding),
+                [{"id": row.id, **encode_embedding(decode_row(row), args.encoding)} for row in rows],
+            )
+            db.commit()
+            converted += len(rows)
+            last_id = rows[-1].id
+            print(f"  {converted} rows (last id={last_id})")
+
+    print(f"Converted {converted} rows to {args.encoding} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
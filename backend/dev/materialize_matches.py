@@ -0,0 +1,63 @@
+"""Precompute tutor recommendations for every active student.
+
+Run from backend/ (once, or every N seconds with --every):
+
+    python dev/materialize_matches.py --workers 4 --top-k 10
+    python dev/materialize_matches.py --every 3600
+
+Results are stored as "batch" match runs and served by GET /matches/me/recommended
+while they are younger than MATCH_BATCH_MAX_AGE_MINUTES.
+"""
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Run from backend/ so app.database and app.models resolve
+backend = Path(__file__).resolve().parents[1]
+if str(backend) not in sys.path:
+    sys.path.insert(0, str(backend))
+
+from app.crud.embeddings import EMBED_MODEL_NAME  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.services.match_materializer import STAGES, materialize_matches  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-name", default=EMBED_MODEL_NAME)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--candidate-k", type=int, default=50, help="KNN candidates passed to rerank")
+    parser.add_argument("--workers", type=int, default=None, help="default: one per CPU; 1 = no process pool")
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--every", type=float, default=None, metavar="SECONDS", help="repeat forever")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    while True:
+        report = materialize_matches(
+            SessionLocal,
+            model_name=args.model_name,
+            top_k=args.top_k,
+            candidate_k=args.candidate_k,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+        )
+        print(
+            f"Materialized {report.students} students / {report.matches} matches in "
+            f"{report.elapsed_seconds:.1f}s ({report.students_per_second:.0f} students/s), "
+            f"{report.failed_chunks} failed chunks"
+        )
+        for stage in STAGES:
+            per_student = report.stage_ms[stage] / report.students if report.students else 0.0
+            print(f"  {stage:<7} {report.stage_ms[stage] / 1000:.1f}s total, {per_student:.2f}ms/student")
+
+        if args.every is None:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
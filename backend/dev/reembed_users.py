@@ -0,0 +1,59 @@
+"""Re-embed every student and tutor profile for an embedding model.
+
+Run from backend/ before switching EMBED_MODEL_NAME to a new model:
+
+    python dev/reembed_users.py --model-name local-hash-v1 --batch-size 500
+
+Progress is checkpointed after every batch; rerun with --resume to continue an
+interrupted run. Profiles edited while the job runs are still written under the
+old model by the app, so do one more pass (without --resume) right after
+switching EMBED_MODEL_NAME.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Run from backend/ so app.database and app.models resolve
+backend = Path(__file__).resolve().parents[1]
+if str(backend) not in sys.path:
+    sys.path.insert(0, str(backend))
+
+from app.crud.embeddings import EMBED_MODEL_NAME  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.services.reembed import ENTITY_TYPES, reembed_profiles  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-name", default=EMBED_MODEL_NAME)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--entity", choices=ENTITY_TYPES, action="append", help="default: both")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="default: dev/.reembed-<model>.json")
+    parser.add_argument("--resume", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    checkpoint = args.checkpoint or Path(__file__).resolve().parent / f".reembed-{args.model_name}.json"
+
+    report = reembed_profiles(
+        SessionLocal,
+        model_name=args.model_name,
+        batch_size=args.batch_size,
+        entity_types=args.entity or ENTITY_TYPES,
+        checkpoint_path=checkpoint,
+        resume=args.resume,
+    )
+
+    print(f"Re-embedded with {report.model_name}:")
+    for entity_type, count in report.profiles_by_entity.items():
+        print(f"  {entity_type:<8} {count} profiles")
+    print(
+        f"  {report.profiles} profiles / {report.vectors} vectors in {report.batches} batches, "
+        f"{report.elapsed_seconds:.1f}s "
+        f"({report.profiles_per_second:.0f} profiles/s, {report.vectors_per_second:.0f} vectors/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Check that idle WebSockets hold no pooled DB connections.
+
+Opens N notification, chat or gateway sockets in-process against the configured
+database (each authenticates for real), leaves them idle, and reports the async
+engine's pool. Exits 1 if any connection is still checked out. Run from backend/:
+
+    python dev/ws_idle_load.py --sockets 1000 --endpoint notifications
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from fastapi import WebSocketDisconnect
+
+# Run from backend/ so app.database and app.models resolve
+backend = Path(__file__).resolve().parents[1]
+if str(backend) not in sys.path:
+    sys.path.insert(0, str(backend))
+
+from sqlalchemy import select  # noqa: E402
+
+from app.auth import create_access_token  # noqa: E402
+from app.database import AsyncSessionLocal, async_engine  # noqa: E402
+from app.models import Conversation, User  # noqa: E402
+from app.routers.gateway import gateway_websocket  # noqa: E402
+from app.routers.messages import websocket_endpoint  # noqa: E402
+from app.routers.notifications import notifications_ws  # noqa: E402
+from app.services.pool_metrics import pool_snapshot  # noqa: E402
+from app.services.principal_cache import clear_principal_cache  # noqa: E402
+
+
+class IdleWebSocket:
+    def __init__(self, token: str) -> None:
+        self.query_params = {"token": token}
+        self.accepted = asyncio.Event()
+        self.close_code: int | None = None
+        self._hung_up = asyncio.Event()
+
+    async def accept(self) -> None:
+        self.accepted.set()
+
+    async def receive_text(self) -> str:
+        await self._hung_up.wait()
+        raise WebSocketDisconnect(1000)
+
+    receive_json = receive_text
+
+    async def send_json(self, payload: dict) -> None:
+        pass
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        self.close_code = code
+        self.accepted.set()
+
+    def hang_up(self) -> None:
+        self._hung_up.set()
+
+
+async def run(sockets: int, endpoint: str) -> int:
+    async with AsyncSessionLocal() as db:
+        if endpoint == "chat":
+            conv = (await db.execute(select(Conversation).limit(1))).scalar_one_or_none()
+            if conv is None:
+                print("Need at least one conversation for --endpoint chat.")
+                return 1
+            user_ids = [conv.user1_id]
+        else:
+            user_ids = list((await db.execute(select(User.id).limit(sockets))).scalars())
+            if not user_ids:
+                print("Need at least one user.")
+                return 1
+
+    clear_principal_cache()
+    websockets = [IdleWebSocket(create_access_token(str(user_ids[i % len(user_ids)]))) for i in range(sockets)]
+    if endpoint == "chat":
+        tasks = [
+            asyncio.create_task(websocket_endpoint(ws, pairing_id=conv.id, sessions=AsyncSessionLocal))
+            for ws in websockets
+        ]
+    elif endpoint == "gateway":
+        tasks = [asyncio.create_task(gateway_websocket(ws, sessions=AsyncSessionLocal)) for ws in websockets]
+    else:
+        tasks = [
+            asyncio.create_task(notifications_ws(ws, token=ws.query_params["token"], sessions=AsyncSessionLocal))
+            for ws in websockets
+        ]
+
+    await asyncio.gather(*(ws.accepted.wait() for ws in websockets))
+    rejected = sum(ws.close_code is not None for ws in websockets)
+    snapshot = pool_snapshot(async_engine)
+    print(f"sockets={sockets} rejected={rejected} endpoint={endpoint}")
+    print(f"pool: {snapshot}")
+
+    for ws in websockets:
+        ws.hang_up()
+    await asyncio.gather(*tasks)
+    await async_engine.dispose()
+    return 1 if snapshot.get("checked_out", 0) or rejected else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--endpoint", choices=["notifications", "chat", "gateway"], default="notifications")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.sockets, args.endpoint)))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,11 @@ from dotenv import load_dotenv
 from pathlib import Path
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import NullPool
 from app.main import app
-from app.database import get_db
+from app.database import async_url, get_async_db, get_async_sessionmaker, get_db, get_sessionmaker
 from app.database import Base 
 
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -25,6 +27,9 @@ if not SQLALCHEMY_DATABASE_URL:
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# NullPool: each TestClient runs its own event loop, and asyncpg connections can't cross loops
+async_engine = create_async_engine(async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Override the get_db dependency to use the testing session local instead of
 # the dev database session local
@@ -35,6 +40,10 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 @pytest.fixture(scope="function")
 def db_session():
     Base.metadata.create_all(bind=engine)
@@ -48,6 +57,9 @@ def db_session():
 @pytest.fixture(scope="function")
 def client(db_session: Session):
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_sessionmaker] = lambda: TestingSessionLocal
+    app.dependency_overrides[get_async_sessionmaker] = lambda: TestingAsyncSessionLocal
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
\ No newline at end of file
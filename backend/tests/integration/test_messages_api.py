@@ -8,3 +8,171 @@ def test_messages_list_requires_auth(client):
     # assert resp.status_code in (401, 403)
     assert True
 
+
+
+def _user(db_session, email: str, first_name: str):
+    from app.crud.users import create_user
+    from app.schemas import UserCreate
+
+    user = create_user(
+        db_session,
+        UserCreate(
+            email=email,
+            first_name=first_name,
+            last_name="User",
+            password="password123",
+            is_tutor=False,
+            is_student=True,
+        ),
+    )
+    db_session.commit()
+    return user
+
+
+def test_list_conversations_with_partner_last_message_and_pages(client, db_session):
+    from app.auth import create_access_token
+
+    me = _user(db_session, "me@purdue.edu", "Me")
+    partners = [_user(db_session, f"p{i}@purdue.edu", f"P{i}") for i in range(3)]
+    headers = {"Authorization": f"Bearer {create_access_token(str(me.id))}"}
+
+    conv_ids = []
+    for partner in partners:
+        resp = client.post("/messages/conversations", json={"other_user_id": partner.id}, headers=headers)
+        assert resp.status_code == 200
+        conv_ids.append(resp.json()["id"])
+    for content in ("first", "latest"):
+        resp = client.post(f"/messages/conversations/{conv_ids[0]}/messages", json={"content": content}, headers=headers)
+        assert resp.status_code == 200
+
+    rows = client.get("/messages/conversations", headers=headers).json()
+    assert sorted(r["id"] for r in rows) == sorted(conv_ids)
+    by_id = {r["id"]: r for r in rows}
+    assert by_id[conv_ids[0]]["other_user_first_name"] == "P0"
+    assert by_id[conv_ids[0]]["last_message"]["content"] == "latest"
+    assert by_id[conv_ids[1]]["last_message"] is None
+
+    first_page = client.get("/messages/conversations", params={"limit": 2}, headers=headers).json()
+    last = first_page[-1]
+    second_page = client.get(
+        "/messages/conversations",
+        params={"limit": 2, "updated_before": last["updated_at"], "before_id": last["id"]},
+        headers=headers,
+    ).json()
+    assert [r["id"] for r in first_page + second_page] == [r["id"] for r in rows]
+
+    resp = client.get("/messages/conversations", params={"limit": 2, "before_id": last["id"]}, headers=headers)
+    assert resp.status_code == 400
+
+
+def test_unread_counts_follow_new_messages_and_mark_read(client, db_session):
+    from app.auth import create_access_token
+
+    alice = _user(db_session, "alice@purdue.edu", "Alice")
+    bob = _user(db_session, "bob@purdue.edu", "Bob")
+    alice_headers = {"Authorization": f"Bearer {create_access_token(str(alice.id))}"}
+    bob_headers = {"Authorization": f"Bearer {create_access_token(str(bob.id))}"}
+
+    conv_id = client.post("/messages/conversations", json={"other_user_id": bob.id}, headers=alice_headers).json()["id"]
+    for content in ("one", "two"):
+        client.post(f"/messages/conversations/{conv_id}/messages", json={"content": content}, headers=alice_headers)
+
+    assert client.get("/messages/unread-count", headers=bob_headers).json() == {
+        "unread_conversations": 1,
+        "unread_messages": 2,
+    }
+    assert client.get("/messages/unread-count", headers=alice_headers).json()["unread_messages"] == 0
+    (row,) = client.get("/messages/conversations", headers=bob_headers).json()
+    assert row["unread_count"] == 2
+    assert row["last_message_preview"] == "two"
+
+    resp = client.post(f"/messages/conversations/{conv_id}/read", headers=bob_headers)
+    assert resp.status_code == 204
+    assert client.get("/messages/unread-count", headers=bob_headers).json()["unread_messages"] == 0
+
+
+def test_message_history_cursor_pages_both_directions(client, db_session):
+    from app.auth import create_access_token
+
+    alice = _user(db_session, "alice@purdue.edu", "Alice")
+    bob = _user(db_session, "bob@purdue.edu", "Bob")
+    headers = {"Authorization": f"Bearer {create_access_token(str(alice.id))}"}
+    conv_id = client.post("/messages/conversations", json={"other_user_id": bob.id}, headers=headers).json()["id"]
+    url = f"/messages/conversations/{conv_id}/messages"
+    for i in range(5):
+        client.post(url, json={"content": f"m{i}"}, headers=headers)
+
+    newest = client.get(url, params={"order": "desc", "limit": 2}, headers=headers)
+    assert [m["content"] for m in newest.json()] == ["m4", "m3"]
+    older = client.get(
+        url, params={"order": "desc", "limit": 2, "before": newest.headers["X-Next-Cursor"]}, headers=headers
+    )
+    assert [m["content"] for m in older.json()] == ["m2", "m1"]
+
+    oldest = client.get(url, params={"limit": 2}, headers=headers)
+    assert [m["content"] for m in oldest.json()] == ["m0", "m1"]
+    rest = client.get(url, params={"after": oldest.headers["X-Next-Cursor"]}, headers=headers)
+    assert [m["content"] for m in rest.json()] == ["m2", "m3", "m4"]
+
+    assert client.get(url, params={"before": "garbage"}, headers=headers).status_code == 400
+
+
+def test_unread_count_survives_an_older_message_committing_late(db_session):
+    from datetime import datetime, timedelta, timezone
+
+    from app.crud.messages import record_message_stmt
+    from app.models import Conversation, Message
+
+    a = _user(db_session, "late-a@purdue.edu", "A")
+    b = _user(db_session, "late-b@purdue.edu", "B")
+    conv = Conversation(user1_id=a.id, user2_id=b.id)
+    db_session.add(conv)
+    db_session.commit()
+
+    started = datetime.now(timezone.utc)
+    # A's message started first but commits after B's newer one
+    a_msg = Message(conversation_id=conv.id, sender_id=a.id, content="from a", created_at=started)
+    b_msg = Message(conversation_id=conv.id, sender_id=b.id, content="from b", created_at=started + timedelta(seconds=1))
+    db_session.add_all([a_msg, b_msg])
+    db_session.flush()
+    db_session.execute(record_message_stmt(conv, b_msg))
+    db_session.execute(record_message_stmt(conv, a_msg))
+    db_session.commit()
+
+    db_session.refresh(conv)
+    assert conv.last_message_id == b_msg.id
+    assert conv.user1_unread_count == 1  # B's newer message is still unread for A
+    assert conv.user2_unread_count == 1
+    # A's late message doesn't mark B's newer one read
+    assert conv.user1_last_read_message_id is None
+    assert conv.user2_last_read_message_id == b_msg.id
+
+
+def test_read_cursor_follows_message_order_not_id_order(db_session):
+    from datetime import datetime, timedelta, timezone
+
+    from app.crud.messages import record_message_stmt
+    from app.models import Conversation, Message
+
+    a = _user(db_session, "order-a@purdue.edu", "A")
+    b = _user(db_session, "order-b@purdue.edu", "B")
+    conv = Conversation(user1_id=a.id, user2_id=b.id)
+    db_session.add(conv)
+    db_session.commit()
+
+    started = datetime.now(timezone.utc)
+    # Write-behind ids come from per-process blocks: A's newer message can get the smaller id
+    first = Message(conversation_id=conv.id, sender_id=a.id, content="first", created_at=started)
+    second = Message(conversation_id=conv.id, sender_id=a.id, content="second", created_at=started + timedelta(seconds=1))
+    db_session.add(second)
+    db_session.flush()
+    db_session.add(first)
+    db_session.flush()
+    assert second.id < first.id
+    db_session.execute(record_message_stmt(conv, first))
+    db_session.execute(record_message_stmt(conv, second))
+    db_session.commit()
+
+    db_session.refresh(conv)
+    assert conv.last_message_id == second.id
+    assert conv.user1_last_read_message_id == second.id
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+
+from app.services import ann
+from app.services.ann import IVFFlatIndex, get_synced_ivf_index, measure_recall, recall_at_k
+from app.services.embedding_index import TutorEmbeddingIndex
+
+WEIGHTS = {"bio": 1.0, "help": 1.0, "locations": 0.5}
+DIM = 16
+
+
+def _clustered_index(n: int = 2000, clusters: int = 20) -> tuple[TutorEmbeddingIndex, list[np.ndarray]]:
+    rng = np.random.default_rng(7)
+    centers = rng.normal(size=(clusters, DIM * 3))
+    points = centers[rng.integers(0, clusters, n)] + 0.3 * rng.normal(size=(n, DIM * 3))
+    index = TutorEmbeddingIndex("ann-test", DIM)
+    index.rebuild(
+        (i, {"bio": p[:DIM], "help": p[DIM : 2 * DIM], "locations": p[2 * DIM :]})
+        for i, p in enumerate(points)
+    )
+    queries = [
+        index.build_query({"bio": p[:DIM], "help": p[DIM : 2 * DIM], "locations": p[2 * DIM :]}, WEIGHTS)
+        for p in points[:20]
+    ]
+    return index, queries
+
+
+def test_ivf_recall_improves_with_nprobe_and_is_exact_when_probing_all_lists():
+    index, queries = _clustered_index()
+    ivf = IVFFlatIndex(nlist=20, nprobe=1)
+
+    low = measure_recall(index, ivf, queries, top_k=10, nprobe=1)
+    full = measure_recall(index, ivf, queries, top_k=10, nprobe=20)
+
+    assert full == 1.0
+    assert low <= full
+    assert low > 0.5
+
+
+def test_ivf_follows_index_mutations():
+    index, queries = _clustered_index(n=200, clusters=4)
+    ivf = IVFFlatIndex(nlist=4, nprobe=4)
+    ivf.sync(index)
+    top_id = ivf.search(queries[0], top_k=1)[0][0]
+
+    index.remove(top_id)
+    ivf.sync(index)
+
+    assert top_id not in {tutor_id for tutor_id, _ in ivf.search(queries[0], top_k=10)}
+
+
+def test_synced_ivf_serves_previous_lists_while_rebuilding(monkeypatch):
+    monkeypatch.setattr(ann, "_MIN_RESYNC_SECONDS", 0.0)
+    index, queries = _clustered_index(n=200, clusters=4)
+    ivf = get_synced_ivf_index(index, nlist=4, nprobe=4)
+    built = ivf.generation
+    top_id = ivf.search(queries[0], top_k=1)[0][0]
+
+    index.remove(top_id)
+    assert get_synced_ivf_index(index, nlist=4, nprobe=4) is ivf
+
+    deadline = time.monotonic() + 5.0
+    while ivf.generation != index.generation:
+        assert time.monotonic() < deadline, "background IVF sync did not finish"
+        time.sleep(0.01)
+    assert ivf.generation != built
+    assert top_id not in {tutor_id for tutor_id, _ in ivf.search(queries[0], top_k=10)}
+
+
+def test_recall_at_k():
+    exact = [[(1, 0.9), (2, 0.8)], [(3, 0.5)]]
+    approximate = [[(1, 0.9)], [(3, 0.5), (4, 0.1)]]
+    assert recall_at_k(exact, approximate) == 0.75
@@ -0,0 +1,28 @@
+from datetime import time
+from types import SimpleNamespace
+
+from app.services.availability import availability_mask, is_available, overlap_score
+
+
+def _slot(day: int, start: time, end: time) -> SimpleNamespace:
+    return SimpleNamespace(day_of_week=day, start_time=start, end_time=end)
+
+
+def test_overlap_is_shared_minutes_over_student_minutes():
+    student = availability_mask([_slot(0, time(9), time(11)), _slot(2, time(14), time(15))])
+    tutor = availability_mask([_slot(0, time(10), time(12)), _slot(2, time(14, 30), time(16))])
+
+    # Mon 10:00-11:00 + Wed 14:30-15:00 out of 3 student hours
+    assert overlap_score(student, tutor) == 90 / 180
+    assert overlap_score(student, 0) == 0.0
+    assert overlap_score(0, tutor) == 0.0
+
+
+def test_mask_bits_cover_half_open_slots():
+    mask = availability_mask([_slot(6, time(23), time(23, 59)), _slot(1, time(10), time(9))])
+
+    assert mask.bit_count() == 59
+    assert is_available(mask, 6, 23 * 60)
+    assert is_available(mask, 6, 23 * 60 + 58)
+    assert not is_available(mask, 6, 23 * 60 + 59)
+    assert not is_available(mask, 1, 9 * 60 + 30)
@@ -0,0 +1,47 @@
+import asyncio
+
+import fakeredis
+
+from app.services.broker import InProcessBroker, RedisBroker
+from app.services.notification_ws import NotificationConnectionManager
+
+from .ws_fakes import FakeWebSocket, until
+
+
+def test_redis_broker_fans_out_between_workers():
+    async def run():
+        server = fakeredis.FakeServer()
+        worker_a = NotificationConnectionManager(RedisBroker(client=fakeredis.FakeAsyncRedis(server=server)))
+        worker_b = NotificationConnectionManager(RedisBroker(client=fakeredis.FakeAsyncRedis(server=server)))
+        socket_b = FakeWebSocket()
+        await worker_b.connect(socket_b, user_id=7)
+
+        await worker_a.send_to_user(7, {"type": "notification", "id": 1})
+        await until(lambda: socket_b.sent)
+        assert socket_b.sent == [{"type": "notification", "id": 1}]
+
+        await worker_b.disconnect(socket_b, user_id=7)
+        await worker_a.send_to_user(7, {"type": "notification", "id": 2})
+        await asyncio.sleep(0.1)
+        assert socket_b.sent == [{"type": "notification", "id": 1}]
+
+        await worker_a.broker.close()
+        await worker_b.broker.close()
+
+    asyncio.run(run())
+
+
+def test_in_process_broker_delivers_only_to_subscribed_channels():
+    async def run():
+        manager = NotificationConnectionManager(InProcessBroker())
+        socket = FakeWebSocket()
+        await manager.connect(socket, user_id=1)
+
+        await manager.send_to_user(1, {"n": 1})
+        await manager.send_to_user(2, {"n": 2})
+        await until(lambda: socket.sent)
+        await asyncio.sleep(0.05)
+
+        assert socket.sent == [{"n": 1}]
+
+    asyncio.run(run())
@@ -0,0 +1,127 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.services import chat
+from app.services.socket_sender import SocketSender
+
+from .ws_fakes import FakeWebSocket
+
+
+@asynccontextmanager
+async def _session():
+    yield SimpleNamespace()
+
+
+def _message(message_id: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=message_id,
+        conversation_id=7,
+        sender_id=1,
+        content=f"m{message_id}",
+        attachment=None,
+        created_at=datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=message_id),
+    )
+
+
+def test_catch_up_replays_in_batches_then_releases_live_without_duplicates(monkeypatch):
+    stored = [_message(i) for i in range(11, 16)]
+
+    async def run():
+        ws = FakeWebSocket()
+
+        async def on_close():
+            pass
+
+        sender = SocketSender(ws, on_close, max_queue=10, send_timeout=1.0)
+        sender.hold()
+
+        async def get_messages_after_id(db, conversation_id, user_id, after_id, limit):
+            if after_id == 10:
+                # Published while catching up: 13 is also in the replay, 16 is not
+                sender.send({"id": 13})
+                sender.send({"id": 16})
+                stored.append(_message(16))
+            return [m for m in stored if m.id > after_id][:limit]
+
+        async def get_messages(db, conversation_id, user_id, *, limit, after):
+            return [m for m in stored if (m.created_at, m.id) > after][:limit]
+
+        async def get_message_position(db, conversation_id, message_id):
+            # The last seen message is not stored: page by id until a batch arrives
+            return None
+
+        monkeypatch.setattr(chat.crud_messages, "get_messages_after_id", get_messages_after_id)
+        monkeypatch.setattr(chat.crud_messages, "get_messages", get_messages)
+        monkeypatch.setattr(chat.crud_messages, "get_message_position", get_message_position)
+        monkeypatch.setattr(chat, "CATCHUP_BATCH_SIZE", 2)
+        await chat.catch_up(
+            sender,
+            _session,
+            conversation_id=7,
+            user_id=1,
+            last_message_id=10,
+            message_id_of=lambda payload: payload.get("id"),
+        )
+        sender.send({"id": 17})
+        deadline = asyncio.get_running_loop().time() + 2.0
+        while not ws.sent or ws.sent[-1] != {"id": 17}:
+            assert asyncio.get_running_loop().time() < deadline, "timed out waiting for delivery"
+            await asyncio.sleep(0.01)
+        sender.stop()
+        return ws.sent
+
+    sent = asyncio.run(run())
+    history = [frame for frame in sent if frame.get("type") == "history"]
+    assert [[m["id"] for m in frame["messages"]] for frame in history] == [[11, 12], [13, 14], [15, 16]]
+    assert sent[len(history)] == {"type": "live", "conversation_id": 7, "last_message_id": 16}
+    assert sent[len(history) + 1:] == [{"id": 17}]
+
+
+def test_catch_up_replays_a_late_commit_positioned_before_the_last_seen_message(monkeypatch):
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    stored = [_message(i) for i in range(11, 16)]
+    # Started before 13 (so it sorts before it) but committed after the client saw 13
+    late = _message(16)
+    late.created_at = base + timedelta(seconds=12.5)
+    stored.append(late)
+    stored.sort(key=lambda m: (m.created_at, m.id))
+
+    async def run():
+        ws = FakeWebSocket()
+
+        async def on_close():
+            pass
+
+        sender = SocketSender(ws, on_close, max_queue=10, send_timeout=1.0)
+        sender.hold()
+
+        async def get_message_position(db, conversation_id, message_id):
+            return next((m.created_at, m.id) for m in stored if m.id == message_id)
+
+        async def get_messages(db, conversation_id, user_id, *, limit, after):
+            return [m for m in stored if (m.created_at, m.id) > after][:limit]
+
+        monkeypatch.setattr(chat.crud_messages, "get_message_position", get_message_position)
+        monkeypatch.setattr(chat.crud_messages, "get_messages", get_messages)
+        await chat.catch_up(
+            sender,
+            _session,
+            conversation_id=7,
+            user_id=1,
+            last_message_id=13,
+            message_id_of=lambda payload: payload.get("id"),
+        )
+        deadline = asyncio.get_running_loop().time() + 2.0
+        while not ws.sent or ws.sent[-1].get("type") != "live":
+            assert asyncio.get_running_loop().time() < deadline, "timed out waiting for delivery"
+            await asyncio.sleep(0.01)
+        sender.stop()
+        return ws.sent
+
+    sent = asyncio.run(run())
+    replayed = [m["id"] for frame in sent if frame.get("type") == "history" for m in frame["messages"]]
+    assert 16 in replayed
+    assert len(replayed) == len(set(replayed))
+    assert sent[-1] == {"type": "live", "conversation_id": 7, "last_message_id": 15}
@@ -0,0 +1,24 @@
+import numpy as np
+
+from app.services.embedding_codec import decode_embedding, encode_embedding
+
+
+def test_binary_encodings_round_trip_within_precision():
+    values = np.linspace(-1.0, 1.0, 128).tolist()
+
+    for encoding, atol in (("float32", 1e-7), ("float16", 1e-3)):
+        encoded = encode_embedding(values, encoding)
+        assert encoded["embedding"] is None
+        assert len(encoded["embedding_bin"]) == 128 * (4 if encoding == "float32" else 2)
+
+        decoded = decode_embedding(None, encoded["embedding_bin"], encoded["embedding_dtype"])
+        assert decoded.dtype == np.float32
+        np.testing.assert_allclose(decoded, values, atol=atol)
+
+
+def test_array_encoding_keeps_float_list():
+    encoded = encode_embedding(np.array([0.25, -0.5]), "array")
+
+    assert encoded == {"embedding": [0.25, -0.5], "embedding_bin": None, "embedding_dtype": None}
+    assert decode_embedding(encoded["embedding"], None, None).tolist() == [0.25, -0.5]
+    assert decode_embedding(None, None, None).size == 0
@@ -0,0 +1,112 @@
+from app.services.embedding_index import TutorEmbeddingIndex
+from app.services.embeddings import EMBED_DIM, cosine_sim, embed_text
+
+WEIGHTS = {"bio": 1.0, "help": 1.0, "locations": 0.5}
+
+
+def _vectors(bio: str, help_text: str, locations: str) -> dict[str, list[float]]:
+    return {
+        "bio": embed_text(bio),
+        "help": embed_text(help_text),
+        "locations": embed_text(locations),
+    }
+
+
+def _expected_score(student: dict, tutor: dict) -> float:
+    weighted = sum(WEIGHTS[field] * cosine_sim(student[field], tutor[field]) for field in WEIGHTS)
+    return weighted / sum(WEIGHTS.values())
+
+
+def test_search_matches_pure_python_weighted_cosine():
+    tutors = {
+        1: _vectors("loves calculus", "calc ma 161", "walc"),
+        2: _vectors("java and data structures", "cs 251", "lawson"),
+        3: _vectors("", "", ""),
+    }
+    student = _vectors("calculus help please", "calc", "walc hicks")
+
+    index = TutorEmbeddingIndex("test-model", EMBED_DIM)
+    index.rebuild(tutors.items())
+    results = index.search(index.build_query(student, WEIGHTS), top_k=10)
+
+    assert [tutor_id for tutor_id, _ in results][0] == 1
+    for tutor_id, score in results:
+        assert abs(score - _expected_score(student, tutors[tutor_id])) < 1e-5
+
+
+def test_search_limits_to_top_k_and_handles_empty_index():
+    index = TutorEmbeddingIndex("test-model", EMBED_DIM)
+    query = index.build_query(_vectors("a", "b", "c"), WEIGHTS)
+    assert index.search(query, top_k=5) == []
+
+    index.rebuild((user_id, _vectors(f"tutor {user_id}", "help", "walc")) for user_id in range(20))
+    assert len(index.search(query, top_k=5)) == 5
+
+
+def test_in_place_patches_replace_append_and_tombstone():
+    index = TutorEmbeddingIndex("test-model", EMBED_DIM)
+    index.rebuild([(1, _vectors("calculus", "calc", "walc")), (2, _vectors("java", "cs 180", "lawson"))])
+    student = _vectors("java", "cs 251", "lawson")
+    query = index.build_query(student, WEIGHTS)
+    generation = index.generation
+
+    index.upsert(3, student)
+    assert index.search(query, top_k=1)[0][0] == 3
+
+    index.upsert_field(1, "bio", embed_text("java"))
+    assert abs(dict(index.search(query, top_k=3))[1] - _expected_score(
+        student, {**_vectors("calculus", "calc", "walc"), "bio": embed_text("java")}
+    )) < 1e-5
+
+    assert index.remove(3) is True
+    assert index.remove(3) is False
+    assert 3 not in index
+    assert [tutor_id for tutor_id, _ in index.search(query, top_k=5)] == [2, 1]
+    assert index.generation > generation
+
+    index.compact()
+    assert len(index) == 2
+    assert [tutor_id for tutor_id, _ in index.search(query, top_k=5)] == [2, 1]
+
+
+def test_session_patches_apply_on_commit_only():
+    from sqlalchemy.orm import Session
+
+    from app.services.embedding_index import get_tutor_index, queue_index_upsert
+
+    index = get_tutor_index("test-session-model", EMBED_DIM)
+    index.rebuild([], signature=(0, 0, None))
+
+    with Session() as db:
+        queue_index_upsert(db, user_id=7, field_name="bio", model_name="test-session-model", embedding=embed_text("x"))
+        db.rollback()
+        assert 7 not in index
+
+        queue_index_upsert(db, user_id=7, field_name="bio", model_name="test-session-model", embedding=embed_text("x"))
+        db.commit()
+        assert 7 in index
+
+
+def test_fresh_index_reconciles_fully_when_due(monkeypatch):
+    from app.config import settings
+    from app.services import embeddings
+    from app.services.embedding_index import get_tutor_index
+
+    calls: list[str] = []
+    signature = (1, 3, None)
+    monkeypatch.setattr(embeddings, "_tutor_index_signature", lambda db, model_name: signature)
+    monkeypatch.setattr(
+        embeddings, "_load_tutor_index", lambda db, index, sig: (calls.append("load"), index.rebuild([], signature=sig))
+    )
+    monkeypatch.setattr(embeddings, "_sync_tutor_index", lambda db, index, sig: calls.append("sync"))
+
+    index = get_tutor_index("test-reconcile-model", EMBED_DIM)
+    embeddings.get_fresh_tutor_index(None, "test-reconcile-model")
+    embeddings.get_fresh_tutor_index(None, "test-reconcile-model")
+    assert calls == ["load"]
+
+    # Unchanged signature, but a late commit may have been missed: reload anyway
+    monkeypatch.setattr(settings, "tutor_index_reconcile_seconds", 0)
+    embeddings.get_fresh_tutor_index(None, "test-reconcile-model")
+    assert calls == ["load", "load"]
+    assert index.signature == signature
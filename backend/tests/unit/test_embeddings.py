@@ -0,0 +1,151 @@
+import hashlib
+import math
+from types import SimpleNamespace
+
+from app.services.class_index import ClassTutorIndex
+from app.services.embeddings import (
+    EMBED_DIM,
+    WEIGHTS,
+    _class_strength_column,
+    _grade_to_points,
+    _embedding_similarity_column,
+    compute_class_strength_score,
+    cosine_sim,
+    embed_text,
+    embed_texts,
+)
+
+
+def _reference_local_hash_v1(text: str) -> list[float]:
+    """The original per-token loop that produced every stored local-hash-v1 vector."""
+    tokens = [token for token in text.lower().strip().split() if token]
+    if not tokens:
+        return [0.0] * EMBED_DIM
+    vector = [0.0] * EMBED_DIM
+    for token in tokens:
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        for i in range(EMBED_DIM):
+            vector[i] += digest[i % len(digest)] / 255.0
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector]
+
+
+TEXTS = [
+    "",
+    "   ",
+    "Calculus",
+    "I can help with CS 251, CS 182 and MA 261",
+    "WALC, Hicks, Lawson, Online",
+    " ".join(f"token{i % 37}" for i in range(300)),
+    "Ünïcode tokens ok ✓",
+]
+
+
+def test_embed_texts_is_bit_for_bit_identical_to_local_hash_v1():
+    assert embed_texts(TEXTS) == [_reference_local_hash_v1(text) for text in TEXTS]
+
+
+def test_embed_text_matches_batch_output():
+    for text, batch_vector in zip(TEXTS, embed_texts(TEXTS)):
+        assert embed_text(text) == batch_vector
+
+
+TUTORS = [
+    SimpleNamespace(classes_tutoring=[SimpleNamespace(class_id=1, grade_received="A", has_taed=True)]),
+    SimpleNamespace(
+        classes_tutoring=[
+            SimpleNamespace(class_id=1, grade_received="B+", has_taed=False),
+            SimpleNamespace(class_id=2, grade_received="A-", has_taed=False),
+            SimpleNamespace(class_id=3, grade_received="A", has_taed=True),
+        ]
+    ),
+    SimpleNamespace(classes_tutoring=[SimpleNamespace(class_id=3, grade_received="A", has_taed=False)]),
+    SimpleNamespace(classes_tutoring=[]),
+]
+
+
+def _class_index(tutors: list[SimpleNamespace]) -> ClassTutorIndex:
+    """Rows get id 100 * tutor_id + class_id."""
+    index = ClassTutorIndex()
+    index.rebuild(
+        [
+            (100 * tutor_id + row.class_id, row.class_id, tutor_id, _grade_to_points(row.grade_received), row.has_taed)
+            for tutor_id, tutor in enumerate(tutors)
+            for row in tutor.classes_tutoring
+        ],
+        signature=(0, 0),
+    )
+    return index
+
+
+def test_columnar_rerank_features_match_per_tutor_scores():
+    student_classes = [
+        SimpleNamespace(class_id=1, help_level=9, estimated_grade="C"),
+        SimpleNamespace(class_id=2, help_level=3, estimated_grade="A-"),
+    ]
+    tutors = TUTORS
+    expected = [compute_class_strength_score(t.classes_tutoring, student_classes) for t in tutors]
+    index = _class_index(tutors)
+    assert list(_class_strength_column(range(len(tutors)), student_classes, index)) == expected
+
+    student = {"bio": embed_text("calculus help"), "help": embed_text("ma 161"), "locations": None}
+    tutor_vectors = [
+        {"bio": embed_text("calculus tutor"), "help": embed_text("ma 161 ma 162"), "locations": embed_text("walc")},
+        {"bio": None, "help": embed_text("cs 251"), "locations": None},
+        {"bio": [0.0] * EMBED_DIM, "help": None, "locations": None},
+    ]
+    similarity = _embedding_similarity_column(student, tutor_vectors)
+    for tutor, score in zip(tutor_vectors, similarity):
+        weighted = sum(w * cosine_sim(student[f] or [], tutor[f] or []) for f, w in WEIGHTS.items())
+        assert abs(score - weighted / sum(WEIGHTS.values())) < 1e-9
+
+
+def test_class_index_add_and_remove_patch_rows_and_signature():
+    index = _class_index(TUTORS)
+
+    assert index.remove(100 * 1 + 2) is True
+    assert index.remove(100 * 1 + 2) is False
+    index.add((999, 2, 3, _grade_to_points("A"), False))
+    assert index.signature == (0, 999 - 102)
+    assert {tutor_id for _, tutor_id, _, _ in index.overlap([2])} == {3}
+
+
+def test_bulk_upsert_splits_large_batches(monkeypatch):
+    from app.crud import embeddings as crud_embeddings
+
+    executed = []
+    db = SimpleNamespace(execute=executed.append, info={})
+    monkeypatch.setattr(crud_embeddings, "BULK_UPSERT_CHUNK_ROWS", 4)
+    rows = [
+        {"user_id": i, "entity_type": "student", "field_name": "bio", "embedding": [0.0] * EMBED_DIM}
+        for i in range(10)
+    ]
+
+    assert crud_embeddings.bulk_upsert_user_embeddings(db, rows) == 10
+    assert [len(stmt._multi_values[0]) for stmt in executed] == [4, 4, 2]
+
+
+def test_pgvector_results_rescore_tutors_with_missing_fields_like_the_index():
+    from app.services.embedding_index import TutorEmbeddingIndex
+    from app.services.embeddings import _merge_rescored_tutors
+
+    student = {"bio": embed_text("calculus"), "help": embed_text("ma 161"), "locations": embed_text("walc")}
+    complete = {"bio": embed_text("calculus"), "help": embed_text("cs 251"), "locations": embed_text("hicks")}
+    # Tutor 2 has no stored bio vector; the index path embeds the profile text instead
+    fallback = {"bio": embed_text("calculus tutor"), "help": embed_text("ma 161"), "locations": embed_text("walc")}
+    exact = TutorEmbeddingIndex("parity-model", EMBED_DIM)
+    exact.rebuild([(1, complete), (2, fallback)])
+    expected = exact.search(exact.build_query(student, WEIGHTS), 2)
+
+    # What the SQL rescoring returns: tutor 2's missing bio counts as zero
+    def sql_score(vectors):
+        total = sum(w * cosine_sim(student[f], vectors[f]) for f, w in WEIGHTS.items() if f in vectors)
+        return total / sum(WEIGHTS.values())
+
+    partial = {"help": fallback["help"], "locations": fallback["locations"]}
+    from_sql = sorted([(1, sql_score(complete)), (2, sql_score(partial))], key=lambda row: -row[1])
+
+    merged = _merge_rescored_tutors(from_sql, [(2, fallback)], student, WEIGHTS, 2, model_name="parity-model")
+    assert [tutor_id for tutor_id, _ in merged] == [tutor_id for tutor_id, _ in expected]
+    for (_, got), (_, want) in zip(merged, expected):
+        assert abs(got - want) < 1e-5
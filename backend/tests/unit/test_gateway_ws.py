@@ -0,0 +1,125 @@
+import asyncio
+
+from app.routers import gateway, messages
+from app.services.broker import InProcessBroker, chat_channel, notification_channel
+from app.services.gateway_ws import GatewayManager
+from app.services.message_writer import LagExceeded
+from app.services.notification_ws import NotificationConnectionManager
+
+from .ws_fakes import FakeWebSocket, until
+
+
+def test_gateway_multiplexes_chat_and_notifications():
+    async def run():
+        broker = InProcessBroker()
+        manager = GatewayManager(broker)
+        alice, bob = FakeWebSocket(), FakeWebSocket()
+        alice_conn = await manager.connect(alice, user_id=1)
+        bob_conn = await manager.connect(bob, user_id=2)
+        await manager.subscribe(alice_conn, 10)
+        await manager.subscribe(bob_conn, 10)
+        await manager.subscribe(alice_conn, 11)
+
+        await broker.publish(chat_channel(10), {"id": 100})
+        await broker.publish(chat_channel(11), {"id": 101})
+        await broker.publish(notification_channel(2), {"type": "notification", "id": 5})
+        await until(lambda: len(alice.sent) == 2 and len(bob.sent) == 2)
+
+        assert alice.sent == [
+            {"type": "message", "conversation_id": 10, "message": {"id": 100}},
+            {"type": "message", "conversation_id": 11, "message": {"id": 101}},
+        ]
+        assert bob.sent == [
+            {"type": "message", "conversation_id": 10, "message": {"id": 100}},
+            {"type": "notification", "id": 5},
+        ]
+
+        await manager.disconnect(alice_conn)
+        await manager.disconnect(bob_conn)
+
+    asyncio.run(run())
+
+
+def test_gateway_drops_broker_subscriptions_when_unused():
+    async def run():
+        broker = InProcessBroker()
+        manager = GatewayManager(broker)
+        legacy = NotificationConnectionManager(broker)
+        legacy_socket = FakeWebSocket()
+        await legacy.connect(legacy_socket, user_id=1)
+
+        first = await manager.connect(FakeWebSocket(), user_id=1)
+        second = await manager.connect(FakeWebSocket(), user_id=1)
+        await manager.subscribe(first, 10)
+        await manager.subscribe(second, 10)
+
+        await manager.unsubscribe(first, 10)
+        assert chat_channel(10) in broker._handlers
+        await manager.disconnect(second)
+        assert chat_channel(10) not in broker._handlers
+        await manager.disconnect(first)
+        assert manager.by_user == {} and manager.by_conversation == {}
+
+        # The legacy notification socket still shares the channel
+        await broker.publish(notification_channel(1), {"type": "notification", "id": 1})
+        await until(lambda: legacy_socket.sent)
+        assert legacy_socket.sent == [{"type": "notification", "id": 1}]
+        await legacy.disconnect(legacy_socket, user_id=1)
+        assert broker._handlers == {}
+
+    asyncio.run(run())
+
+
+def test_write_behind_ack_reports_saved_and_failed_messages():
+    async def run():
+        manager = GatewayManager(InProcessBroker())
+        socket = FakeWebSocket()
+        connection = await manager.connect(socket, user_id=1)
+        frame = {"type": "send", "conversation_id": 10, "content": "hi", "client_id": "c1"}
+        loop = asyncio.get_running_loop()
+
+        saved = loop.create_future()
+        saved.set_result(None)
+        gateway._ack_saved(connection, frame, 5, saved)
+        failed = loop.create_future()
+        failed.set_exception(LagExceeded("not committed in time"))
+        gateway._ack_saved(connection, frame, 6, failed)
+
+        await until(lambda: len(socket.sent) == 2)
+        await manager.disconnect(connection)
+        return socket.sent
+
+    sent = asyncio.run(run())
+    assert sent == [
+        {"type": "sent", "conversation_id": 10, "message_id": 5, "client_id": "c1"},
+        {
+            "type": "error",
+            "detail": "Message could not be saved",
+            "conversation_id": 10,
+            "client_id": "c1",
+            "message_id": 6,
+        },
+    ]
+
+
+def test_chat_socket_acks_saved_messages(monkeypatch):
+    async def run():
+        manager = messages.ConnectionManager(InProcessBroker())
+        monkeypatch.setattr(messages, "manager", manager)
+        socket = FakeWebSocket()
+        await manager.connect(socket, pairing_id=10)
+        loop = asyncio.get_running_loop()
+
+        saved = loop.create_future()
+        saved.set_result(None)
+        messages._ack_saved(socket, 5, saved)
+        failed = loop.create_future()
+        failed.set_exception(LagExceeded("not committed in time"))
+        messages._ack_saved(socket, 6, failed)
+
+        await until(lambda: len(socket.sent) == 2)
+        await manager.disconnect(socket, 10)
+        return socket.sent
+
+    sent = asyncio.run(run())
+    assert sent == [{"type": "ack", "message_id": 5}, {"error": "Message could not be saved", "message_id": 6}]
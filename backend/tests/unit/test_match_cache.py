@@ -0,0 +1,48 @@
+from app.services.match_cache import (
+    bump_generation,
+    candidate_cache_key,
+    get_cached_candidates,
+    invalidate_student,
+    store_candidates,
+)
+
+MODEL = "test-match-cache-model"
+ROWS = [
+    {
+        "tutor_id": 5,
+        "final_score": 0.8,
+        "embedding_similarity": 0.9,
+        "class_strength": 0.7,
+        "availability_overlap": 0.5,
+        "location_match": 1.0,
+    }
+]
+
+
+def test_cached_candidates_follow_generations_and_invalidation():
+    key = candidate_cache_key(MODEL)
+    store_candidates(1, key, ROWS)
+    store_candidates(2, key, ROWS)
+    assert get_cached_candidates(1, candidate_cache_key(MODEL)) == ROWS
+
+    invalidate_student(1)
+    assert get_cached_candidates(1, candidate_cache_key(MODEL)) is None
+    assert get_cached_candidates(2, candidate_cache_key(MODEL)) == ROWS
+
+    bump_generation("availability")
+    assert get_cached_candidates(2, candidate_cache_key(MODEL)) is None
+
+
+def test_cache_key_follows_tutor_pool_not_field_edits():
+    from app.services.embedding_index import get_tutor_index
+    from app.services.embeddings import EMBED_DIM, embed_text
+
+    index = get_tutor_index(MODEL, EMBED_DIM)
+    index.rebuild([(5, {"bio": embed_text("algebra")})], signature=(1, 1, None))
+    store_candidates(3, candidate_cache_key(MODEL), ROWS)
+
+    index.upsert_field(5, "bio", embed_text("calculus"))
+    assert get_cached_candidates(3, candidate_cache_key(MODEL)) == ROWS
+
+    index.upsert_field(6, "bio", embed_text("geometry"))
+    assert get_cached_candidates(3, candidate_cache_key(MODEL)) is None
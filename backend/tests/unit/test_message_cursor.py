@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.crud.messages import decode_message_cursor, encode_message_cursor
+from app.models import Message
+
+
+def test_message_cursor_round_trips_microseconds_and_id():
+    created_at = datetime(2026, 3, 1, 12, 30, 5, 123456, tzinfo=timezone.utc)
+    cursor = encode_message_cursor(Message(id=981, created_at=created_at))
+    assert "=" not in cursor
+    assert decode_message_cursor(cursor) == (created_at, 981)
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "bm8tc2VwYXJhdG9y", "MjAyNnx4"])
+def test_malformed_message_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_message_cursor(cursor)
@@ -0,0 +1,197 @@
+import asyncio
+from itertools import count
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.models import Conversation
+from app.services import message_writer
+from app.services.message_writer import LagExceeded, MessageWriter
+
+
+class _FakeSession:
+    def __init__(self, log: list[list], failures: list[Exception], statement_delay: float) -> None:
+        self._log = log
+        self._failures = failures
+        self._statement_delay = statement_delay
+        self._executed: list = []
+
+    async def __aenter__(self) -> "_FakeSession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+    async def execute(self, stmt) -> None:
+        if self._failures:
+            raise self._failures.pop(0)
+        if stmt.is_insert and "bad" in stmt.compile().params.values():
+            raise IntegrityError(str(stmt), {}, Exception("foreign key violation"))
+        await asyncio.sleep(self._statement_delay)
+        self._executed.append(stmt)
+
+    async def commit(self) -> None:
+        self._log.append(self._executed)
+
+
+def _writer(
+    log: list[list],
+    *,
+    failures: list[Exception] | None = None,
+    statement_delay: float = 0.0,
+    **kwargs,
+) -> MessageWriter:
+    ids = count(1)
+    failures = failures if failures is not None else []
+
+    async def reserve_ids(table: str, size: int) -> list[int]:
+        return [next(ids) for _ in range(size)]
+
+    return MessageWriter(
+        lambda: _FakeSession(log, failures, statement_delay),
+        batch_size=kwargs.pop("batch_size", 50),
+        max_delay_seconds=kwargs.pop("max_delay_seconds", 0.01),
+        max_pending=100,
+        max_lag_seconds=kwargs.pop("max_lag_seconds", 5.0),
+        id_block_size=8,
+        reserve_ids=reserve_ids,
+    )
+
+
+def _conversation(conversation_id: int) -> Conversation:
+    return Conversation(id=conversation_id, user1_id=1, user2_id=2)
+
+
+def test_writer_batches_messages_and_resolves_after_commit():
+    log: list[list] = []
+
+    async def run():
+        writer = _writer(log)
+        conversations = [_conversation(1), _conversation(2)]
+        pending = [
+            await writer.submit(
+                conversations[i % 2],
+                sender_id=1,
+                content=f"m{i}",
+                notification={"user_id": 2, "event_type": "notification", "title": "New message", "body": "hi"},
+            )
+            for i in range(30)
+        ]
+        await asyncio.wait_for(asyncio.gather(*(p.saved for p in pending)), 2.0)
+        snapshot = writer.snapshot()
+        await writer.close()
+        return pending, snapshot
+
+    pending, snapshot = asyncio.run(run())
+    message_ids = [p.message.id for p in pending]
+    assert len(set(message_ids)) == 30
+    assert message_ids == sorted(message_ids)
+    assert snapshot == {"pending": 0, "batches_written": 1, "messages_written": 30, "messages_failed": 0}
+    # One transaction: messages, notifications, then one UPDATE per conversation
+    [statements] = log
+    assert [s.table.name for s in statements] == ["messages", "notifications", "conversations", "conversations"]
+
+
+def test_writer_isolates_rejected_rows():
+    log: list[list] = []
+
+    async def run():
+        writer = _writer(log)
+        good = await writer.submit(_conversation(1), sender_id=1, content="ok")
+        bad = await writer.submit(_conversation(3), sender_id=1, content="bad")
+        other = await writer.submit(_conversation(1), sender_id=2, content="also ok")
+        await asyncio.wait_for(asyncio.wait([good.saved, bad.saved, other.saved]), 2.0)
+        await writer.close()
+        return good, bad, other
+
+    good, bad, other = asyncio.run(run())
+    assert good.saved.result() is None
+    assert other.saved.result() is None
+    with pytest.raises(IntegrityError):
+        bad.saved.result()
+    # The batch was retried row by row; only the good rows committed
+    assert len(log) == 2
+
+
+def test_close_drains_pending_messages():
+    log: list[list] = []
+
+    async def run():
+        writer = _writer(log, max_delay_seconds=0.2)
+        pending = await writer.submit(_conversation(1), sender_id=1, content="late")
+        await writer.close()
+        with pytest.raises(RuntimeError):
+            await writer.submit(_conversation(1), sender_id=1, content="too late")
+        return pending
+
+    pending = asyncio.run(run())
+    assert pending.saved.done() and pending.saved.result() is None
+    assert len(log) == 1
+
+
+def test_writer_retries_transient_failures_with_backoff(monkeypatch):
+    monkeypatch.setattr(message_writer, "_RETRY_BACKOFF_SECONDS", 0.01)
+    log: list[list] = []
+    outage = [OperationalError("INSERT", {}, Exception("connection reset")) for _ in range(2)]
+
+    async def run():
+        writer = _writer(log, failures=outage)
+        pending = await writer.submit(_conversation(1), sender_id=1, content="retried")
+        await asyncio.wait_for(pending.saved, 2.0)
+        await writer.close()
+        return writer.snapshot()
+
+    snapshot = asyncio.run(run())
+    assert outage == []
+    assert len(log) == 1
+    assert snapshot["messages_written"] == 1 and snapshot["messages_failed"] == 0
+
+
+def test_writer_fails_messages_it_cannot_commit_within_the_max_lag(monkeypatch):
+    monkeypatch.setattr(message_writer, "_RETRY_BACKOFF_SECONDS", 0.05)
+    log: list[list] = []
+    outage = [OperationalError("INSERT", {}, Exception("connection reset")) for _ in range(3)]
+
+    async def run():
+        writer = _writer(log, failures=outage, max_lag_seconds=0.1)
+        pending = await writer.submit(_conversation(1), sender_id=1, content="too slow")
+        # barrier() returns once the message is settled, even though it failed
+        await asyncio.wait_for(writer.barrier(), 2.0)
+        await writer.close()
+        return pending
+
+    pending = asyncio.run(run())
+    with pytest.raises(LagExceeded):
+        pending.saved.result()
+    assert log == []
+
+
+def test_writer_does_not_commit_past_the_deadline():
+    log: list[list] = []
+
+    async def run():
+        # Each statement takes longer than the lag budget, so the commit would land too late
+        writer = _writer(log, statement_delay=0.06, max_lag_seconds=0.1)
+        pending = await writer.submit(_conversation(1), sender_id=1, content="slow db")
+        await asyncio.wait_for(writer.barrier(), 2.0)
+        await writer.close()
+        return pending
+
+    pending = asyncio.run(run())
+    with pytest.raises(LagExceeded):
+        pending.saved.result()
+    assert log == []
+
+
+def test_barrier_waits_for_everything_submitted_before_it():
+    log: list[list] = []
+
+    async def run():
+        writer = _writer(log, max_delay_seconds=0.05)
+        pending = [await writer.submit(_conversation(1), sender_id=1, content=f"m{i}") for i in range(5)]
+        await writer.barrier()
+        done = all(p.saved.done() for p in pending)
+        await writer.close()
+        return done
+
+    assert asyncio.run(run())
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from app.services.password_hashing import HasherBusy, PasswordHasher
+
+
+def _slow_hash(password: str) -> tuple[str, float]:
+    time.sleep(0.3)
+    return password, 300.0
+
+
+def test_hash_and_verify_in_worker_process_record_timings():
+    hasher = PasswordHasher(workers=1, max_pending=4, timeout_seconds=30.0)
+
+    async def run():
+        hashed = await hasher.hash("password123")
+        return await hasher.verify("password123", hashed), await hasher.verify("wrong", hashed)
+
+    try:
+        assert asyncio.run(run()) == (True, False)
+    finally:
+        hasher.shutdown()
+
+    snapshot = hasher.snapshot()
+    assert snapshot["pending"] == 0
+    assert snapshot["operations"]["hash"]["calls"] == 1
+    assert snapshot["operations"]["verify"]["calls"] == 2
+    assert snapshot["operations"]["verify"]["avg_run_ms"] > 0
+
+
+def test_saturated_pool_rejects_instead_of_queueing():
+    hasher = PasswordHasher(workers=0, max_pending=2, timeout_seconds=30.0)
+
+    async def run():
+        return await asyncio.gather(*(hasher.hash("pw") for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert sum(isinstance(r, HasherBusy) for r in results) == 1
+    assert sum(isinstance(r, str) for r in results) == 2
+    assert hasher.snapshot()["rejected"] == 1
+    assert hasher.snapshot()["peak_pending"] == 2
+
+
+def test_timed_out_call_holds_its_slot_until_the_work_finishes():
+    hasher = PasswordHasher(workers=0, max_pending=1, timeout_seconds=0.05)
+
+    async def run():
+        timed_out = await asyncio.gather(hasher._run("hash", _slow_hash, "pw"), return_exceptions=True)
+        # The first bcrypt call is still running: no room for another yet
+        busy = await asyncio.gather(hasher._run("hash", _slow_hash, "pw"), return_exceptions=True)
+        pending = hasher.snapshot()["pending"]
+        await asyncio.sleep(0.5)
+        return timed_out[0], busy[0], pending, hasher.snapshot()["pending"]
+
+    timed_out, busy, pending_while_running, pending_after = asyncio.run(run())
+
+    assert isinstance(timed_out, HasherBusy)
+    assert isinstance(busy, HasherBusy)
+    assert pending_while_running == 1
+    assert pending_after == 0
+    assert hasher.snapshot()["timeouts"] == 1
+    assert hasher.snapshot()["rejected"] == 1
@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from app.services.pool_metrics import InstrumentedQueuePool, instrument_pool, pool_snapshot
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_snapshot_counts_checkouts_waits_and_timeouts(engine):
+    instrument_pool(engine.pool)
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    snapshot = pool_snapshot(engine)
+    assert snapshot["size"] == 1
+    assert snapshot["checked_out"] == 0
+    assert snapshot["connects"] == 1
+    assert snapshot["checkouts"] == snapshot["checkins"] == 1
+    assert snapshot["timeouts"] == 1
+    assert snapshot["wait"]["count"] == 2
+    assert snapshot["wait"]["max_ms"] >= 50
+    assert snapshot["peak_checked_out"] == 1
+
+
+def test_idle_liveness_pings_only_idle_connections_and_survives_dispose(engine):
+    instrument_pool(engine.pool, liveness_idle_seconds=0.0)
+
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    # First checkout is a fresh connection; the next two were idle in the pool
+    assert pool_snapshot(engine)["liveness_pings"] == 2
+
+    engine.dispose()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    snapshot = pool_snapshot(engine)
+    assert snapshot["connects"] == 2
+    assert snapshot["checkouts"] == 4
+
+
+def test_metrics_routes_are_not_mounted_unless_enabled():
+    from app.main import app
+
+    assert not [route for route in app.routes if getattr(route, "path", "").startswith("/metrics")]
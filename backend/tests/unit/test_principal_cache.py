@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from app.services import principal_cache
+from app.services.principal_cache import (
+    Principal,
+    clear_principal_cache,
+    get_cached_principal,
+    invalidate_principal,
+    store_principal,
+)
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    clear_principal_cache()
+    yield
+    clear_principal_cache()
+
+
+def _principal(user_id: int) -> Principal:
+    return Principal(id=user_id, status=0, is_tutor=False, is_student=True, first_name="Ada")
+
+
+def test_invalidate_drops_every_token_of_the_user():
+    expires_at = time.time() + 600
+    store_principal("a1", _principal(1), expires_at=expires_at)
+    store_principal("a2", _principal(1), expires_at=expires_at)
+    store_principal("b1", _principal(2), expires_at=expires_at)
+
+    invalidate_principal(1)
+
+    assert get_cached_principal("a1") is None
+    assert get_cached_principal("a2") is None
+    assert get_cached_principal("b1") == _principal(2)
+
+
+def test_entries_expire_with_the_token_and_evict_least_recent(monkeypatch):
+    store_principal("expired", _principal(1), expires_at=time.time() - 1)
+    assert get_cached_principal("expired") is None
+
+    monkeypatch.setattr(principal_cache, "_CACHE_MAX_TOKENS", 2)
+    expires_at = time.time() + 600
+    store_principal("t1", _principal(1), expires_at=expires_at)
+    store_principal("t2", _principal(2), expires_at=expires_at)
+    get_cached_principal("t1")
+    store_principal("t3", _principal(3), expires_at=expires_at)
+
+    assert get_cached_principal("t2") is None
+    assert get_cached_principal("t1") == _principal(1)
+    assert get_cached_principal("t3") == _principal(3)
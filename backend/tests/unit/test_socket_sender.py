@@ -0,0 +1,90 @@
+import asyncio
+
+from app.services.broker import InProcessBroker
+from app.services.notification_ws import NotificationConnectionManager
+from app.services.socket_sender import SocketSender
+
+
+class _Socket:
+    def __init__(self, *, delay: float = 0.0, fail: bool = False) -> None:
+        self.delay = delay
+        self.fail = fail
+        self.sent: list[dict] = []
+        self.closed_with: int | None = None
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_json(self, payload: dict) -> None:
+        if self.fail:
+            raise RuntimeError("socket is gone")
+        await asyncio.sleep(self.delay)
+        self.sent.append(payload)
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        self.closed_with = code
+
+
+def test_slow_and_dead_sockets_are_dropped_without_delaying_others(monkeypatch):
+    monkeypatch.setattr("app.config.settings.ws_send_queue_size", 3)
+    monkeypatch.setattr("app.config.settings.ws_send_timeout_seconds", 1.0)
+
+    async def run():
+        manager = NotificationConnectionManager(InProcessBroker())
+        fast, slow, dead = _Socket(), _Socket(delay=10.0), _Socket(fail=True)
+        for socket in (fast, slow, dead):
+            await manager.connect(socket, user_id=1)
+
+        # slow holds message 0 in send_json, queues 1-3, and overflows on 4
+        for n in range(5):
+            await manager.send_to_user(1, {"n": n})
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        return manager, fast, slow, dead
+
+    manager, fast, slow, dead = asyncio.run(run())
+
+    assert [p["n"] for p in fast.sent] == [0, 1, 2, 3, 4]
+    assert slow.sent == [] and slow.closed_with == 1013
+    assert dead.closed_with == 1011
+    assert manager.active_connections == {1: [fast]}
+    assert set(manager.senders) == {fast}
+
+
+def test_send_timeout_drops_socket(monkeypatch):
+    monkeypatch.setattr("app.config.settings.ws_send_timeout_seconds", 0.05)
+
+    async def run():
+        manager = NotificationConnectionManager(InProcessBroker())
+        stuck = _Socket(delay=10.0)
+        await manager.connect(stuck, user_id=1)
+        await manager.send_to_user(1, {"n": 0})
+        await asyncio.sleep(0.2)
+        return manager, stuck
+
+    manager, stuck = asyncio.run(run())
+
+    assert stuck.closed_with == 1013
+    assert manager.active_connections == {}
+
+
+def test_release_keeps_live_sends_behind_held_payloads():
+    async def run():
+        socket = _Socket()
+        sender = SocketSender(socket, lambda: asyncio.sleep(0), max_queue=4, send_timeout=1.0)
+        sender.hold()
+        for n in range(3):
+            sender.send({"n": n})
+        release = asyncio.create_task(sender.release())
+        # Let release() start queueing the held payloads; send_wait yields to the loop
+        await asyncio.sleep(0)
+        assert not release.done()
+        sender.send({"n": 3})
+        await release
+        sender.send({"n": 4})
+        while len(socket.sent) < 5:
+            await asyncio.sleep(0.01)
+        sender.stop()
+        return socket.sent
+
+    assert [p["n"] for p in asyncio.run(run())] == [0, 1, 2, 3, 4]
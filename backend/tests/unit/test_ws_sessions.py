@@ -0,0 +1,125 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from fastapi import WebSocketDisconnect
+
+from app.crud.aio import messages as crud_messages
+from app.routers.gateway import gateway_websocket
+from app.routers.messages import manager, websocket_endpoint
+from app.routers.notifications import notifications_ws
+from app.services.gateway_ws import gateway_manager
+from app.services.notification_ws import notification_ws_manager
+from app.services.principal_cache import Principal, clear_principal_cache, store_principal
+
+IDLE_SOCKETS = 1000
+
+
+class _IdleWebSocket:
+    def __init__(self, token: str) -> None:
+        self.query_params = {"token": token}
+        self.close_code: int | None = None
+        self._hung_up = asyncio.Event()
+
+    async def accept(self) -> None:
+        pass
+
+    async def receive_text(self) -> str:
+        await self._hung_up.wait()
+        raise WebSocketDisconnect(1000)
+
+    receive_json = receive_text
+
+    async def send_json(self, payload: dict) -> None:
+        pass
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        self.close_code = code
+
+    def hang_up(self) -> None:
+        self._hung_up.set()
+
+
+class _CountingSessions:
+    """Session factory that tracks how many sessions are open right now."""
+
+    def __init__(self) -> None:
+        self.open = 0
+        self.opened = 0
+
+    @asynccontextmanager
+    async def __call__(self):
+        self.open += 1
+        self.opened += 1
+        try:
+            yield SimpleNamespace()
+        finally:
+            self.open -= 1
+
+
+def _tokens() -> list[str]:
+    clear_principal_cache()
+    tokens = []
+    for user_id in range(1, IDLE_SOCKETS + 1):
+        token = f"token-{user_id}"
+        principal = Principal(id=user_id, status=1, is_tutor=False, is_student=True, first_name="Idle")
+        store_principal(token, principal, expires_at=time.time() + 3600)
+        tokens.append(token)
+    return tokens
+
+
+async def _hold_idle_sockets(start, connected) -> _CountingSessions:
+    sessions = _CountingSessions()
+    sockets = [_IdleWebSocket(token) for token in _tokens()]
+    tasks = [asyncio.create_task(start(ws, sessions)) for ws in sockets]
+    deadline = asyncio.get_running_loop().time() + 5.0
+    while connected() < IDLE_SOCKETS:
+        assert asyncio.get_running_loop().time() < deadline, "sockets did not connect"
+        await asyncio.sleep(0.01)
+
+    assert sessions.open == 0
+    assert all(ws.close_code is None for ws in sockets)
+
+    for ws in sockets:
+        ws.hang_up()
+    await asyncio.gather(*tasks)
+    clear_principal_cache()
+    return sessions
+
+
+def test_idle_notification_sockets_hold_no_session():
+    sessions = asyncio.run(
+        _hold_idle_sockets(
+            lambda ws, sessions: notifications_ws(ws, token=ws.query_params["token"], sessions=sessions),
+            lambda: sum(map(len, notification_ws_manager.active_connections.values())),
+        )
+    )
+    assert sessions.opened == IDLE_SOCKETS
+    assert notification_ws_manager.active_connections == {}
+
+
+def test_idle_chat_sockets_hold_no_session(monkeypatch):
+    async def get_conversation_by_id(db, conversation_id, user_id):
+        return SimpleNamespace(id=conversation_id, user1_id=user_id, user2_id=0)
+
+    monkeypatch.setattr(crud_messages, "get_conversation_by_id", get_conversation_by_id)
+    sessions = asyncio.run(
+        _hold_idle_sockets(
+            lambda ws, sessions: websocket_endpoint(ws, pairing_id=1, sessions=sessions),
+            lambda: len(manager.active_connections.get(1, [])),
+        )
+    )
+    assert sessions.opened == IDLE_SOCKETS
+    assert manager.active_connections == {}
+
+
+def test_idle_gateway_sockets_hold_no_session():
+    sessions = asyncio.run(
+        _hold_idle_sockets(
+            lambda ws, sessions: gateway_websocket(ws, sessions=sessions),
+            lambda: sum(map(len, gateway_manager.by_user.values())),
+        )
+    )
+    assert sessions.opened == IDLE_SOCKETS
+    assert gateway_manager.by_user == {}
@@ -0,0 +1,26 @@
+"""Test doubles shared by the WebSocket fan-out tests."""
+import asyncio
+
+
+class FakeWebSocket:
+    """Records every payload sent to it."""
+
+    def __init__(self) -> None:
+        self.sent: list[dict] = []
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_json(self, payload: dict) -> None:
+        self.sent.append(payload)
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        pass
+
+
+async def until(predicate, timeout: float = 2.0) -> None:
+    """Poll until `predicate()` holds; fail after `timeout` seconds."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out waiting for delivery"
+        await asyncio.sleep(0.01)